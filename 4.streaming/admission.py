@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+class OverloadedError(Exception):
+    """Raised when a request is shed because its deadline cannot be met."""
+
+class _ViewLimiter:
+    """Concurrency limit for one feature view, with an EWMA of lookup latency to predict queueing delay."""
+
+    def __init__(self, max_concurrency: int, max_waiting: int, alpha: float = 0.1):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.alpha = alpha
+        self.inflight = 0
+        self.waiting = 0
+        self.latency = 0.0  # seconds, 0 until the first lookup completes
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def predicted_latency(self) -> float:
+        """Expected time until a new request finishes: its own lookup plus the queue ahead of it."""
+        if self.inflight < self.max_concurrency:
+            return self.latency
+        return self.latency * (1 + (self.waiting + 1) / self.max_concurrency)
+
+    @asynccontextmanager
+    async def admit(self, deadline: Optional[float]):
+        loop = asyncio.get_running_loop()
+        remaining = None if deadline is None else deadline - loop.time()
+        if self.waiting >= self.max_waiting:
+            raise OverloadedError("Too many queued requests")
+        if remaining is not None and remaining <= self.predicted_latency():
+            raise OverloadedError("Deadline cannot be met")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), remaining)
+        except asyncio.TimeoutError:
+            raise OverloadedError("Deadline expired while queued")
+        finally:
+            self.waiting -= 1
+
+        self.inflight += 1
+        start = loop.time()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self.semaphore.release()
+            elapsed = loop.time() - start
+            self.latency = elapsed if not self.latency else self.latency + self.alpha * (elapsed - self.latency)
+
+class AdmissionController:
+    """Per feature view admission control: bounded concurrency, a bounded queue and early shedding.
+
+    A request whose remaining budget is below the predicted latency is rejected immediately
+    instead of waiting in line and timing out together with everything behind it.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_waiting: int = 256):
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.limiters: Dict[str, _ViewLimiter] = {}
+
+    def admit(self, feature_view: str, deadline: Optional[float] = None):
+        """Async context manager around one lookup; deadline is an absolute event loop time."""
+        limiter = self.limiters.get(feature_view)
+        if limiter is None:
+            limiter = self.limiters[feature_view] = _ViewLimiter(self.max_concurrency, self.max_waiting)
+        return limiter.admit(deadline)
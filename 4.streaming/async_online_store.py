@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from online_store import OnlineStore
+from entity_keys import EntityColumns
+
+class StoreTimeoutError(Exception):
+    """Raised when an online store call does not finish within its timeout."""
+
+class AsyncOnlineStore:
+    """Runs blocking OnlineStore reads on a dedicated, sized thread pool so the event loop never waits on SQLite."""
+
+    def __init__(self, online_store: OnlineStore, max_workers: int = 16, timeout: Optional[float] = 1.0):
+        self.online_store = online_store
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="online-store-io")
+
+    async def _run(self, func, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, func, *args)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # The worker thread keeps running until SQLite returns; only the caller stops waiting
+            raise StoreTimeoutError(f"{func.__name__} timed out after {timeout}s")
+
+    async def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any,
+                                  timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return await self._run(self.online_store.get_online_features, table_name, entity_column, entity_value, timeout=timeout)
+
+    async def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any],
+                                        timeout: Optional[float] = None) -> List[Optional[Dict[str, Any]]]:
+        return await self._run(self.online_store.get_online_features_batch, table_name, entity_column, entity_values, timeout=timeout)
+
+    async def get_packed_rows_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any],
+                                    feature_names: List[str], timeout: Optional[float] = None) -> bytes:
+        return await self._run(self.online_store.get_packed_rows_batch, table_name, entity_column, entity_values,
+                               feature_names, timeout=timeout)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,120 @@
+"""Micro-benchmarks for feature_client against an in-process feature server.
+
+Run with `python client_benchmark.py [--entities N] [--lookups N]`. The server runs uvicorn in a
+background thread over an in-memory online store, so numbers reflect HTTP and client overhead
+rather than storage.
+"""
+import time
+import random
+import logging
+import socket
+import asyncio
+import argparse
+import threading
+import httpx
+import pandas as pd
+import uvicorn
+from feature_serving import app, FeatureStoreService
+from feature_client import FeatureClient, AsyncFeatureClient
+from memory_store import ShardedMemoryStore
+from main import create_feature_repository
+
+FEATURE_VIEW = "customer_features"
+ENTITY_COLUMN = "customer_id"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(num_entities: int):
+    feature_repo = create_feature_repository()
+    feature_view = feature_repo.get_feature_view(FEATURE_VIEW)
+    online_store = ShardedMemoryStore()
+    online_store.create_table(FEATURE_VIEW, feature_view.table_schema(primary_key=True), ttl=feature_view.ttl)
+    online_store.insert_data(FEATURE_VIEW, pd.DataFrame({
+        ENTITY_COLUMN: range(num_entities),
+        "age": [random.randint(18, 90) for _ in range(num_entities)],
+        "total_purchases": [random.uniform(0, 1000) for _ in range(num_entities)],
+        "loyalty_score": [random.random() for _ in range(num_entities)],
+    }))
+    app.state.feature_store_service = FeatureStoreService(feature_repo, online_store, fast_responses=True)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+def report(name: str, lookups: int, elapsed: float):
+    print(f"{name:<40} {lookups / elapsed:>10.0f} lookups/s  {elapsed / lookups * 1e6:>8.1f} us/lookup")
+
+def bench_naive(base_url: str, keys):
+    # The pattern this client replaces: one request and one fresh connection per entity
+    start = time.perf_counter()
+    for key in keys:
+        httpx.post(f"{base_url}/get_online_features",
+                   json={"feature_view": FEATURE_VIEW, "entity_column": ENTITY_COLUMN, "entity_value": key})
+    report("naive per-entity POST", len(keys), time.perf_counter() - start)
+
+def bench_sync(base_url: str, keys, batch_size: int):
+    with FeatureClient(base_url) as client:
+        start = time.perf_counter()
+        for key in keys:
+            client.get_features(FEATURE_VIEW, ENTITY_COLUMN, key)
+        report("sync pooled, one entity per call", len(keys), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, len(keys), batch_size):
+            client.get_features_batch(FEATURE_VIEW, ENTITY_COLUMN, keys[i:i + batch_size])
+        report(f"sync batched ({batch_size} per call)", len(keys), time.perf_counter() - start)
+
+    with FeatureClient(base_url, cache_ttl=60) as client:
+        client.get_features_batch(FEATURE_VIEW, ENTITY_COLUMN, keys)  # warm the cache
+        start = time.perf_counter()
+        for key in keys:
+            client.get_features(FEATURE_VIEW, ENTITY_COLUMN, key)
+        report("sync with warm TTL cache", len(keys), time.perf_counter() - start)
+
+async def bench_async(base_url: str, keys, concurrency: int):
+    async with AsyncFeatureClient(base_url) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def lookup(key):
+            async with semaphore:
+                return await client.get_features(FEATURE_VIEW, ENTITY_COLUMN, key)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(lookup(key) for key in keys))
+        report(f"async auto-batched ({concurrency} concurrent)", len(keys), time.perf_counter() - start)
+
+    async with AsyncFeatureClient(base_url, hedge_after=0.005) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client.get_features(FEATURE_VIEW, ENTITY_COLUMN, key) for key in keys))
+        report("async auto-batched, hedged after 5ms", len(keys), time.perf_counter() - start)
+
+def main():
+    # Per-request log lines would dominate the measurements
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("monitoring").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=256)
+    args = parser.parse_args()
+
+    server, thread, base_url = start_server(args.entities)
+    keys = [random.randrange(args.entities) for _ in range(args.lookups)]
+    try:
+        bench_naive(base_url, keys[:min(len(keys), 500)])
+        bench_sync(base_url, keys, args.batch_size)
+        asyncio.run(bench_async(base_url, keys, args.concurrency))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+if __name__ == "__main__":
+    main()
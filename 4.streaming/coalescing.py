@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, Any, Optional, Tuple
+from async_online_store import AsyncOnlineStore
+from entity_keys import EntityColumns, key_columns, key_value
+
+class CoalescingLoader:
+    """DataLoader-style front for AsyncOnlineStore single-entity lookups.
+
+    Identical lookups already in flight share one future (single-flight). Distinct lookups for
+    the same table and entity column that arrive within `window` seconds are merged into one
+    multi-key batch query, and each waiting coroutine receives its own row.
+    """
+
+    def __init__(self, async_store: AsyncOnlineStore, window: float = 0.0002, max_batch_size: int = 256):
+        self.async_store = async_store
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.inflight: Dict[Tuple[str, str, Any], asyncio.Future] = {}
+        self.pending: Dict[Tuple[str, str], Dict[Any, asyncio.Future]] = {}
+
+    async def load(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Optional[Dict[str, Any]]:
+        # Composite keys (JSON lists) are grouped and deduplicated as tuples
+        columns = key_columns(entity_column)
+        entity_column = columns[0] if len(columns) == 1 else tuple(columns)
+        entity_value = key_value(entity_value, columns)
+        key = (table_name, entity_column, entity_value)
+        future = self.inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.inflight[key] = future
+            group = (table_name, entity_column)
+            batch = self.pending.get(group)
+            if batch is None:
+                batch = self.pending[group] = {}
+                loop.call_later(self.window, self._dispatch, group, batch)
+            batch[entity_value] = future
+            if len(batch) >= self.max_batch_size:
+                self._dispatch(group, batch)
+        # shield: one cancelled caller must not cancel the lookup the others are waiting on
+        row = await asyncio.shield(future)
+        # Callers may add on-demand features to their row, so each gets its own copy
+        return dict(row) if row is not None else None
+
+    def _dispatch(self, group: Tuple[str, str], batch: Dict[Any, asyncio.Future]):
+        # The timer may fire after a size-triggered dispatch already took this batch
+        if self.pending.get(group) is not batch:
+            return
+        del self.pending[group]
+        asyncio.ensure_future(self._run(group, batch))
+
+    async def _run(self, group: Tuple[str, str], batch: Dict[Any, asyncio.Future]):
+        table_name, entity_column = group
+        values = list(batch)
+        try:
+            rows = await self.async_store.get_online_features_batch(table_name, entity_column, values)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for value, row in zip(values, rows):
+                if not batch[value].done():
+                    batch[value].set_result(row)
+        finally:
+            for value in values:
+                self.inflight.pop((table_name, entity_column, value), None)
@@ -13,12 +13,13 @@ def check_consistency(offline_store: OfflineStore, online_store: OnlineStore, fe
         feature_view = feature_repo.get_feature_view(feature_view_name)
         
         # Sample entities from the offline store
-        all_entities = offline_store.get_all_entity_ids(feature_view_name)
+        all_entities = offline_store.get_all_entity_ids(feature_view_name, feature_view.entities)
         sampled_entities = random.sample(all_entities, min(sample_size, len(all_entities)))
 
         for entity_id in sampled_entities:
-            offline_features = offline_store.get_batch_features(feature_view_name, feature_view.entities[0], [entity_id])
-            online_features = online_store.get_online_features(feature_view_name, feature_view.entities[0], entity_id)
+            with offline_store.workload("consistency"):
+                offline_features = offline_store.get_batch_features(feature_view_name, feature_view.entities, [entity_id])
+            online_features = online_store.get_online_features(feature_view_name, feature_view.entities, entity_id)
 
             # Compare offline and online features
             for feature in feature_view.features:
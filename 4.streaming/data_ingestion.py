@@ -1,9 +1,14 @@
 import pandas as pd
 from typing import Dict, Any
 
-def ingest_data(data: pd.DataFrame, offline_store: Any, online_store: Any, table_name: str):
+def ingest_data(data: pd.DataFrame, offline_store: Any, online_store: Any, table_name: str,
+                statistics: Any = None, timestamp_field: str = None):
     # Insert data into offline store
     offline_store.insert_data(table_name, data)
+
+    # Update drift-monitoring sketches while the batch is in memory
+    if statistics is not None:
+        statistics.update_frame(table_name, data, timestamp_field)
     
     # Insert data into online store row by row
     for _, row in data.iterrows():
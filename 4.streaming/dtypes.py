@@ -0,0 +1,91 @@
+from typing import Dict, Optional
+import numpy as np
+
+# Logical feature types and the narrowest physical type each maps to:
+# (DDL type, pandas dtype, struct/array code). The DDL names are valid in both DuckDB and
+# SQLite, so one schema dict drives both stores. Variable-width types have no struct code.
+DTYPES = {
+    "bool": ("BOOLEAN", "boolean", "?"),
+    "int8": ("TINYINT", "Int8", "b"),
+    "int16": ("SMALLINT", "Int16", "h"),
+    "int32": ("INTEGER", "Int32", "i"),
+    "int64": ("BIGINT", "Int64", "q"),
+    "float32": ("REAL", "float32", "f"),
+    "float64": ("DOUBLE", "float64", "d"),
+    "category": ("VARCHAR", "category", None),
+    "string": ("VARCHAR", "object", None),
+}
+
+# SQL type names, as used by older feature definitions and existing DDL
+ALIASES = {
+    "BOOLEAN": "bool",
+    "TINYINT": "int8",
+    "SMALLINT": "int16",
+    # SQLite INTEGER is 64-bit, and older views used it for every integer
+    "INTEGER": "int64",
+    "INT": "int64",
+    "BIGINT": "int64",
+    # Older FLOAT features were served as doubles from SQLite; narrowing them would change served values
+    "FLOAT": "float64",
+    "REAL": "float32",
+    "DOUBLE": "float64",
+    "VARCHAR": "string",
+    "TEXT": "string",
+}
+
+INTEGER_CODES = "bhiq"
+
+def normalize_dtype(dtype: str) -> str:
+    """Map a logical dtype or SQL type name (constraints such as PRIMARY KEY are ignored) to a logical dtype."""
+    if dtype in DTYPES:
+        return dtype
+    base = dtype.split()[0].upper() if dtype.strip() else dtype
+    if base in ALIASES:
+        return ALIASES[base]
+    raise ValueError(f"Unknown feature dtype: {dtype}")
+
+def ddl_type(dtype: str) -> str:
+    return DTYPES[normalize_dtype(dtype)][0]
+
+def pandas_dtype(dtype: str) -> str:
+    return DTYPES[normalize_dtype(dtype)][1]
+
+def struct_code(dtype: str) -> Optional[str]:
+    return DTYPES[normalize_dtype(dtype)][2]
+
+def sqlite_column_type(ddl: str) -> str:
+    """SQLite only aliases the rowid for the exact spelling INTEGER PRIMARY KEY, so integer keys use it."""
+    if "PRIMARY KEY" in ddl.upper() and ddl.split()[0].upper() in ("TINYINT", "SMALLINT", "INTEGER", "INT", "BIGINT"):
+        return "INTEGER PRIMARY KEY"
+    return ddl
+
+def coerce(value, code: str):
+    """Convert a Python value for storage under a struct code."""
+    if code in INTEGER_CODES:
+        return int(value)
+    if code == "?":
+        return bool(value)
+    return float(value)
+
+def float32_value(value: float) -> float:
+    """Python float for a float32 cell via its shortest decimal form, so a stored 0.9 serves as 0.9
+    (as it does from SQLite's 8-byte REAL) rather than 0.8999999761581421."""
+    return float(str(np.float32(value)))
+
+def python_values(df):
+    """df with Python scalars and None for missing values, ready for sqlite3 parameters or struct packing.
+
+    Nullable Int/boolean columns (see apply_pandas_dtypes) hold pd.NA, which sqlite3 rejects, and
+    numpy int8/int32 scalars, which sqlite3 binds as BLOBs. float32 columns are widened like float32_value.
+    """
+    narrow = [column for column in df.columns if df[column].dtype == np.float32]
+    if narrow:
+        df = df.assign(**{column: df[column].astype(str).astype("float64") for column in narrow})
+    return df.astype(object).where(df.notna(), None)
+
+def apply_pandas_dtypes(df, dtypes: Dict[str, str]):
+    """Cast the columns of df named in dtypes to their compact pandas dtypes; other columns are left alone."""
+    casts = {column: pandas_dtype(dtype) for column, dtype in dtypes.items() if column in df.columns}
+    if not casts:
+        return df
+    return df.astype(casts)
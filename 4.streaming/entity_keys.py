@@ -0,0 +1,74 @@
+from typing import Dict, Any, List, Sequence, Tuple, Union
+
+# An entity key is one column (given as a plain string) or several; a composite key value is a
+# tuple (or JSON list) with one component per column, in column order
+EntityColumns = Union[str, Sequence[str]]
+
+def key_columns(entity_column: EntityColumns) -> List[str]:
+    return [entity_column] if isinstance(entity_column, str) else list(entity_column)
+
+def key_value(entity_value: Any, columns: List[str]) -> Any:
+    """Hashable form of one key: the value itself for a single column, a tuple for a composite key."""
+    if len(columns) == 1:
+        return entity_value
+    if not isinstance(entity_value, (list, tuple)) or len(entity_value) != len(columns):
+        raise ValueError(f"Entity key for {columns} needs {len(columns)} components, got {entity_value!r}")
+    return tuple(entity_value)
+
+def row_key(row: Dict[str, Any], columns: List[str]) -> Any:
+    """The key of a row, in the same form as key_value."""
+    if len(columns) == 1:
+        return row[columns[0]]
+    return tuple(row[column] for column in columns)
+
+def key_params(entity_values: List[Any], columns: List[str]) -> List[Any]:
+    """Query parameters for key_predicate / key_lookup_sql, flattened in column order."""
+    if len(columns) == 1:
+        return list(entity_values)
+    return [component for value in entity_values for component in key_value(value, columns)]
+
+def key_predicate(columns: List[str]) -> str:
+    """WHERE condition matching one key, an equality on every key column."""
+    return " AND ".join(f"{column} = ?" for column in columns)
+
+def key_lookup_sql(table_name: str, columns: List[str], count: int, select: List[str] = None) -> str:
+    """SELECT rows of table_name matching any of count keys; further conditions can be appended with " AND ...".
+
+    A single column uses IN (...). A composite key joins the table against a VALUES list, so
+    SQLite probes the composite primary key once per key. An OR of per-key conditions has
+    a depth limit, and a row-value IN (VALUES ...) makes SQLite scan the table.
+    """
+    selected = ", ".join(f"{table_name}.{column}" for column in select) if select else f"{table_name}.*"
+    if len(columns) == 1:
+        return f"SELECT {selected} FROM {table_name} WHERE {columns[0]} IN ({','.join('?' * count)})"
+    values = ",".join(["(" + ",".join("?" * len(columns)) + ")"] * count)
+    on = " AND ".join(f"{table_name}.{column} = k.column{i + 1}" for i, column in enumerate(columns))
+    return f"SELECT {selected} FROM (VALUES {values}) AS k JOIN {table_name} ON {on}"
+
+def split_primary_key(schema: Dict[str, str]) -> Tuple[Dict[str, str], List[str]]:
+    """Key columns of a schema dict and the column DDL with their PRIMARY KEY markers removed.
+
+    Every column marked PRIMARY KEY is part of the key (FeatureView.table_schema marks all
+    entities); without any marker the first column is the key.
+    """
+    marked = [name for name, dtype in schema.items() if "PRIMARY KEY" in dtype.upper()]
+    if not marked:
+        return dict(schema), [next(iter(schema))]
+    stripped = {name: (dtype[:dtype.upper().index("PRIMARY KEY")].strip() if name in marked else dtype)
+                for name, dtype in schema.items()}
+    return stripped, marked
+
+def columns_ddl(schema: Dict[str, str], column_type=None, extra: Dict[str, str] = None) -> str:
+    """Column list for CREATE TABLE; a composite key becomes a PRIMARY KEY (...) table constraint.
+
+    column_type maps each DDL type (e.g. dtypes.sqlite_column_type); extra columns are added
+    after the schema's own, before the constraint.
+    """
+    columns, keys = split_primary_key(schema)
+    if len(keys) == 1:
+        columns = dict(schema)
+    columns.update(extra or {})
+    ddl = [f"{name} {column_type(dtype) if column_type else dtype}" for name, dtype in columns.items()]
+    if len(keys) > 1:
+        ddl.append(f"PRIMARY KEY ({', '.join(keys)})")
+    return ", ".join(ddl)
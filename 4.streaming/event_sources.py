@@ -0,0 +1,214 @@
+import csv
+import json
+import time
+import socket
+import duckdb
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _loads(line: bytes) -> Dict[str, Any]:
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+def _coerce(value: str) -> Any:
+    """CSV cells arrive as text; restore ints and floats so events look like JSON ones."""
+    if value == "":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+class EventSource:
+    """Base class for replayable event sources.
+
+    Subclasses implement _positioned_batches(), yielding batches of (event, offset just past it)
+    pairs; iterating the source yields single events. `offset` always points just past the last
+    event handed out, so a new source created with start_offset=offset resumes where this one stopped.
+    """
+
+    def __init__(self, batch_size: int = 1000, start_offset: int = 0):
+        self.batch_size = batch_size
+        self.offset = start_offset
+
+    def _positioned_batches(self) -> Iterator[List[Tuple[Dict[str, Any], int]]]:
+        raise NotImplementedError
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        for batch in self._positioned_batches():
+            if batch:
+                self.offset = batch[-1][1]
+            yield [event for event, _ in batch]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Advance per event, so stopping mid-batch resumes at the first event not handed out
+        for batch in self._positioned_batches():
+            for event, end in batch:
+                self.offset = end
+                yield event
+
+    def close(self):
+        pass
+
+class _LineFileSource(EventSource):
+    """Reads complete lines in batches from a file; offset is a byte position. With follow=True it tails the file."""
+
+    def __init__(self, path: str, follow: bool = False, poll_interval: float = 0.2, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self._stopped = False
+
+    def _decode(self, lines: List[bytes], ends: List[int]) -> List[Tuple[Dict[str, Any], int]]:
+        raise NotImplementedError
+
+    def _start(self, f):
+        f.seek(self.offset)
+
+    def _positioned_batches(self) -> Iterator[List[Tuple[Dict[str, Any], int]]]:
+        with open(self.path, "rb") as f:
+            self._start(f)
+            position = f.tell()
+            partial = b""
+            while not self._stopped:
+                lines = []
+                while len(lines) < self.batch_size:
+                    line = f.readline()
+                    if not line:
+                        break
+                    if not line.endswith(b"\n"):
+                        # A writer is mid-line; keep the fragment until the rest arrives
+                        partial += line
+                        continue
+                    lines.append(partial + line)
+                    partial = b""
+                if not lines and partial and not self.follow:
+                    # Not tailing, so a fragment at EOF is the file's last line rather than a write in progress
+                    lines.append(partial)
+                    partial = b""
+                if lines:
+                    ends = []
+                    for line in lines:
+                        position += len(line)
+                        ends.append(position)
+                    kept = [(line, end) for line, end in zip(lines, ends) if line.strip()]
+                    yield self._decode([line for line, _ in kept], [end for _, end in kept])
+                elif self.follow:
+                    time.sleep(self.poll_interval)
+                else:
+                    return
+
+    def close(self):
+        self._stopped = True
+
+class JsonlFileSource(_LineFileSource):
+    """Newline-delimited JSON events."""
+
+    def _decode(self, lines: List[bytes], ends: List[int]) -> List[Tuple[Dict[str, Any], int]]:
+        return [(_loads(line), end) for line, end in zip(lines, ends)]
+
+class CsvFileSource(_LineFileSource):
+    """CSV events with a header row; numeric cells are converted back to numbers."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(path, **kwargs)
+        self.columns: Optional[List[str]] = None
+
+    def _start(self, f):
+        header = f.readline()
+        self.columns = next(csv.reader([header.decode("utf-8")]))
+        # Offset 0 means "from the first data row"
+        f.seek(max(self.offset, len(header)))
+        self.offset = f.tell()
+
+    def _decode(self, lines: List[bytes], ends: List[int]) -> List[Tuple[Dict[str, Any], int]]:
+        reader = csv.reader(line.decode("utf-8") for line in lines)
+        # line_num counts the lines a row spanned, so quoted newlines still map to the right end
+        return [({column: _coerce(value) for column, value in zip(self.columns, row)}, ends[reader.line_num - 1])
+                for row in reader]
+
+class ParquetEventSource(EventSource):
+    """Events from one or more Parquet files (globs allowed), read through DuckDB; offset counts rows."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _positioned_batches(self) -> Iterator[List[Tuple[Dict[str, Any], int]]]:
+        conn = duckdb.connect()
+        try:
+            result = conn.execute("SELECT * FROM read_parquet(?) OFFSET ?", [self.path, self.offset])
+            vectors = max(1, self.batch_size // 2048)
+            position = self.offset
+            while True:
+                chunk = result.fetch_df_chunk(vectors)
+                if chunk.empty:
+                    return
+                events = chunk.to_dict("records")
+                yield [(event, position + i + 1) for i, event in enumerate(events)]
+                position += len(events)
+        finally:
+            conn.close()
+
+class SocketEventSource(EventSource):
+    """Listens on a local TCP port for newline-delimited JSON; offset counts events received."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9099, recv_size: int = 1 << 16, **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.recv_size = recv_size
+        self._server = None
+
+    def _positioned_batches(self) -> Iterator[List[Tuple[Dict[str, Any], int]]]:
+        self._server = socket.create_server((self.host, self.port))
+        position = self.offset
+        try:
+            while True:
+                conn, _ = self._server.accept()
+                with conn:
+                    buffer = b""
+                    while True:
+                        data = conn.recv(self.recv_size)
+                        if not data:
+                            break
+                        buffer += data
+                        # Decode every complete line received so far as one batch
+                        *lines, buffer = buffer.split(b"\n")
+                        events = [_loads(line) for line in lines if line.strip()]
+                        if events:
+                            yield [(event, position + i + 1) for i, event in enumerate(events)]
+                            position += len(events)
+        except OSError:
+            # close() shut the listening socket
+            return
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+def paced(events: Iterator[Dict[str, Any]], time_field: str, speed: float = 1.0) -> Iterator[Dict[str, Any]]:
+    """Replay events at `speed` times their original event-time spacing (speed=2.0 is twice as fast).
+
+    time_field holds epoch seconds. Without pacing, sources replay as fast as they can be decoded.
+    """
+    first_event_time = None
+    started = None
+    for event in events:
+        event_time = event.get(time_field)
+        if event_time is not None:
+            if first_event_time is None:
+                first_event_time, started = event_time, time.monotonic()
+            delay = (event_time - first_event_time) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+        yield event
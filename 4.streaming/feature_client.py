@@ -0,0 +1,349 @@
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Tuple, Union
+import httpx
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BATCH_PATH = "/get_online_features_batch"
+# Status codes worth retrying: shed, timed out, or a worker restarting behind a proxy
+RETRYABLE_STATUS = {502, 503, 504}
+
+def _hashable(value: Any) -> Any:
+    # Composite entity keys and columns arrive as lists; tuples serve as cache and batch keys
+    return tuple(value) if isinstance(value, list) else value
+
+class FeatureClientError(Exception):
+    """Raised when the feature server rejects a request or stays unavailable after all retries."""
+
+class _RetryableError(Exception):
+    pass
+
+class TTLCache:
+    """Small LRU cache whose entries expire ttl seconds after they were stored."""
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def put(self, key: Tuple, value: Any):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+def _encode(payload: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+def _decode(response: "httpx.Response") -> Dict[str, Any]:
+    if response.headers.get("content-type", "").startswith("application/msgpack"):
+        return msgpack.unpackb(response.content, raw=False)
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+class _ClientBase:
+    def __init__(self, base_url: str, timeout: float = 1.0, max_connections: int = 32, max_batch_size: int = 256,
+                 cache_ttl: Optional[float] = None, cache_size: int = 10000, retries: int = 2,
+                 backoff: float = 0.01, hedge_after: Optional[float] = None, deadline_ms: Optional[float] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_batch_size = max_batch_size
+        # Only plain lookups are cached; results that depend on request context or are fallbacks never are
+        self.cache = TTLCache(cache_ttl, cache_size) if cache_ttl else None
+        self.retries = retries
+        self.backoff = backoff
+        # Send a second identical request if the first has not answered after this many seconds
+        self.hedge_after = hedge_after
+        self.headers = {"Content-Type": "application/json"}
+        if msgpack is not None:
+            self.headers["Accept"] = "application/msgpack"
+        if deadline_ms is not None:
+            self.headers["X-Deadline-Ms"] = str(deadline_ms)
+
+    def _cache_key(self, feature_view: str, version: Optional[int], entity_value: Any) -> Tuple:
+        return (feature_view, version, _hashable(entity_value))
+
+    def _split_cached(self, feature_view: str, version: Optional[int], entity_values: List[Any],
+                      use_cache: bool) -> Tuple[List[Optional[Dict[str, Any]]], List[int]]:
+        """Fill results from the cache; return them with the positions still to fetch."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(entity_values)
+        if not use_cache:
+            return results, list(range(len(entity_values)))
+        missing = []
+        for i, value in enumerate(entity_values):
+            hit, row = self.cache.get(self._cache_key(feature_view, version, value))
+            if hit:
+                results[i] = dict(row) if row is not None else None
+            else:
+                missing.append(i)
+        return results, missing
+
+    def _chunks(self, positions: List[int]) -> List[List[int]]:
+        return [positions[i:i + self.max_batch_size] for i in range(0, len(positions), self.max_batch_size)]
+
+    def _body(self, feature_view: str, entity_column: Union[str, List[str]], values: List[Any], version: Optional[int],
+              request_context: Optional[Dict[str, Any]]) -> bytes:
+        payload = {"feature_view": feature_view, "entity_column": entity_column, "entity_values": values}
+        if version is not None:
+            payload["version"] = version
+        if request_context:
+            payload["request_context"] = request_context
+        return _encode(payload)
+
+    def _check(self, response: "httpx.Response") -> Dict[str, Any]:
+        if response.status_code in RETRYABLE_STATUS:
+            raise _RetryableError(f"HTTP {response.status_code}")
+        if response.status_code >= 400:
+            raise FeatureClientError(f"HTTP {response.status_code}: {response.text}")
+        return _decode(response)
+
+    def _store(self, feature_view: str, version: Optional[int], entity_values: List[Any],
+               payload: Dict[str, Any], use_cache: bool):
+        if use_cache and not payload.get("fallback"):
+            for value, row in zip(entity_values, payload["features"]):
+                self.cache.put(self._cache_key(feature_view, version, value), row)
+
+    @staticmethod
+    def _slice_context(request_context: Optional[Dict[str, Any]], positions: List[int]) -> Optional[Dict[str, Any]]:
+        # List-valued context entries are aligned with entity values and must follow the chunking
+        if not request_context:
+            return request_context
+        return {key: ([value[i] for i in positions] if isinstance(value, list) else value)
+                for key, value in request_context.items()}
+
+class FeatureClient(_ClientBase):
+    """Synchronous client for the feature server.
+
+    Lookups go through the batch endpoint over a keep-alive connection pool. Many entities are
+    split into requests of at most max_batch_size, optionally served from a TTL cache, retried
+    with backoff on 502/503/504 and transport errors, and hedged after hedge_after seconds.
+    """
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.http = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits, headers=self.headers)
+        self.executor = ThreadPoolExecutor(max_workers=self.limits.max_connections, thread_name_prefix="feature-client")
+        # Hedges get their own pool so a hedge can never wait behind the chunk fan-out that needs it
+        self.hedge_executor = ThreadPoolExecutor(max_workers=self.limits.max_connections, thread_name_prefix="feature-client-hedge")
+
+    def _post_once(self, body: bytes) -> Dict[str, Any]:
+        try:
+            response = self.http.post(BATCH_PATH, content=body)
+        except httpx.TransportError as e:
+            raise _RetryableError(str(e))
+        return self._check(response)
+
+    def _post_hedged(self, body: bytes) -> Dict[str, Any]:
+        if self.hedge_after is None:
+            return self._post_once(body)
+        first = self.hedge_executor.submit(self._post_once, body)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        second = self.hedge_executor.submit(self._post_once, body)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except _RetryableError as e:
+                    error = e
+        raise error
+
+    def _post(self, body: bytes) -> Dict[str, Any]:
+        for attempt in range(self.retries + 1):
+            try:
+                return self._post_hedged(body)
+            except _RetryableError as e:
+                if attempt == self.retries:
+                    raise FeatureClientError(f"Feature server unavailable: {e}")
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def get_features_batch(self, feature_view: str, entity_column: Union[str, List[str]], entity_values: List[Any],
+                           version: Optional[int] = None,
+                           request_context: Optional[Dict[str, Any]] = None) -> List[Optional[Dict[str, Any]]]:
+        """Features for each entity in request order; None where the entity has no features."""
+        use_cache = self.cache is not None and not request_context
+        results, missing = self._split_cached(feature_view, version, entity_values, use_cache)
+        chunks = self._chunks(missing)
+        bodies = [self._body(feature_view, entity_column, [entity_values[i] for i in chunk], version,
+                             self._slice_context(request_context, chunk)) for chunk in chunks]
+        # Chunks of one call are sent concurrently over the pool
+        payloads = list(self.executor.map(self._post, bodies)) if len(bodies) > 1 else [self._post(b) for b in bodies]
+        for chunk, payload in zip(chunks, payloads):
+            values = [entity_values[i] for i in chunk]
+            self._store(feature_view, version, values, payload, use_cache)
+            for i, row in zip(chunk, payload["features"]):
+                results[i] = row
+        return results
+
+    def get_features(self, feature_view: str, entity_column: Union[str, List[str]], entity_value: Any, version: Optional[int] = None,
+                     request_context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        return self.get_features_batch(feature_view, entity_column, [entity_value], version, request_context)[0]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.hedge_executor.shutdown(wait=False)
+        self.http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class AsyncFeatureClient(_ClientBase):
+    """asyncio flavor of FeatureClient.
+
+    Concurrent get_features calls for the same feature view, entity column and version that
+    arrive within batch_window seconds are sent together as one batch request.
+    """
+
+    def __init__(self, base_url: str, batch_window: float = 0.001, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.batch_window = batch_window
+        self.http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits, headers=self.headers)
+        self.pending: Dict[Tuple[str, str, Optional[int]], Dict[Any, asyncio.Future]] = {}
+
+    async def _post_once(self, body: bytes) -> Dict[str, Any]:
+        try:
+            response = await self.http.post(BATCH_PATH, content=body)
+        except httpx.TransportError as e:
+            raise _RetryableError(str(e))
+        return self._check(response)
+
+    async def _post_hedged(self, body: bytes) -> Dict[str, Any]:
+        if self.hedge_after is None:
+            return await self._post_once(body)
+        first = asyncio.ensure_future(self._post_once(body))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        pending = {first, asyncio.ensure_future(self._post_once(body))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        return task.result()
+                    except _RetryableError as e:
+                        error = e
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _post(self, body: bytes) -> Dict[str, Any]:
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._post_hedged(body)
+            except _RetryableError as e:
+                if attempt == self.retries:
+                    raise FeatureClientError(f"Feature server unavailable: {e}")
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def get_features_batch(self, feature_view: str, entity_column: Union[str, List[str]], entity_values: List[Any],
+                                 version: Optional[int] = None,
+                                 request_context: Optional[Dict[str, Any]] = None) -> List[Optional[Dict[str, Any]]]:
+        use_cache = self.cache is not None and not request_context
+        results, missing = self._split_cached(feature_view, version, entity_values, use_cache)
+        chunks = self._chunks(missing)
+        payloads = await asyncio.gather(*(
+            self._post(self._body(feature_view, entity_column, [entity_values[i] for i in chunk], version,
+                                  self._slice_context(request_context, chunk)))
+            for chunk in chunks
+        ))
+        for chunk, payload in zip(chunks, payloads):
+            values = [entity_values[i] for i in chunk]
+            self._store(feature_view, version, values, payload, use_cache)
+            for i, row in zip(chunk, payload["features"]):
+                results[i] = row
+        return results
+
+    async def get_features(self, feature_view: str, entity_column: Union[str, List[str]], entity_value: Any,
+                           version: Optional[int] = None,
+                           request_context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if request_context:
+            # Context is per call, so these lookups cannot share a batch
+            return (await self.get_features_batch(feature_view, entity_column, [entity_value], version, request_context))[0]
+        if self.cache is not None:
+            hit, row = self.cache.get(self._cache_key(feature_view, version, entity_value))
+            if hit:
+                return dict(row) if row is not None else None
+
+        group = (feature_view, _hashable(entity_column), version)
+        entity_value = _hashable(entity_value)
+        batch = self.pending.get(group)
+        if batch is None:
+            batch = self.pending[group] = {}
+            asyncio.get_running_loop().call_later(self.batch_window, self._dispatch, group, batch)
+        future = batch.get(entity_value)
+        if future is None:
+            future = batch[entity_value] = asyncio.get_running_loop().create_future()
+        if len(batch) >= self.max_batch_size:
+            self._dispatch(group, batch)
+        row = await asyncio.shield(future)
+        return dict(row) if row is not None else None
+
+    def _dispatch(self, group: Tuple[str, str, Optional[int]], batch: Dict[Any, asyncio.Future]):
+        if self.pending.get(group) is not batch:
+            return
+        del self.pending[group]
+        asyncio.ensure_future(self._run_batch(group, batch))
+
+    async def _run_batch(self, group: Tuple[str, str, Optional[int]], batch: Dict[Any, asyncio.Future]):
+        feature_view, entity_column, version = group
+        values = list(batch)
+        try:
+            rows = await self.get_features_batch(feature_view, entity_column, values, version)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for value, row in zip(values, rows):
+            if not batch[value].done():
+                batch[value].set_result(row)
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
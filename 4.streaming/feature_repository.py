@@ -1,10 +1,23 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+from dtypes import ddl_type, normalize_dtype
 
 class Feature(BaseModel):
+    name: str
+    dtype: str  # Logical type from dtypes.DTYPES (e.g. "int8", "float32"); SQL names are accepted too
+    default: Optional[Any] = None  # Served instead of the stored value when a lookup misses its deadline
+    # DuckDB SQL expression over the raw event table used by historical backfills; may use window
+    # functions, e.g. "SUM(amount) OVER (PARTITION BY customer_id ORDER BY ts)". When unset, the
+    # backfill mirrors StreamingProcessor: the event field of the same name, or 0 if absent.
+    sql: Optional[str] = None
+
+class OnDemandFeature(BaseModel):
     name: str
     dtype: str
+    # NumPy expression over stored feature columns and request context fields,
+    # e.g. "request_time - last_purchase_time"
+    expression: str
 
 class FeatureView(BaseModel):
     name: str
@@ -13,10 +26,37 @@ class FeatureView(BaseModel):
     ttl: int  # Time to live in seconds
     version: int
     created_at: datetime = None
+    timestamp_field: Optional[str] = None  # Event-time column used for incremental materialization
+    on_demand_features: List[OnDemandFeature] = []  # Computed at serve time from request context
+    entity_dtypes: Dict[str, str] = {}  # Logical type per entity column; int64 when not given
+
+    def column_dtypes(self) -> Dict[str, str]:
+        """Logical dtype of every stored column, entities first."""
+        dtypes = {entity: normalize_dtype(self.entity_dtypes.get(entity, "int64")) for entity in self.entities}
+        for feature in self.features:
+            dtypes[feature.name] = normalize_dtype(feature.dtype)
+        return dtypes
+
+    def default_values(self) -> Optional[Dict[str, Any]]:
+        """Fallback row served when a lookup is shed or times out; None if no feature has a default."""
+        if all(feature.default is None for feature in self.features):
+            return None
+        return {feature.name: feature.default for feature in self.features}
+
+    def table_schema(self, primary_key: bool = False) -> Dict[str, str]:
+        """DDL schema dict for OfflineStore/OnlineStore.create_table, derived from the feature dtypes."""
+        schema = {name: ddl_type(dtype) for name, dtype in self.column_dtypes().items()}
+        if primary_key:
+            # Several marked columns form one composite primary key (see entity_keys.split_primary_key)
+            for entity in self.entities:
+                schema[entity] += " PRIMARY KEY"
+        return schema
 
 class FeatureRepository:
     def __init__(self):
         self.feature_views: Dict[str, List[FeatureView]] = {}
+        # Version serving falls back to while a newer version's tables are still being backfilled
+        self.serving_versions: Dict[str, int] = {}
 
     def create_feature_view(self, feature_view: FeatureView):
         name = feature_view.name
@@ -44,6 +84,18 @@ class FeatureRepository:
         
         return None
 
+    def pin_serving_version(self, name: str, version: int):
+        self.serving_versions[name] = version
+
+    def unpin_serving_version(self, name: str):
+        self.serving_versions.pop(name, None)
+
+    def get_serving_feature_view(self, name: str, version: int = None) -> FeatureView:
+        """Like get_feature_view, but an unversioned lookup returns the pinned serving version if there is one."""
+        if version is None:
+            version = self.serving_versions.get(name)
+        return self.get_feature_view(name, version)
+
     def list_feature_views(self) -> List[str]:
         return list(self.feature_views.keys())
 
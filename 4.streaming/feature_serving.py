@@ -1,43 +1,222 @@
-from fastapi import FastAPI, HTTPException, Depends
+import os
+import hmac
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+from entity_keys import EntityColumns, key_columns, key_value
 from feature_repository import FeatureRepository
 from online_store import OnlineStore
+from async_online_store import AsyncOnlineStore, StoreTimeoutError
+from admission import AdmissionController, OverloadedError
+from coalescing import CoalescingLoader
 from monitoring import log_feature_retrieval
+from on_demand import apply_on_demand, RequestContextError
+from serialization import render_response, render_batch_response, negotiate_media_type, PACKED_ROWS_MEDIA_TYPE
+from profiling import (SamplingProfiler, ProfilerBusyError, dump_thread_stacks, start_tracemalloc, stop_tracemalloc,
+                       top_allocations)
 
-app = FastAPI()
+# Admin endpoints are disabled unless this token is set; callers send it in X-Admin-Token
+ADMIN_TOKEN_ENV = "FEATURE_STORE_ADMIN_TOKEN"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In multi-worker mode each worker process builds its own service (and store handles)
+    # from the factory registered in main.py; single-process mode sets the service directly.
+    created = None
+    if getattr(app.state, "feature_store_service", None) is None:
+        factory = getattr(app.state, "feature_store_service_factory", None)
+        if factory is not None:
+            created = factory()
+            app.state.feature_store_service = created
+    yield
+    if created is not None:
+        created.close()
+        created.online_store.close()
+        if created.statistics_store is not None:
+            created.statistics_store.offline_store.close()
+        app.state.feature_store_service = None
+
+app = FastAPI(lifespan=lifespan)
 
 class FeatureRequest(BaseModel):
     feature_view: str
-    entity_column: str
+    entity_column: Union[str, List[str]]  # A list for a composite key; entity_value is then a list too
     entity_value: Any
     version: Optional[int] = None
+    request_context: Optional[Dict[str, Any]] = None  # Inputs for on-demand features
+    deadline_ms: Optional[float] = None  # Latency budget; the X-Deadline-Ms header is used if unset
 
 class FeatureResponse(BaseModel):
     features: Dict[str, Any]
     version: int
+    fallback: bool = False  # True when default values were served because the deadline was missed
+
+class BatchFeatureRequest(BaseModel):
+    feature_view: str
+    entity_column: Union[str, List[str]]
+    entity_values: List[Any]  # One list per entity for a composite key
+    version: Optional[int] = None
+    # Scalars apply to every entity; lists must align with entity_values
+    request_context: Optional[Dict[str, Any]] = None
+    deadline_ms: Optional[float] = None
+
+class BatchFeatureResponse(BaseModel):
+    features: List[Optional[Dict[str, Any]]]
+    version: int
+    fallback: bool = False
 
 class FeatureStoreService:
-    def __init__(self, feature_repo: FeatureRepository, online_store: OnlineStore):
+    def __init__(self, feature_repo: FeatureRepository, online_store: OnlineStore, fast_responses: bool = False,
+                 io_workers: int = 16, store_timeout: Optional[float] = 1.0, statistics_store: Any = None,
+                 coalesce_window: Optional[float] = None, max_concurrency_per_view: int = 64,
+                 max_queue_per_view: int = 256, default_deadline_ms: Optional[float] = None):
         self.feature_repo = feature_repo
         self.online_store = online_store
+        # Persisted feature sketches; only available where the offline store is open
+        self.statistics_store = statistics_store
+        # Store reads run on a sized thread pool so one slow read does not stall the event loop
+        self.async_online_store = AsyncOnlineStore(online_store, max_workers=io_workers, timeout=store_timeout)
+        # With a window set, concurrent single-entity lookups are deduplicated and micro-batched
+        self.loader = CoalescingLoader(self.async_online_store, coalesce_window) if coalesce_window else None
+        # When enabled, handlers return pre-encoded bytes and skip response_model validation
+        self.fast_responses = fast_responses
+        # Bounded concurrency per feature view; requests that cannot meet their deadline are shed early
+        self.admission = AdmissionController(max_concurrency_per_view, max_queue_per_view)
+        self.default_deadline_ms = default_deadline_ms
+
+    async def get_online_features(self, request: FeatureRequest, deadline_ms: Optional[float] = None) -> FeatureResponse:
+        payload = await self.get_online_features_payload(request, deadline_ms)
+        return FeatureResponse(**payload)
+
+    def _deadline(self, deadline_ms: Optional[float]) -> Optional[float]:
+        """Absolute event loop time by which the response is due, or None for no budget."""
+        deadline_ms = self.default_deadline_ms if deadline_ms is None else deadline_ms
+        if deadline_ms is None:
+            return None
+        return asyncio.get_running_loop().time() + deadline_ms / 1000
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        return max(0.0, deadline - asyncio.get_running_loop().time())
 
-    async def get_online_features(self, request: FeatureRequest) -> FeatureResponse:
-        feature_view = self.feature_repo.get_feature_view(request.feature_view, request.version)
+    @staticmethod
+    def _check_keys(entity_column: EntityColumns, entity_values: List[Any]):
+        columns = key_columns(entity_column)
+        try:
+            for value in entity_values:
+                key_value(value, columns)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @staticmethod
+    def _apply_on_demand(feature_view, rows: List[Optional[Dict[str, Any]]], request_context: Optional[Dict[str, Any]]):
+        try:
+            apply_on_demand(feature_view, rows, request_context)
+        except RequestContextError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @staticmethod
+    def _fallback_row(feature_view, entity_column: EntityColumns, entity_value: Any, error: Exception) -> Dict[str, Any]:
+        defaults = feature_view.default_values()
+        if defaults is None:
+            if isinstance(error, OverloadedError):
+                raise HTTPException(status_code=503, detail=f"Request shed: {error}", headers={"Retry-After": "1"})
+            raise HTTPException(status_code=504, detail="Online store lookup timed out")
+        columns = key_columns(entity_column)
+        if len(columns) == 1:
+            return {columns[0]: entity_value, **defaults}
+        return {**dict(zip(columns, entity_value)), **defaults}
+
+    @staticmethod
+    def _project(feature_view, rows: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """Drop columns that belong to newer versions of the view (added by a schema migration)."""
+        columns = set(feature_view.entities)
+        columns.update(feature.name for feature in feature_view.features)
+        return [row if row is None or len(row) <= len(columns) else {k: v for k, v in row.items() if k in columns}
+                for row in rows]
+
+    async def get_online_features_payload(self, request: FeatureRequest, deadline_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Same lookup as get_online_features, returned as a plain dict ready for encoding.
+
+        deadline_ms (e.g. from a header) applies when the request itself carries no budget.
+        """
+        feature_view = self.feature_repo.get_serving_feature_view(request.feature_view, request.version)
         if not feature_view:
             raise HTTPException(status_code=404, detail="Feature view not found")
-        
-        features = self.online_store.get_online_features(
-            request.feature_view,
-            request.entity_column,
-            request.entity_value
-        )
+        self._check_keys(request.entity_column, [request.entity_value])
+        deadline = self._deadline(request.deadline_ms if request.deadline_ms is not None else deadline_ms)
+
+        fallback = False
+        try:
+            async with self.admission.admit(request.feature_view, deadline):
+                if self.loader is not None:
+                    lookup = self.loader.load(request.feature_view, request.entity_column, request.entity_value)
+                    features = await (asyncio.wait_for(lookup, self._remaining(deadline)) if deadline else lookup)
+                else:
+                    features = await self.async_online_store.get_online_features(
+                        request.feature_view,
+                        request.entity_column,
+                        request.entity_value,
+                        timeout=self._remaining(deadline)
+                    )
+        except (OverloadedError, StoreTimeoutError, asyncio.TimeoutError) as e:
+            features = self._fallback_row(feature_view, request.entity_column, request.entity_value, e)
+            fallback = True
         
         if not features:
             raise HTTPException(status_code=404, detail="Features not found")
         
+        features = self._project(feature_view, [features])[0]
+        self._apply_on_demand(feature_view, [features], request.request_context)
         log_feature_retrieval(request.feature_view, request.entity_value, features)
-        return FeatureResponse(features=features, version=feature_view.version)
+        return {"features": features, "version": feature_view.version, "fallback": fallback}
+
+    async def get_online_features_batch_payload(self, request: BatchFeatureRequest,
+                                                deadline_ms: Optional[float] = None, packed: bool = False) -> Dict[str, Any]:
+        """Look up many entities at once; missing entities come back as None in request order.
+
+        With packed=True and a store that keeps packed rows, the payload carries the rows already
+        in the typed row format ("packed_rows") instead of decoded dicts.
+        """
+        feature_view = self.feature_repo.get_serving_feature_view(request.feature_view, request.version)
+        if not feature_view:
+            raise HTTPException(status_code=404, detail="Feature view not found")
+        self._check_keys(request.entity_column, request.entity_values)
+        deadline = self._deadline(request.deadline_ms if request.deadline_ms is not None else deadline_ms)
+
+        fallback = False
+        try:
+            async with self.admission.admit(request.feature_view, deadline):
+                if (packed and hasattr(self.online_store, "get_packed_rows_batch")
+                        and not feature_view.on_demand_features):
+                    packed_rows = await self.async_online_store.get_packed_rows_batch(
+                        request.feature_view,
+                        request.entity_column,
+                        request.entity_values,
+                        [feature.name for feature in feature_view.features],
+                        timeout=self._remaining(deadline)
+                    )
+                    return {"packed_rows": packed_rows, "row_count": len(request.entity_values),
+                            "version": feature_view.version, "fallback": False}
+                features = await self.async_online_store.get_online_features_batch(
+                    request.feature_view,
+                    request.entity_column,
+                    request.entity_values,
+                    timeout=self._remaining(deadline)
+                )
+        except (OverloadedError, StoreTimeoutError) as e:
+            features = [self._fallback_row(feature_view, request.entity_column, value, e) for value in request.entity_values]
+            fallback = True
+        features = self._project(feature_view, features)
+        self._apply_on_demand(feature_view, features, request.request_context)
+        return {"features": features, "version": feature_view.version, "fallback": fallback}
+
+    def close(self):
+        self.async_online_store.close()
 
 def get_feature_store_service():
     # This will be initialized in main.py and passed here
@@ -46,9 +225,49 @@ def get_feature_store_service():
 @app.post("/get_online_features", response_model=FeatureResponse)
 async def get_online_features(
     request: FeatureRequest,
+    accept: Optional[str] = Header(None),
+    x_deadline_ms: Optional[float] = Header(None),
+    feature_store_service: FeatureStoreService = Depends(get_feature_store_service)
+):
+    if feature_store_service.fast_responses:
+        payload = await feature_store_service.get_online_features_payload(request, x_deadline_ms)
+        return render_response(payload, accept)
+    return await feature_store_service.get_online_features(request, x_deadline_ms)
+
+@app.post("/get_online_features_batch", response_model=BatchFeatureResponse)
+async def get_online_features_batch(
+    request: BatchFeatureRequest,
+    accept: Optional[str] = Header(None),
+    x_deadline_ms: Optional[float] = Header(None),
+    feature_store_service: FeatureStoreService = Depends(get_feature_store_service)
+):
+    # Packed rows can skip decoding entirely when that is what the client will receive
+    packed = (feature_store_service.fast_responses
+              and negotiate_media_type(accept, packable=True, typed_packable=True) == PACKED_ROWS_MEDIA_TYPE)
+    payload = await feature_store_service.get_online_features_batch_payload(request, x_deadline_ms, packed)
+    if feature_store_service.fast_responses:
+        feature_view = feature_store_service.feature_repo.get_feature_view(request.feature_view, payload["version"])
+        features = feature_view.features + feature_view.on_demand_features
+        feature_names = [feature.name for feature in features]
+        return render_batch_response(payload, feature_names, accept, [feature.dtype for feature in features])
+    return BatchFeatureResponse(**payload)
+
+@app.get("/feature_statistics/{feature_view_name}")
+async def feature_statistics(
+    feature_view_name: str,
+    start: Optional[float] = Query(None, description="Bucket start, epoch seconds (inclusive)"),
+    end: Optional[float] = Query(None, description="Bucket start, epoch seconds (exclusive)"),
     feature_store_service: FeatureStoreService = Depends(get_feature_store_service)
 ):
-    return await feature_store_service.get_online_features(request)
+    if feature_store_service.statistics_store is None:
+        raise HTTPException(status_code=404, detail="Feature statistics are not available on this server")
+    # Merging sketches scans DuckDB, so keep it off the event loop
+    statistics = await asyncio.get_running_loop().run_in_executor(
+        feature_store_service.async_online_store.executor,
+        feature_store_service.statistics_store.query, feature_view_name, start, end)
+    if not statistics:
+        raise HTTPException(status_code=404, detail="No statistics for feature view")
+    return {"feature_view": feature_view_name, "features": statistics}
 
 @app.get("/list_feature_view_versions/{feature_view_name}")
 async def list_feature_view_versions(
@@ -58,4 +277,58 @@ async def list_feature_view_versions(
     versions = feature_store_service.feature_repo.get_feature_view_versions(feature_view_name)
     if not versions:
         raise HTTPException(status_code=404, detail="Feature view not found")
-    return {"feature_view": feature_view_name, "versions": versions}
\ No newline at end of file
+    return {"feature_view": feature_view_name, "versions": versions}
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    expected = os.environ.get(ADMIN_TOKEN_ENV)
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# In multi-worker mode each admin call is answered by whichever worker process receives it
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=120, description="How long to sample"),
+    interval: float = Query(0.005, gt=0, le=1, description="Seconds between samples"),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$")
+):
+    """Sample every thread's stack for `seconds` and return collapsed stacks (flamegraph input)."""
+    profiler = SamplingProfiler(interval)
+    try:
+        profiler.start()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    if format == "json":
+        return {"samples": profiler.samples, "interval": interval, "stacks": dict(profiler.counts.most_common())}
+    return Response(content=profiler.collapsed() + "\n", media_type="text/plain")
+
+@app.get("/admin/threads", dependencies=[Depends(require_admin)])
+async def admin_threads():
+    """Current stack of every thread, including the online store writer and sweeper threads."""
+    return {"pid": os.getpid(), "threads": dump_thread_stacks()}
+
+@app.post("/admin/tracemalloc/start", dependencies=[Depends(require_admin)])
+async def admin_tracemalloc_start(frames: int = Query(10, ge=1, le=100)):
+    return {"started": start_tracemalloc(frames)}
+
+@app.post("/admin/tracemalloc/stop", dependencies=[Depends(require_admin)])
+async def admin_tracemalloc_stop():
+    stop_tracemalloc()
+    return {"stopped": True}
+
+@app.get("/admin/tracemalloc", dependencies=[Depends(require_admin)])
+async def admin_tracemalloc(
+    limit: int = Query(25, ge=1, le=500),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Top allocation sites by live size since tracing was started."""
+    try:
+        return top_allocations(limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
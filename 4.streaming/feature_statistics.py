@@ -0,0 +1,304 @@
+import math
+import time
+import random
+import struct
+import hashlib
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+import pandas as pd
+from offline_store import OfflineStore
+
+class HyperLogLog:
+    """Distinct-count sketch; 2**p one-byte registers, merged by taking the register-wise max."""
+
+    def __init__(self, p: int = 11, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value: Any):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        x = int.from_bytes(hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest(), "little")
+        index = x >> (64 - self.p)
+        rest = (x << self.p) & ((1 << 64) - 1)
+        rank = 64 - self.p + 1 if rest == 0 else (64 - rest.bit_length()) + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            return self.m * math.log(self.m / zeros)  # linear counting for small cardinalities
+        return estimate
+
+class KLLSketch:
+    """KLL quantile sketch: levels of compactors, an item at level h stands for 2**h inputs."""
+
+    def __init__(self, k: int = 200, levels: List[List[float]] = None):
+        self.k = k
+        self.levels: List[List[float]] = levels or [[]]
+        self.size = sum(len(level) for level in self.levels)
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        for h, level in enumerate(self.levels):
+            if len(level) >= self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append([])
+                level.sort()
+                # An odd item stays behind so the total weight is preserved exactly
+                keep = [level.pop()] if len(level) % 2 else []
+                self.levels[h + 1].extend(level[random.randint(0, 1)::2])
+                self.levels[h] = keep
+                break
+        self.size = sum(len(level) for level in self.levels)
+
+    def add(self, value: float):
+        self.levels[0].append(value)
+        self.size += 1
+        if self.size >= self._max_size():
+            self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.size = sum(len(level) for level in self.levels)
+        while self.size >= self._max_size():
+            self._compress()
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        weighted = sorted((value, 1 << h) for h, level in enumerate(self.levels) for value in level)
+        total = sum(weight for _, weight in weighted)
+        if not total:
+            return [None for _ in qs]
+        results = []
+        for q in qs:
+            target, seen = q * total, 0
+            for value, weight in weighted:
+                seen += weight
+                if seen >= target:
+                    results.append(value)
+                    break
+            else:
+                results.append(weighted[-1][0])
+        return results
+
+# count, nulls, numeric count, mean, M2, min, max
+_MOMENTS = struct.Struct("<QQQdddd")
+
+class FeatureSketch:
+    """Mergeable summary of one feature in one time bucket: null rate, Welford moments, KLL quantiles, HLL distinct count."""
+
+    def __init__(self):
+        self.count = 0
+        self.nulls = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.quantile_sketch = KLLSketch()
+        self.distinct = HyperLogLog()
+
+    def add(self, value: Any):
+        self.count += 1
+        # pd.NA / pd.NaT come from nullable pandas dtypes and count as missing, like None and NaN
+        if value is None or value is pd.NA or value is pd.NaT or (isinstance(value, float) and value != value):
+            self.nulls += 1
+            return
+        self.distinct.add(value)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Welford's online update
+            self.n += 1
+            delta = value - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (value - self.mean)
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.quantile_sketch.add(float(value))
+
+    def merge(self, other: "FeatureSketch"):
+        # Chan et al. parallel combination of the moments
+        n = self.n + other.n
+        if n:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.n * other.n / n
+            self.mean += delta * other.n / n
+        self.n = n
+        self.count += other.count
+        self.nulls += other.nulls
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        self.distinct.merge(other.distinct)
+
+    def summary(self) -> Dict[str, Any]:
+        p50, p90, p99 = self.quantile_sketch.quantiles([0.5, 0.9, 0.99])
+        return {
+            "count": self.count,
+            "null_rate": self.nulls / self.count if self.count else None,
+            "mean": self.mean if self.n else None,
+            "variance": self.m2 / (self.n - 1) if self.n > 1 else None,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "p50": p50,
+            "p90": p90,
+            "p99": p99,
+            "distinct_count": round(self.distinct.count()),
+        }
+
+    def to_bytes(self) -> bytes:
+        parts = [_MOMENTS.pack(self.count, self.nulls, self.n, self.mean, self.m2, self.min, self.max),
+                 struct.pack("<BH", self.distinct.p, self.quantile_sketch.k), bytes(self.distinct.registers),
+                 struct.pack("<H", len(self.quantile_sketch.levels))]
+        for level in self.quantile_sketch.levels:
+            parts.append(struct.pack("<I", len(level)))
+            parts.append(array("d", level).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FeatureSketch":
+        sketch = cls()
+        sketch.count, sketch.nulls, sketch.n, sketch.mean, sketch.m2, sketch.min, sketch.max = _MOMENTS.unpack_from(data, 0)
+        offset = _MOMENTS.size
+        p, k = struct.unpack_from("<BH", data, offset)
+        offset += 3
+        sketch.distinct = HyperLogLog(p, data[offset:offset + (1 << p)])
+        offset += 1 << p
+        (n_levels,) = struct.unpack_from("<H", data, offset)
+        offset += 2
+        levels = []
+        for _ in range(n_levels):
+            (length,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            levels.append(array("d", data[offset:offset + 8 * length]).tolist())
+            offset += 8 * length
+        sketch.quantile_sketch = KLLSketch(k, levels)
+        return sketch
+
+class StatisticsStore:
+    """Persists sketches as small blobs in a feature_statistics table of the offline store."""
+
+    TABLE = "feature_statistics"
+
+    def __init__(self, offline_store: OfflineStore):
+        self.offline_store = offline_store
+        if offline_store.read_only:
+            # Serving workers only query; the writer created the table
+            return
+        with offline_store.write_lock:
+            offline_store.cursor().execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    feature_view VARCHAR, feature VARCHAR, bucket_start DOUBLE, sketch BLOB,
+                    PRIMARY KEY (feature_view, feature, bucket_start))
+            """)
+
+    def merge_bucket(self, feature_view: str, bucket_start: float, sketches: Dict[str, FeatureSketch]):
+        """Fold in-memory sketches into whatever is already persisted for this bucket."""
+        with self.offline_store.write_lock:
+            cursor = self.offline_store.cursor()
+            for feature, sketch in sketches.items():
+                existing = cursor.execute(
+                    f"SELECT sketch FROM {self.TABLE} WHERE feature_view = ? AND feature = ? AND bucket_start = ?",
+                    [feature_view, feature, bucket_start]).fetchone()
+                if existing:
+                    merged = FeatureSketch.from_bytes(existing[0])
+                    merged.merge(sketch)
+                    sketch = merged
+                cursor.execute(f"INSERT OR REPLACE INTO {self.TABLE} VALUES (?, ?, ?, ?)",
+                               [feature_view, feature, bucket_start, sketch.to_bytes()])
+
+    def query(self, feature_view: str, start: float = None, end: float = None) -> Dict[str, Dict[str, Any]]:
+        """Merge all buckets in [start, end) and summarize each feature, without touching raw data."""
+        conditions, params = ["feature_view = ?"], [feature_view]
+        if start is not None:
+            conditions.append("bucket_start >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("bucket_start < ?")
+            params.append(end)
+        rows = self.offline_store.cursor().execute(
+            f"SELECT feature, sketch FROM {self.TABLE} WHERE {' AND '.join(conditions)}", params).fetchall()
+        merged: Dict[str, FeatureSketch] = {}
+        for feature, blob in rows:
+            sketch = FeatureSketch.from_bytes(blob)
+            if feature in merged:
+                merged[feature].merge(sketch)
+            else:
+                merged[feature] = sketch
+        return {feature: sketch.summary() for feature, sketch in merged.items()}
+
+class FeatureStatistics:
+    """Maintains per feature view, per time bucket sketches in memory and flushes them periodically."""
+
+    def __init__(self, store: StatisticsStore, bucket_seconds: int = 3600, flush_interval: float = 30.0):
+        self.store = store
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.buckets: Dict[Tuple[str, float], Dict[str, FeatureSketch]] = {}
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self.worker = None
+
+    def _bucket(self, event_time: Optional[float]) -> float:
+        event_time = time.time() if event_time is None else event_time
+        return event_time - event_time % self.bucket_seconds
+
+    def update_row(self, feature_view: str, row: Dict[str, Any], timestamp_field: str = None):
+        bucket = self._bucket(row.get(timestamp_field) if timestamp_field else None)
+        with self.lock:
+            sketches = self.buckets.setdefault((feature_view, bucket), {})
+            for feature, value in row.items():
+                sketch = sketches.get(feature)
+                if sketch is None:
+                    sketch = sketches[feature] = FeatureSketch()
+                sketch.add(value)
+
+    def update_frame(self, feature_view: str, df: pd.DataFrame, timestamp_field: str = None):
+        if timestamp_field and timestamp_field in df.columns:
+            groups = df.groupby(df[timestamp_field] - df[timestamp_field] % self.bucket_seconds)
+        else:
+            groups = [(self._bucket(None), df)]
+        for bucket, part in groups:
+            with self.lock:
+                sketches = self.buckets.setdefault((feature_view, float(bucket)), {})
+                for feature in part.columns:
+                    sketch = sketches.get(feature)
+                    if sketch is None:
+                        sketch = sketches[feature] = FeatureSketch()
+                    for value in part[feature].tolist():
+                        sketch.add(value)
+
+    def flush(self):
+        with self.lock:
+            buckets, self.buckets = self.buckets, {}
+        for (feature_view, bucket), sketches in buckets.items():
+            self.store.merge_bucket(feature_view, bucket, sketches)
+
+    def start(self):
+        def _flush_loop():
+            while not self._stop.wait(self.flush_interval):
+                self.flush()
+        self.worker = threading.Thread(target=_flush_loop, name="feature-statistics-flush", daemon=True)
+        self.worker.start()
+
+    def close(self):
+        self._stop.set()
+        if self.worker is not None:
+            self.worker.join()
+        self.flush()
@@ -0,0 +1,26 @@
+import zlib
+from numbers import Integral
+from typing import Any
+
+def stable_hash(key: Any) -> int:
+    """Process-independent hash for entity keys, unlike the builtin hash() which is salted for str.
+
+    Integral values (including numpy ints and floats like 3.0 produced by pandas upcasting)
+    hash to themselves so every writer and reader agrees on placement. Composite keys may be
+    tuples or lists (as they arrive in JSON); both hash alike.
+    """
+    if isinstance(key, bool):
+        return int(key)
+    if isinstance(key, Integral):
+        return int(key) & 0xFFFFFFFFFFFFFFFF
+    if isinstance(key, float) and key.is_integer():
+        return int(key) & 0xFFFFFFFFFFFFFFFF
+    if isinstance(key, (tuple, list)):
+        # Composite keys: mix component hashes in order (FNV-1a over 64-bit words), so (1, 2) != (2, 1)
+        h = 0xCBF29CE484222325
+        for component in key:
+            h = ((h ^ stable_hash(component)) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+        return h
+    if isinstance(key, bytes):
+        return zlib.crc32(key)
+    return zlib.crc32(str(key).encode("utf-8"))
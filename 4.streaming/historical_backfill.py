@@ -0,0 +1,137 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from feature_repository import FeatureView
+from offline_store import OfflineStore
+from materialization import Materializer
+from dtypes import ddl_type
+
+class HistoricalBackfill:
+    """Recomputes a feature view's offline history from raw events inside DuckDB.
+
+    Each feature is a SQL expression over the event table (Feature.sql, defaulting to the same
+    rule as StreamingProcessor._compute_features), so a whole history is one set-based query
+    instead of one Python call per event. The event time range is split into partitions that
+    run concurrently on separate cursors into a staging table; the result then replaces the
+    view's rows for that range in a single transaction, so readers see either the old or the
+    new history. Optionally the latest values are materialized to the online store afterwards.
+    """
+
+    def __init__(self, offline_store: OfflineStore, online_store: Any = None, num_partitions: int = 8,
+                 max_workers: int = 4, progress_callback: Optional[Callable[[str, int, int], None]] = None):
+        self.offline_store = offline_store
+        self.online_store = online_store
+        self.num_partitions = num_partitions
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback or self._print_progress
+
+    @staticmethod
+    def _print_progress(feature_view_name: str, done: int, total: int):
+        print(f"Backfilling {feature_view_name}: {done}/{total} partitions")
+
+    def _timestamp_field(self, feature_view: FeatureView) -> str:
+        if not feature_view.timestamp_field:
+            raise ValueError(f"Feature view {feature_view.name} has no timestamp_field to partition by")
+        return feature_view.timestamp_field
+
+    def feature_sql(self, feature_view: FeatureView, event_columns: List[str]) -> Dict[str, str]:
+        """SELECT expression per output column, cast to the column's compact type."""
+        dtypes = feature_view.column_dtypes()
+        expressions = {entity: entity for entity in feature_view.entities}
+        for feature in feature_view.features:
+            if feature.sql:
+                expression = feature.sql
+            elif feature.name in event_columns:
+                expression = f"COALESCE({feature.name}, 0)"
+            else:
+                expression = "0"
+            expressions[feature.name] = f"CAST({expression} AS {ddl_type(dtypes[feature.name])})"
+        return expressions
+
+    def _partitions(self, low: Any, high: Any) -> List[Tuple[Any, Any, bool]]:
+        """Split [low, high] into equal time ranges; the flag marks the last, closed, range."""
+        step = (high - low) / self.num_partitions
+        if not step:
+            return [(low, high, True)]
+        bounds = [low + step * i for i in range(self.num_partitions)] + [high]
+        return [(bounds[i], bounds[i + 1], i == self.num_partitions - 1) for i in range(self.num_partitions)]
+
+    def run(self, feature_view: FeatureView, events: str, start: Any = None, end: Any = None,
+            event_time_column: Optional[str] = None, lookback: Any = None, materialize: bool = False) -> int:
+        """Recompute feature_view from the events table (or any FROM expression) for event times in [start, end].
+
+        Window functions should only look backwards in event time, as a streaming computation
+        would. They see events before each partition only as far back as `lookback` (an interval
+        in event-time units); None means the whole history, which is always correct but scans
+        more. Returns the number of rows written.
+        """
+        timestamp_field = self._timestamp_field(feature_view)
+        time_column = event_time_column or timestamp_field
+        cursor = self.offline_store.cursor()
+        event_columns = [column[0] for column in cursor.execute(f"SELECT * FROM {events} LIMIT 0").description]
+        expressions = self.feature_sql(feature_view, event_columns)
+        columns = list(expressions)
+
+        if start is None or end is None:
+            low, high = cursor.execute(f"SELECT MIN({time_column}), MAX({time_column}) FROM {events}").fetchone()
+            start = low if start is None else start
+            end = high if end is None else end
+        if start is None or end is None:
+            return 0
+
+        staging = f"{feature_view.name}__backfill_{uuid.uuid4().hex[:8]}"
+        with self.offline_store.write_lock:
+            cursor.execute(f"CREATE TABLE {staging} AS SELECT {', '.join(columns)} FROM {feature_view.name} LIMIT 0")
+
+        select_list = ", ".join(f"{expression} AS {name}" for name, expression in expressions.items())
+
+        def _compute(partition: Tuple[Any, Any, bool]) -> int:
+            low, high, last = partition
+            # Window functions need earlier events as context, but only rows in [low, high) are kept
+            context = "" if lookback is None else f" AND {time_column} >= ?"
+            params = [high] + ([] if lookback is None else [low - lookback]) + [low, high]
+            upper = "<=" if last else "<"
+            query = f"""
+                INSERT INTO {staging} ({', '.join(columns)})
+                SELECT {', '.join(columns)} FROM (
+                    SELECT {select_list}, {time_column} AS __event_time
+                    FROM {events} WHERE {time_column} {upper} ?{context}
+                ) WHERE __event_time >= ? AND __event_time {upper} ?
+            """
+            partition_cursor = self.offline_store.conn.cursor()
+            try:
+                return partition_cursor.execute(query, params).fetchone()[0]
+            finally:
+                partition_cursor.close()
+
+        partitions = self._partitions(start, end)
+        written = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="historical-backfill") as executor:
+                for done, count in enumerate(executor.map(_compute, partitions), start=1):
+                    written += count
+                    self.progress_callback(feature_view.name, done, len(partitions))
+            self._swap(feature_view, staging, columns, timestamp_field, start, end)
+        finally:
+            with self.offline_store.write_lock:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+
+        if materialize and self.online_store is not None:
+            # Re-publish the latest row of every entity; rows recomputed above may now be the latest
+            Materializer(self.offline_store, self.online_store).materialize(feature_view)
+        return written
+
+    def _swap(self, feature_view: FeatureView, staging: str, columns: List[str], timestamp_field: str,
+              start: Any, end: Any):
+        """Replace the view's offline rows in [start, end] with the staged ones in one transaction."""
+        cursor = self.offline_store.cursor()
+        with self.offline_store.write_lock:
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                cursor.execute(f"DELETE FROM {feature_view.name} WHERE {timestamp_field} >= ? AND {timestamp_field} <= ?",
+                               [start, end])
+                cursor.execute(f"INSERT INTO {feature_view.name} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging}")
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
@@ -1,39 +1,69 @@
+import os
 from feature_repository import FeatureRepository, FeatureView, Feature
 from offline_store import OfflineStore
 from online_store import OnlineStore
+from memory_store import ShardedMemoryStore
+from sharded_online_store import ShardedOnlineStore
+from packed_store import PackedOnlineStore
+from snapshot_store import SnapshotOnlineStore, SnapshotRefresher
 from data_ingestion import ingest_data
+from feature_statistics import FeatureStatistics, StatisticsStore
 from feature_serving import app, FeatureStoreService
+from profiling import install_signal_handlers
 import pandas as pd
 
-def setup_feature_store():
-    # Initialize components
+def create_feature_repository():
     feature_repo = FeatureRepository()
-    offline_store = OfflineStore("offline_store.db")
-    online_store = OnlineStore("online_store.db")
 
     # Create a sample feature view
     customer_features = FeatureView(
         name="customer_features",
         features=[
-            Feature(name="age", dtype="INTEGER"),
-            Feature(name="total_purchases", dtype="FLOAT"),
-            Feature(name="loyalty_score", dtype="FLOAT"),
+            Feature(name="age", dtype="int8"),
+            # Defaults are served when a lookup is shed or misses its deadline
+            Feature(name="total_purchases", dtype="float32", default=0.0),
+            Feature(name="loyalty_score", dtype="float32", default=0.5),
         ],
         entities=["customer_id"],
         ttl=86400,  # 1 day
         version=1
     )
     feature_repo.create_feature_view(customer_features)
+    return feature_repo
+
+SNAPSHOT_DIR = "snapshots"
+# Snapshots are rebuilt from online_store.db this often, so writes from run_streaming_processor are served
+SNAPSHOT_REFRESH_SECONDS = float(os.environ.get("FEATURE_STORE_SNAPSHOT_REFRESH", "60"))
+# Lookups arriving within this many seconds of each other are merged into one batch query
+COALESCE_WINDOW = 0.0002
+
+def online_backend():
+    return os.environ.get("FEATURE_STORE_ONLINE_BACKEND", "sqlite")
+
+def create_online_store(read_only: bool = False):
+    backend = online_backend()
+    if backend == "memory":
+        return ShardedMemoryStore(num_shards=int(os.environ.get("FEATURE_STORE_SHARDS", "16")))
+    if backend == "sharded_sqlite":
+        return ShardedOnlineStore("online_store.db", num_shards=int(os.environ.get("FEATURE_STORE_SHARDS", "4")), read_only=read_only)
+    if backend == "packed":
+        return PackedOnlineStore("online_store.packed.db", read_only=read_only)
+    if backend == "snapshot" and read_only:
+        return SnapshotOnlineStore(SNAPSHOT_DIR)
+    return OnlineStore("online_store.db", read_only=read_only)
+
+def setup_feature_store():
+    # Initialize components
+    feature_repo = create_feature_repository()
+    offline_store = OfflineStore("offline_store.db")
+    online_store = create_online_store()
 
-    # Create tables in offline and online stores
-    schema = {
-        "customer_id": "INTEGER PRIMARY KEY",
-        "age": "INTEGER",
-        "total_purchases": "FLOAT",
-        "loyalty_score": "FLOAT"
-    }
-    offline_store.create_table("customer_features", schema)
-    online_store.create_table("customer_features", schema)
+    # Create tables in offline and online stores; the schema comes from the feature view's dtypes
+    customer_features = feature_repo.get_feature_view("customer_features")
+    schema = customer_features.table_schema(primary_key=True)
+    offline_store.create_table("customer_features", schema, customer_features.column_dtypes())
+    online_store.create_table("customer_features", schema, ttl=customer_features.ttl)
+    online_store.start_ttl_sweeper()
 
     # Sample data ingestion
     sample_data = pd.DataFrame({
@@ -42,20 +72,66 @@ def setup_feature_store():
         "total_purchases": [100.0, 500.0, 250.0],
         "loyalty_score": [0.5, 0.9, 0.7]
     })
-    ingest_data(sample_data, offline_store, online_store, "customer_features")
+    statistics_store = StatisticsStore(offline_store)
+    statistics = FeatureStatistics(statistics_store)
+    ingest_data(sample_data, offline_store, online_store, "customer_features", statistics)
+    statistics.flush()
 
-    return FeatureStoreService(feature_repo, online_store)
+    return FeatureStoreService(feature_repo, online_store, fast_responses=True, statistics_store=statistics_store,
+                               coalesce_window=COALESCE_WINDOW)
+
+def create_serving_service():
+    """Build a per-worker service with its own repository and read-only online and offline store handles."""
+    feature_repo = create_feature_repository()
+    online_store = create_online_store(read_only=True)
+    for name in feature_repo.list_feature_views():
+        online_store.set_ttl(name, feature_repo.get_feature_view(name).ttl)
+    statistics_store = StatisticsStore(OfflineStore("offline_store.db", read_only=True))
+    return FeatureStoreService(feature_repo, online_store, fast_responses=True, statistics_store=statistics_store,
+                               coalesce_window=COALESCE_WINDOW)
+
+def build_snapshots(feature_store_service) -> SnapshotRefresher:
+    """Compile every feature view in the online store into a memory-mapped snapshot and keep rebuilding them."""
+    refresher = SnapshotRefresher(feature_store_service.online_store, feature_store_service.feature_repo,
+                                  SNAPSHOT_DIR, SNAPSHOT_REFRESH_SECONDS)
+    refresher.refresh()
+    refresher.start()
+    return refresher
+
+# Worker processes import this module and build their service in the app's lifespan hook
+app.state.feature_store_service_factory = create_serving_service
 
 def main():
+    import uvicorn
+    workers = int(os.environ.get("FEATURE_STORE_WORKERS", "1"))
+
+    if workers > 1 and online_backend() == "memory":
+        raise ValueError("The in-memory online store cannot be shared across worker processes")
+
+    # SIGUSR1 dumps thread stacks, SIGUSR2 toggles a sampling profile (see profiling.py)
+    install_signal_handlers(os.environ.get("FEATURE_STORE_PROFILE_DIR", "profiles"))
+
     # Set up the feature store
     feature_store_service = setup_feature_store()
-    
+
+    if workers > 1 or online_backend() == "snapshot":
+        # Flush pending writes; serving then opens its own read-only handles
+        feature_store_service.close()
+        feature_store_service.online_store.close()
+        # DuckDB lets several processes read a file only once no process has it open for writing
+        feature_store_service.statistics_store.offline_store.close()
+        if online_backend() == "snapshot":
+            build_snapshots(feature_store_service)
+        if workers > 1:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+            return
+        feature_store_service = create_serving_service()
+
     # Add the feature store service to the app's state
     app.state.feature_store_service = feature_store_service
 
     # Run the API server
-    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,111 @@
+import os
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+from feature_repository import FeatureView
+from offline_store import OfflineStore
+
+class Materializer:
+    """Copies the latest offline row per entity into the online store.
+
+    materialize() loads an explicit event-time range; materialize_incremental() loads only
+    rows newer than the view's watermark from the previous run and then advances it.
+    """
+
+    def __init__(self, offline_store: OfflineStore, online_store: Any,
+                 watermark_path: str = "materialization_watermarks.json", chunk_size: int = 10000,
+                 progress_callback: Optional[Callable[[str, int, Optional[int]], None]] = None):
+        self.offline_store = offline_store
+        self.online_store = online_store
+        self.watermark_path = watermark_path
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback or self._print_progress
+
+    @staticmethod
+    def _print_progress(feature_view_name: str, written: int, total: Optional[int]):
+        print(f"Materializing {feature_view_name}: {written}/{total} rows" if total is not None
+              else f"Materializing {feature_view_name}: {written} rows")
+
+    def _load_watermarks(self) -> Dict[str, Any]:
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path) as f:
+            return json.load(f)
+
+    def get_watermark(self, feature_view_name: str) -> Any:
+        entry = self._load_watermarks().get(feature_view_name)
+        if entry is None:
+            return None
+        if entry["type"] == "datetime":
+            return datetime.fromisoformat(entry["value"])
+        return entry["value"]
+
+    def set_watermark(self, feature_view_name: str, value: Any):
+        watermarks = self._load_watermarks()
+        if isinstance(value, datetime):
+            watermarks[feature_view_name] = {"type": "datetime", "value": value.isoformat()}
+        else:
+            watermarks[feature_view_name] = {"type": "number", "value": value}
+        tmp_path = f"{self.watermark_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(watermarks, f)
+        os.replace(tmp_path, self.watermark_path)
+
+    def _timestamp_field(self, feature_view: FeatureView) -> str:
+        if not feature_view.timestamp_field:
+            raise ValueError(f"Feature view {feature_view.name} has no timestamp_field to materialize by")
+        return feature_view.timestamp_field
+
+    def materialize(self, feature_view: FeatureView, start: Any = None, end: Any = None) -> int:
+        """Write the latest row per entity with start < event time <= end to the online store.
+
+        The result is streamed from DuckDB in chunks, so progress reports carry no total. Raises if
+        the query fails or any online write is rejected, so a caller never records a partial run.
+        """
+        entity_columns = feature_view.entities
+        timestamp_field = self._timestamp_field(feature_view)
+        conditions, params = [], []
+        if start is not None:
+            conditions.append(f"{timestamp_field} > ?")
+            params.append(start)
+        if end is not None:
+            conditions.append(f"{timestamp_field} <= ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # Deduplicate inside DuckDB so only one row per entity leaves the offline store
+        query = f"""
+            SELECT * FROM {feature_view.name} {where}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(entity_columns)} ORDER BY {timestamp_field} DESC) = 1
+        """
+        failures = getattr(self.online_store, "failed_writes", 0)
+        written = 0
+        for frame in self.offline_store.iter_query(query, params, chunk_size=self.chunk_size, raise_errors=True):
+            # DuckDB hands out whole vectors; split them so each online write stays small
+            for offset in range(0, len(frame), self.chunk_size):
+                chunk = frame.iloc[offset:offset + self.chunk_size]
+                self.online_store.upsert_data(feature_view.name, chunk, entity_columns)
+                written += len(chunk)
+                self.progress_callback(feature_view.name, written, None)
+        self.online_store.flush()
+        failed = getattr(self.online_store, "failed_writes", 0) - failures
+        if failed:
+            raise RuntimeError(f"{failed} online writes failed while materializing {feature_view.name}")
+        return written
+
+    def materialize_incremental(self, feature_view: FeatureView) -> int:
+        """Materialize rows newer than the stored watermark, then move the watermark forward."""
+        timestamp_field = self._timestamp_field(feature_view)
+        # Fix the upper bound before reading so rows arriving mid-run are picked up next time
+        result = self.offline_store.execute_query(f"SELECT MAX({timestamp_field}) AS watermark FROM {feature_view.name}")
+        if result.empty or result["watermark"].isna().iloc[0]:
+            return 0
+        end = result["watermark"].iloc[0]
+        end = end.to_pydatetime() if hasattr(end, "to_pydatetime") else end.item() if hasattr(end, "item") else end
+
+        start = self.get_watermark(feature_view.name)
+        if start is not None and end <= start:
+            return 0
+        # materialize raises on any failed write, so the watermark only moves past rows that were stored
+        written = self.materialize(feature_view, start, end)
+        self.set_watermark(feature_view.name, end)
+        return written
@@ -0,0 +1,257 @@
+import os
+import time
+import pickle
+from array import array
+from itertools import islice
+from threading import Lock, Thread, Event
+from typing import Dict, Any, List, Optional, Union
+import pandas as pd
+from dtypes import struct_code, coerce, float32_value, python_values
+from entity_keys import EntityColumns, key_columns, key_value, row_key, split_primary_key
+from hashing import stable_hash
+
+def _array_typecode(dtype: str) -> Optional[str]:
+    """Narrowest array typecode for a DDL type; None means the column is stored in a plain list."""
+    try:
+        code = struct_code(dtype)
+    except ValueError:
+        return None
+    return "b" if code == "?" else code
+
+class _Shard:
+    """One partition of a table: an entity -> slot map plus one column per feature, indexed by slot."""
+
+    def __init__(self, columns: Dict[str, Optional[str]]):
+        self.lock = Lock()
+        self.slots: Dict[Any, int] = {}
+        self.columns = {name: (array(code) if code else []) for name, code in columns.items()}
+        self.float32 = [name for name, code in columns.items() if code == "f"]
+        # One validity byte per slot and column; typed arrays cannot hold None
+        self.valid = {name: bytearray() for name in columns}
+        self.ingested_at = array("d")
+        # Slots released by the TTL sweeper, reused before the columns grow
+        self.free_slots: List[int] = []
+
+    def upsert(self, key: Any, row: Dict[str, Any], ingested_at: float = None):
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None and self.free_slots:
+                slot = self.free_slots.pop()
+                self.slots[key] = slot
+                for valid in self.valid.values():
+                    valid[slot] = 0
+            elif slot is None:
+                slot = len(self.ingested_at)
+                self.slots[key] = slot
+                for name, column in self.columns.items():
+                    column.append(0 if isinstance(column, array) else None)
+                    self.valid[name].append(0)
+                self.ingested_at.append(0.0)
+            self.ingested_at[slot] = time.time() if ingested_at is None else ingested_at
+            for name, value in row.items():
+                column = self.columns.get(name)
+                if column is None:
+                    continue
+                if value is None or value != value:  # None or NaN
+                    self.valid[name][slot] = 0
+                    continue
+                if isinstance(column, array):
+                    value = coerce(value, column.typecode)
+                column[slot] = value
+                self.valid[name][slot] = 1
+
+    def add_column(self, name: str, code: Optional[str]):
+        with self.lock:
+            n = len(self.ingested_at)
+            self.columns[name] = array(code, [0]) * n if code else [None] * n
+            if code == "f":
+                self.float32.append(name)
+            self.valid[name] = bytearray(n)
+
+    def fill(self, key: Any, row: Dict[str, Any]):
+        """Set only the columns that are still unset for an existing entity; ingest time is unchanged."""
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                return
+            for name, value in row.items():
+                column = self.columns.get(name)
+                if column is None or self.valid[name][slot] or value is None or value != value:
+                    continue
+                column[slot] = coerce(value, column.typecode) if isinstance(column, array) else value
+                self.valid[name][slot] = 1
+
+    def get(self, key: Any, cutoff: float = None) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            slot = self.slots.get(key)
+            if slot is None or (cutoff is not None and self.ingested_at[slot] < cutoff):
+                return None
+            row = {name: (column[slot] if self.valid[name][slot] else None) for name, column in self.columns.items()}
+            for name in self.float32:
+                if row[name] is not None:
+                    row[name] = float32_value(row[name])
+        return row
+
+    def sweep(self, cutoff: float, batch_size: int) -> int:
+        """Release up to batch_size expired slots; the lock is held for one bounded batch only."""
+        with self.lock:
+            expired = list(islice((key for key, slot in self.slots.items() if self.ingested_at[slot] < cutoff), batch_size))
+            for key in expired:
+                slot = self.slots.pop(key)
+                for name, column in self.columns.items():
+                    if not isinstance(column, array):
+                        column[slot] = None
+                self.free_slots.append(slot)
+            return len(expired)
+
+class _Table:
+    def __init__(self, schema: Dict[str, str], num_shards: int):
+        self.schema = schema
+        # The entity key is the PRIMARY KEY column(s) if declared, otherwise the first column;
+        # composite keys are stored as tuples
+        self.key_columns = split_primary_key(schema)[1]
+        columns = {name: _array_typecode(dtype) for name, dtype in schema.items()}
+        self.shards = [_Shard(columns) for _ in range(num_shards)]
+
+    def add_columns(self, columns: Dict[str, str]):
+        for name, dtype in columns.items():
+            if name not in self.schema:
+                self.schema[name] = dtype
+                for shard in self.shards:
+                    shard.add_column(name, _array_typecode(dtype))
+
+    def shard_for(self, key: Any) -> _Shard:
+        # Not the builtin hash(): it is salted for str, so a snapshot would reload into different shards
+        return self.shards[stable_hash(key) % len(self.shards)]
+
+class ShardedMemoryStore:
+    """In-process online store with entities hash-partitioned across lock-striped shards.
+
+    Drop-in for OnlineStore in StreamingProcessor and FeatureStoreService: writes are
+    upserts applied synchronously, and reads and writes on different shards never contend.
+    """
+
+    def __init__(self, num_shards: int = 16, snapshot_path: Optional[str] = None):
+        self.num_shards = num_shards
+        self.snapshot_path = snapshot_path
+        self.tables: Dict[str, _Table] = {}
+        self.ttls: Dict[str, int] = {}
+        self.sweeper = None
+        self._stop_sweeper = Event()
+        self._tables_lock = Lock()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot(snapshot_path)
+
+    def create_table(self, table_name: str, schema: Dict[str, str], ttl: Optional[int] = None):
+        if ttl is not None:
+            self.set_ttl(table_name, ttl)
+        with self._tables_lock:
+            if table_name not in self.tables:
+                self.tables[table_name] = _Table(schema, self.num_shards)
+
+    def set_ttl(self, table_name: str, ttl: int):
+        self.ttls[table_name] = ttl
+
+    def insert_data(self, table_name: str, data: Union[Dict[str, Any], pd.DataFrame]):
+        table = self.tables[table_name]
+        if isinstance(data, dict):
+            rows = [data]
+        elif isinstance(data, pd.DataFrame):
+            rows = python_values(data).to_dict("records")
+        else:
+            raise ValueError("Data must be either a dictionary or a pandas DataFrame")
+        for row in rows:
+            key = row_key(row, table.key_columns)
+            table.shard_for(key).upsert(key, row)
+
+    def upsert_data(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        # Writes are already upserts keyed on the table's entity column
+        self.insert_data(table_name, data)
+
+    def add_columns(self, table_name: str, columns: Dict[str, str]):
+        self.tables[table_name].add_columns(columns)
+
+    def fill_missing(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        table = self.tables[table_name]
+        for row in python_values(data).to_dict("records"):
+            key = row_key(row, table.key_columns)
+            table.shard_for(key).fill(key, row)
+
+    def flush(self):
+        pass
+
+    def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Dict[str, Any]:
+        table = self.tables.get(table_name)
+        if table is None:
+            return None
+        if key_columns(entity_column) != table.key_columns:
+            raise ValueError(f"{table_name} is keyed by {table.key_columns}, not {entity_column}")
+        key = key_value(entity_value, table.key_columns)
+        ttl = self.ttls.get(table_name)
+        return table.shard_for(key).get(key, None if ttl is None else time.time() - ttl)
+
+    def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        return [self.get_online_features(table_name, entity_column, value) for value in entity_values]
+
+    def sweep_expired(self, batch_size: int = 1000):
+        now = time.time()
+        for table_name, ttl in list(self.ttls.items()):
+            table = self.tables.get(table_name)
+            if table is None:
+                continue
+            for shard in table.shards:
+                while shard.sweep(now - ttl, batch_size) >= batch_size and not self._stop_sweeper.is_set():
+                    pass
+
+    def start_ttl_sweeper(self, interval: float = 60.0, batch_size: int = 1000):
+        if self.sweeper is not None:
+            return
+
+        def _sweep_loop():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep_expired(batch_size)
+
+        self.sweeper = Thread(target=_sweep_loop, name="memory-store-ttl-sweeper")
+        self.sweeper.daemon = True
+        self.sweeper.start()
+
+    def save_snapshot(self, path: Optional[str] = None):
+        """Write every shard to disk; each shard is copied under its own lock, so writers are paused one shard at a time."""
+        path = path or self.snapshot_path
+        state = {}
+        for table_name, table in list(self.tables.items()):
+            shards = []
+            for shard in table.shards:
+                with shard.lock:
+                    shards.append({
+                        "slots": dict(shard.slots),
+                        "columns": {name: (column[:] if isinstance(column, array) else list(column)) for name, column in shard.columns.items()},
+                        "valid": {name: bytes(valid) for name, valid in shard.valid.items()},
+                        "ingested_at": shard.ingested_at[:],
+                    })
+            state[table_name] = {"schema": table.schema, "shards": shards}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"num_shards": self.num_shards, "ttls": dict(self.ttls), "tables": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        for table_name, table_state in state["tables"].items():
+            table = _Table(table_state["schema"], self.num_shards)
+            # Re-insert through the shard router so a different shard count still works
+            for shard_state in table_state["shards"]:
+                for key, slot in shard_state["slots"].items():
+                    row = {name: (column[slot] if shard_state["valid"][name][slot] else None)
+                           for name, column in shard_state["columns"].items()}
+                    table.shard_for(key).upsert(key, row, shard_state["ingested_at"][slot])
+            self.tables[table_name] = table
+        self.ttls.update(state.get("ttls", {}))
+
+    def close(self):
+        self._stop_sweeper.set()
+        if self.snapshot_path:
+            self.save_snapshot()
@@ -1,24 +1,83 @@
 import duckdb
 import pandas as pd
 import os
-from typing import Dict, Any, List, Union
+import uuid
+import threading
+from contextlib import contextmanager
+from queue import Queue, Full
+from typing import Dict, Any, List, Union, Iterator
+from dtypes import apply_pandas_dtypes
+from entity_keys import EntityColumns, key_columns, key_value, columns_ddl
+
+# DuckDB materializes results in vectors of this many rows
+DUCKDB_VECTOR_SIZE = 2048
+
+# Default number of queries each workload may run at once against the shared database
+DEFAULT_WORKLOAD_CONCURRENCY = {"monitoring": 1, "consistency": 2, "export": 2, "backfill": 1}
 
 class OfflineStore:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, threads: int = None, workload_concurrency: Dict[str, int] = None,
+                 read_only: bool = False):
         self.db_path = db_path
+        # Read-only handles (one per serving worker) open the existing file instead of recreating it
+        self.read_only = read_only
         self.conn = None
+        # DuckDB's worker pool is shared by the whole database, so `threads` bounds intra-query
+        # parallelism for everyone; workloads are throttled by how many queries they run at once.
+        self.threads = threads
+        self.workload_slots = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in {**DEFAULT_WORKLOAD_CONCURRENCY, **(workload_concurrency or {})}.items()
+        }
+        self.schemas: Dict[str, Dict[str, str]] = {}
+        # Logical column dtypes per table (FeatureView.column_dtypes); reads are cast to them
+        self.dtypes: Dict[str, Dict[str, str]] = {}
+        self.compacted_rowids: Dict[str, int] = {}
+        # Inserts and appends that failed (errors are printed, not raised)
+        self.failed_writes = 0
+        # Writers are serialized; readers each use their own thread-local cursor
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._cursors = []
+        self._cursors_lock = threading.Lock()
         self.connect()
 
     def connect(self):
         try:
-            if os.path.exists(self.db_path):
-                os.remove(self.db_path)  # Remove the existing file to avoid locking issues
-            self.conn = duckdb.connect(self.db_path)
+            if self.read_only:
+                self.conn = duckdb.connect(self.db_path, read_only=True)
+            else:
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)  # Remove the existing file to avoid locking issues
+                self.conn = duckdb.connect(self.db_path)
+            if self.threads:
+                self.conn.execute(f"SET threads TO {int(self.threads)}")
+            self._local = threading.local()
         except Exception as e:
             print(f"Error connecting to DuckDB: {e}")
             self.conn = None
 
-    def create_table(self, table_name: str, schema: Dict[str, str]):
+    def cursor(self):
+        """Return this thread's cursor on the shared database, creating it on first use."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.conn.cursor()
+            self._local.cursor = cursor
+            with self._cursors_lock:
+                self._cursors.append(cursor)
+        return cursor
+
+    @contextmanager
+    def workload(self, name: str):
+        """Limit how many queries of one kind (monitoring, consistency, export, ...) run at once."""
+        slots = self.workload_slots.get(name)
+        if slots is None:
+            yield self
+            return
+        with slots:
+            yield self
+
+    def create_table(self, table_name: str, schema: Dict[str, str], dtypes: Dict[str, str] = None):
         if self.conn is None:
             print("No connection to DuckDB. Trying to reconnect...")
             self.connect()
@@ -26,18 +85,51 @@ class OfflineStore:
                 print("Failed to reconnect. Cannot create table.")
                 return
 
-        columns = ", ".join([f"{name} {dtype}" for name, dtype in schema.items()])
+        # Several PRIMARY KEY columns become one composite primary key (an ART index in DuckDB)
+        columns = columns_ddl(schema)
         try:
-            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+            with self.write_lock:
+                self.cursor().execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+            self.schemas[table_name] = schema
+            if dtypes:
+                self.dtypes[table_name] = dtypes
         except Exception as e:
             print(f"Error creating table: {e}")
 
+    def add_columns(self, table_name: str, columns: Dict[str, str], dtypes: Dict[str, str] = None):
+        """Additive schema change, also applied to the compacted <table>_latest when it exists."""
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot alter table.")
+                return
+
+        try:
+            with self.write_lock:
+                cursor = self.cursor()
+                tables = [table_name]
+                if cursor.execute("SELECT 1 FROM information_schema.tables WHERE table_name = ?",
+                                  [f"{table_name}_latest"]).fetchone():
+                    tables.append(f"{table_name}_latest")
+                for table in tables:
+                    for name, dtype in columns.items():
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {dtype}")
+            if table_name in self.schemas:
+                self.schemas[table_name].update(columns)
+            if dtypes:
+                self.dtypes.setdefault(table_name, {}).update(dtypes)
+        except Exception as e:
+            print(f"Error altering table: {e}")
+
     def insert_data(self, table_name: str, data: Union[Dict[str, Any], pd.DataFrame]):
         if self.conn is None:
             print("No connection to DuckDB. Trying to reconnect...")
             self.connect()
             if self.conn is None:
                 print("Failed to reconnect. Cannot insert data.")
+                # Counted like any other rejected write, so callers such as the write-ahead log retry it
+                self.failed_writes += 1
                 return
 
         if isinstance(data, dict):
@@ -47,13 +139,147 @@ class OfflineStore:
         else:
             raise ValueError("Data must be either a dictionary or a pandas DataFrame")
         
+        # A unique view name keeps concurrent inserts from clobbering each other's data
+        view_name = f"data_df_{uuid.uuid4().hex}"
+        cursor = self.cursor()
         try:
-            self.conn.register('data_df', df)
-            self.conn.execute(f"INSERT INTO {table_name} SELECT * FROM data_df")
+            with self.write_lock:
+                cursor.register(view_name, df)
+                try:
+                    cursor.execute(f"INSERT INTO {table_name} SELECT * FROM {view_name}")
+                finally:
+                    cursor.unregister(view_name)
         except Exception as e:
+            self.failed_writes += 1
             print(f"Error inserting data: {e}")
 
-    def get_batch_features(self, table_name: str, entity_column: str, entity_values: List[Any]) -> pd.DataFrame:
+    def append_data(self, table_name: str, df: pd.DataFrame):
+        """Bulk-load a DataFrame through DuckDB's appender, matching columns to the table schema by name."""
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot append data.")
+                # Counted like any other rejected write, so callers such as the write-ahead log retry it
+                self.failed_writes += 1
+                return
+
+        if table_name in self.schemas:
+            df = df.reindex(columns=list(self.schemas[table_name]))
+        try:
+            with self.write_lock:
+                self.cursor().append(table_name, df)
+        except Exception as e:
+            self.failed_writes += 1
+            print(f"Error appending data: {e}")
+
+    def append_missing(self, table_name: str, df: pd.DataFrame, key_columns: List[str]):
+        """Append only the rows whose key_columns values are not in the table yet, so re-appending is a no-op."""
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot append data.")
+                # Counted like any other rejected write, so callers such as the write-ahead log retry it
+                self.failed_writes += 1
+                return
+
+        if table_name in self.schemas:
+            df = df.reindex(columns=list(self.schemas[table_name]))
+        columns = ", ".join(df.columns)
+        match = " AND ".join(f"t.{column} IS NOT DISTINCT FROM d.{column}" for column in key_columns)
+        view_name = f"data_df_{uuid.uuid4().hex}"
+        cursor = self.cursor()
+        try:
+            with self.write_lock:
+                cursor.register(view_name, df)
+                try:
+                    cursor.execute(f"""
+                        INSERT INTO {table_name} ({columns})
+                        SELECT {columns} FROM {view_name} d
+                        WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {match})
+                    """)
+                finally:
+                    cursor.unregister(view_name)
+        except Exception as e:
+            self.failed_writes += 1
+            print(f"Error appending data: {e}")
+
+    def compact_latest(self, table_name: str, key_column: EntityColumns, order_column: str = None) -> int:
+        """Fold rows appended since the last compaction into <table>_latest, one row per entity.
+
+        The history table stays append-only, so DuckDB's rowid marks how far compaction has got.
+        Returns the number of entities refreshed.
+        """
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot compact table.")
+                return 0
+
+        latest_table = f"{table_name}_latest"
+        key_names = key_columns(key_column)
+        delta_table = f"{table_name}_delta"
+        same_key = " AND ".join(f"l.{name} = {delta_table}.{name}" for name in key_names)
+        last_rowid = self.compacted_rowids.get(table_name, -1)
+        order_by = f"{order_column} DESC, rowid DESC" if order_column else "rowid DESC"
+        cursor = self.cursor()
+        self.write_lock.acquire()
+        try:
+            max_rowid = cursor.execute(f"SELECT MAX(rowid) FROM {table_name}").fetchone()[0]
+            if max_rowid is None or max_rowid <= last_rowid:
+                return 0
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {latest_table} AS SELECT * FROM {table_name} LIMIT 0")
+            cursor.execute("BEGIN TRANSACTION")
+            cursor.execute(f"""
+                CREATE OR REPLACE TEMP TABLE {table_name}_delta AS
+                SELECT * FROM {table_name} WHERE rowid > ? AND rowid <= ?
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {', '.join(key_names)} ORDER BY {order_by}) = 1
+            """, [last_rowid, max_rowid])
+            if order_column:
+                # Drop delta rows that are older than what the snapshot already holds
+                cursor.execute(f"""
+                    DELETE FROM {table_name}_delta WHERE EXISTS (
+                        SELECT 1 FROM {latest_table} l
+                        WHERE {same_key}
+                          AND l.{order_column} > {table_name}_delta.{order_column})
+                """)
+            cursor.execute(f"DELETE FROM {latest_table} l WHERE EXISTS (SELECT 1 FROM {delta_table} WHERE {same_key})")
+            cursor.execute(f"INSERT INTO {latest_table} SELECT * FROM {table_name}_delta")
+            refreshed = cursor.execute(f"SELECT COUNT(*) FROM {table_name}_delta").fetchone()[0]
+            cursor.execute(f"DROP TABLE {table_name}_delta")
+            cursor.execute("COMMIT")
+            self.compacted_rowids[table_name] = max_rowid
+            return refreshed
+        except Exception as e:
+            print(f"Error compacting table: {e}")
+            try:
+                cursor.execute("ROLLBACK")
+            except Exception:
+                pass
+            return 0
+        finally:
+            self.write_lock.release()
+
+    def _apply_dtypes(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        # fetchdf widens integer columns containing NULLs to float64; cast back to the compact nullable dtypes
+        dtypes = self.dtypes.get(table_name)
+        return apply_pandas_dtypes(df, dtypes) if dtypes else df
+
+    @staticmethod
+    def _entity_filter(table_name: str, entity_column: EntityColumns, entity_values: List[Any], view_name: str):
+        """Frame of the requested keys to register as view_name, and the WHERE condition matching them."""
+        key_names = key_columns(entity_column)
+        if len(key_names) == 1:
+            frame = pd.DataFrame({key_names[0]: entity_values})
+            return frame, f"{key_names[0]} IN (SELECT {key_names[0]} FROM {view_name})"
+        frame = pd.DataFrame([key_value(value, key_names) for value in entity_values], columns=key_names)
+        same_key = " AND ".join(f"{view_name}.{name} = {table_name}.{name}" for name in key_names)
+        # DuckDB plans this as a semi join on all key columns
+        return frame, f"EXISTS (SELECT 1 FROM {view_name} WHERE {same_key})"
+
+    def get_batch_features(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> pd.DataFrame:
         if self.conn is None:
             print("No connection to DuckDB. Trying to reconnect...")
             self.connect()
@@ -61,14 +287,21 @@ class OfflineStore:
                 print("Failed to reconnect. Cannot get batch features.")
                 return pd.DataFrame()
 
-        query = f"SELECT * FROM {table_name} WHERE {entity_column} IN ({','.join(map(str, entity_values))})"
+        view_name = f"entities_{uuid.uuid4().hex}"
+        cursor = self.cursor()
         try:
-            return self.conn.execute(query).fetchdf()
+            frame, condition = self._entity_filter(table_name, entity_column, entity_values, view_name)
+            cursor.register(view_name, frame)
+            try:
+                return self._apply_dtypes(table_name, cursor.execute(f"SELECT * FROM {table_name} WHERE {condition}").fetchdf())
+            finally:
+                cursor.unregister(view_name)
         except Exception as e:
             print(f"Error getting batch features: {e}")
             return pd.DataFrame()
 
-    def get_all_entity_ids(self, table_name: str, entity_column: str) -> List[Any]:
+    def get_all_entity_ids(self, table_name: str, entity_column: EntityColumns) -> List[Any]:
+        """Distinct entity keys; tuples for a composite key."""
         if self.conn is None:
             print("No connection to DuckDB. Trying to reconnect...")
             self.connect()
@@ -76,15 +309,16 @@ class OfflineStore:
                 print("Failed to reconnect. Cannot get entity IDs.")
                 return []
 
-        query = f"SELECT DISTINCT {entity_column} FROM {table_name}"
+        key_names = key_columns(entity_column)
+        query = f"SELECT DISTINCT {', '.join(key_names)} FROM {table_name}"
         try:
-            result = self.conn.execute(query).fetchdf()
-            return result[entity_column].tolist()
+            result = self.cursor().execute(query).fetchall()
+            return [row[0] for row in result] if len(key_names) == 1 else result
         except Exception as e:
             print(f"Error getting entity IDs: {e}")
             return []
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(self, query: str, params: List[Any] = None) -> pd.DataFrame:
         if self.conn is None:
             print("No connection to DuckDB. Trying to reconnect...")
             self.connect()
@@ -93,12 +327,130 @@ class OfflineStore:
                 return pd.DataFrame()
 
         try:
-            return self.conn.execute(query).fetchdf()
+            return self.cursor().execute(query, params or []).fetchdf()
         except Exception as e:
             print(f"Error executing query: {e}")
             return pd.DataFrame()
 
+    def _iter_cursor(self, cursor, query: str, params: List[Any], chunk_size: int, as_arrow: bool) -> Iterator:
+        result = cursor.execute(query, params or [])
+        if as_arrow:
+            for batch in result.fetch_record_batch(chunk_size):
+                yield batch
+            return
+        vectors_per_chunk = max(1, chunk_size // DUCKDB_VECTOR_SIZE)
+        while True:
+            chunk = result.fetch_df_chunk(vectors_per_chunk)
+            if chunk.empty:
+                return
+            yield chunk
+
+    def iter_query(self, query: str, params: List[Any] = None, chunk_size: int = 100000,
+                   as_arrow: bool = False, raise_errors: bool = False) -> Iterator[Union[pd.DataFrame, Any]]:
+        """Like execute_query, but yields DataFrame chunks (or Arrow record batches) of about chunk_size rows.
+
+        With raise_errors, a failing query raises instead of printing and ending the stream early,
+        for callers that must not mistake a failure for the end of the data.
+        """
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot execute query.")
+                if raise_errors:
+                    raise RuntimeError("No connection to DuckDB")
+                return
+
+        # A dedicated cursor: a paused generator must not share this thread's cursor with other queries
+        cursor = self.conn.cursor()
+        try:
+            yield from self._iter_cursor(cursor, query, params, chunk_size, as_arrow)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error executing query: {e}")
+        finally:
+            cursor.close()
+
+    def iter_batch_features(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any],
+                            chunk_size: int = 100000, as_arrow: bool = False) -> Iterator[Union[pd.DataFrame, Any]]:
+        """Like get_batch_features, but streams the result; the entity list is joined as a registered frame."""
+        if self.conn is None:
+            print("No connection to DuckDB. Trying to reconnect...")
+            self.connect()
+            if self.conn is None:
+                print("Failed to reconnect. Cannot get batch features.")
+                return
+
+        view_name = f"entities_{uuid.uuid4().hex}"
+        cursor = self.conn.cursor()
+        try:
+            frame, condition = self._entity_filter(table_name, entity_column, entity_values, view_name)
+            cursor.register(view_name, frame)
+            query = f"SELECT * FROM {table_name} WHERE {condition}"
+            for chunk in self._iter_cursor(cursor, query, [], chunk_size, as_arrow):
+                yield chunk if as_arrow else self._apply_dtypes(table_name, chunk)
+        except Exception as e:
+            print(f"Error getting batch features: {e}")
+        finally:
+            cursor.close()
+
+    def iter_batch_features_parallel(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any],
+                                     num_ranges: int = 4, chunk_size: int = 100000,
+                                     as_arrow: bool = False) -> Iterator[Union[pd.DataFrame, Any]]:
+        """Split the sorted entity set into contiguous ranges and query them concurrently.
+
+        Chunks are yielded in completion order. At most 2 * num_ranges chunks are buffered,
+        so peak memory follows chunk_size rather than the result size.
+        """
+        values = sorted(entity_values)
+        step = max(1, -(-len(values) // num_ranges))
+        ranges = [values[i:i + step] for i in range(0, len(values), step)]
+        results = Queue(maxsize=2 * num_ranges)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def _produce(range_values):
+            try:
+                for chunk in self.iter_batch_features(table_name, entity_column, range_values, chunk_size, as_arrow):
+                    if not _put(chunk):
+                        return
+            finally:
+                _put(done)
+
+        workers = [threading.Thread(target=_produce, args=(r,), daemon=True) for r in ranges]
+        for worker in workers:
+            worker.start()
+        try:
+            remaining = len(workers)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            # Consumer stopped early (or finished): release any producer blocked on the queue
+            stop.set()
+
     def close(self):
+        with self._cursors_lock:
+            for cursor in self._cursors:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self._cursors = []
+        self._local = threading.local()
         if self.conn:
             try:
                 self.conn.close()
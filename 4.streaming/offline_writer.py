@@ -0,0 +1,82 @@
+import time
+from threading import Thread, Lock, Event
+from typing import Dict, Any, List, Optional, Tuple
+import pandas as pd
+from offline_store import OfflineStore
+
+class OfflineWriteBuffer:
+    """Accumulates streaming rows in per-table column batches and bulk-appends them to DuckDB.
+
+    A batch is flushed when it reaches max_rows or when it is older than max_latency seconds.
+    The background thread also runs compaction on registered tables every compaction_interval
+    seconds, keeping a deduplicated <table>_latest snapshot next to the append-only history.
+    """
+
+    def __init__(self, offline_store: OfflineStore, max_rows: int = 5000, max_latency: float = 1.0,
+                 compaction_interval: Optional[float] = 60.0):
+        self.offline_store = offline_store
+        self.max_rows = max_rows
+        self.max_latency = max_latency
+        self.compaction_interval = compaction_interval
+        self.batches: Dict[str, Dict[str, List[Any]]] = {}
+        self.batch_started: Dict[str, float] = {}
+        self.compacted_tables: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self._stop = Event()
+        self.worker = Thread(target=self._run, name="offline-write-buffer")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def enable_compaction(self, table_name: str, key_column: str, order_column: Optional[str] = None):
+        self.compacted_tables[table_name] = (key_column, order_column)
+
+    def append(self, table_name: str, row: Dict[str, Any]):
+        with self.lock:
+            batch = self.batches.get(table_name)
+            if batch is None:
+                columns = list(self.offline_store.schemas.get(table_name, row))
+                batch = self.batches[table_name] = {column: [] for column in columns}
+                self.batch_started[table_name] = time.monotonic()
+            for column, values in batch.items():
+                values.append(row.get(column))
+            full = len(next(iter(batch.values()))) >= self.max_rows
+        if full:
+            self.flush(table_name)
+
+    def _take(self, table_name: str) -> Optional[Dict[str, List[Any]]]:
+        with self.lock:
+            self.batch_started.pop(table_name, None)
+            return self.batches.pop(table_name, None)
+
+    def flush(self, table_name: Optional[str] = None):
+        """Append pending rows for one table (or all tables) to the offline store."""
+        table_names = [table_name] if table_name else list(self.batches)
+        # flush_lock keeps batches for the same table landing in arrival order
+        with self.flush_lock:
+            for name in table_names:
+                batch = self._take(name)
+                if batch:
+                    self.offline_store.append_data(name, pd.DataFrame(batch))
+
+    def compact(self):
+        self.flush()
+        for table_name, (key_column, order_column) in self.compacted_tables.items():
+            self.offline_store.compact_latest(table_name, key_column, order_column)
+
+    def _run(self):
+        last_compaction = time.monotonic()
+        while not self._stop.wait(min(self.max_latency, 0.1)):
+            now = time.monotonic()
+            with self.lock:
+                due = [name for name, started in self.batch_started.items() if now - started >= self.max_latency]
+            for name in due:
+                self.flush(name)
+            if self.compaction_interval is not None and now - last_compaction >= self.compaction_interval:
+                self.compact()
+                last_compaction = now
+
+    def close(self):
+        self._stop.set()
+        self.worker.join()
+        self.compact()
@@ -0,0 +1,81 @@
+import ast
+import numpy as np
+from threading import Lock
+from typing import Dict, Any, List, Optional, Tuple
+from feature_repository import FeatureView
+
+# Compiled expressions and the names they read, per (feature view, version); a new version
+# recompiles, old entries stay valid
+_compiled: Dict[Tuple[str, int], List[Tuple[str, Any, List[str]]]] = {}
+_compiled_lock = Lock()
+
+class RequestContextError(ValueError):
+    """A request context list does not line up with the entities being served."""
+
+def _referenced_names(expression: str) -> List[str]:
+    """Variables an expression reads, in order; unlike co_names this skips attributes (np.sqrt) and bound names."""
+    tree = ast.parse(expression, mode="eval")
+    bound = {node.arg for node in ast.walk(tree) if isinstance(node, ast.arg)}
+    bound |= {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+    names = [node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)]
+    return [name for name in dict.fromkeys(names) if name not in bound]
+
+def compile_on_demand(feature_view: FeatureView) -> List[Tuple[str, Any, List[str]]]:
+    """Compile a view's on-demand expressions once and cache them by view version."""
+    key = (feature_view.name, feature_view.version)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _compiled_lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                compiled = [
+                    (feature.name, compile(feature.expression, f"<on_demand:{feature_view.name}.{feature.name}>", "eval"),
+                     _referenced_names(feature.expression))
+                    for feature in feature_view.on_demand_features
+                ]
+                _compiled[key] = compiled
+    return compiled
+
+def _column(values: List[Any]) -> np.ndarray:
+    try:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array(values, dtype=object)
+
+def apply_on_demand(feature_view: FeatureView, rows: List[Optional[Dict[str, Any]]],
+                    request_context: Optional[Dict[str, Any]] = None) -> List[Optional[Dict[str, Any]]]:
+    """Evaluate on-demand features column-wise over all found rows and add them to each row in place.
+
+    Request context values may be scalars (shared by every entity) or lists aligned with rows;
+    a list of any other length raises RequestContextError. Missing rows (None) are skipped.
+    """
+    compiled = compile_on_demand(feature_view)
+    if not compiled:
+        return rows
+    request_context = request_context or {}
+    positions = [i for i, row in enumerate(rows) if row is not None]
+    if not positions:
+        return rows
+
+    namespace: Dict[str, Any] = {"np": np, "__builtins__": {}}
+    for name, code, columns in compiled:
+        # Only materialize the columns an expression actually references
+        for column in columns:
+            if column in namespace:
+                continue
+            if column in request_context:
+                value = request_context[column]
+                if isinstance(value, list):
+                    if len(value) != len(rows):
+                        raise RequestContextError(
+                            f"request_context[{column!r}] has {len(value)} values for {len(rows)} entities")
+                    value = _column([value[i] for i in positions])
+                namespace[column] = value
+            else:
+                namespace[column] = _column([rows[i].get(column) for i in positions])
+        result = np.broadcast_to(eval(code, namespace), (len(positions),))
+        # Later expressions may build on earlier on-demand features
+        namespace[name] = result
+        for i, value in zip(positions, result.tolist()):
+            rows[i][name] = None if isinstance(value, float) and value != value else value
+    return rows
@@ -1,22 +1,52 @@
+import time
 import sqlite3
 import pandas as pd
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Optional, Union
 from queue import Queue
-from threading import Thread
+from threading import Thread, Event
+from dtypes import sqlite_column_type, python_values
+from entity_keys import (EntityColumns, key_columns, key_value, row_key, key_params, key_predicate, key_lookup_sql,
+                         columns_ddl)
+
+# Ingest time (epoch seconds) stored on every row; drives TTL filtering and sweeping
+INGESTED_AT = "_ingested_at"
 
 class OnlineStore:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, read_only: bool = False):
         self.db_path = db_path
+        self.read_only = read_only
         self.queue = Queue()
-        self.worker = Thread(target=self._process_queue)
-        self.worker.daemon = True
-        self.worker.start()
+        self.ttls: Dict[str, int] = {}
+        self.sweeper = None
+        self._stop_sweeper = Event()
+        self.worker = None
+        # Queue items that raised; callers that need to know a write landed compare it around flush()
+        self.failed_writes = 0
+        # Read-only handles (one per serving worker) never start a writer thread
+        if not read_only:
+            self.worker = Thread(target=self._process_queue, name="online-store-writer")
+            self.worker.daemon = True
+            self.worker.start()
 
     def _get_connection(self):
+        if self.read_only:
+            return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
         return sqlite3.connect(self.db_path)
 
+    def _enqueue(self, func, args):
+        if self.read_only:
+            raise RuntimeError("OnlineStore was opened read-only")
+        self.queue.put((func, args, {}))
+
     def _process_queue(self):
         conn = self._get_connection()
+        # WAL lets serving processes keep reading while this thread writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Incremental auto-vacuum lets the TTL sweeper hand freed pages back to the filesystem;
+        # switching an existing file over needs one full VACUUM
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
         while True:
             item = self.queue.get()
             if item is None:
@@ -25,41 +55,165 @@ class OnlineStore:
             try:
                 func(conn, *args, **kwargs)
             except Exception as e:
+                self.failed_writes += 1
                 print(f"Error processing queue item: {e}")
             finally:
                 self.queue.task_done()
         conn.close()
 
-    def create_table(self, table_name: str, schema: Dict[str, str]):
+    def create_table(self, table_name: str, schema: Dict[str, str], ttl: Optional[int] = None):
+        if ttl is not None:
+            self.set_ttl(table_name, ttl)
+
         def _create_table(conn, table_name, schema):
-            columns = ", ".join([f"{name} {dtype}" for name, dtype in schema.items()])
+            columns = columns_ddl(schema, sqlite_column_type, {INGESTED_AT: "REAL"})
             conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
-        self.queue.put((_create_table, (table_name, schema), {}))
+            existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+            if INGESTED_AT not in existing:
+                # Tables from before TTL support: start their clock now
+                conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {INGESTED_AT} REAL")
+                with conn:
+                    conn.execute(f"UPDATE {table_name} SET {INGESTED_AT} = ?", (time.time(),))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table_name}{INGESTED_AT}_idx ON {table_name} ({INGESTED_AT})")
+        self._enqueue(_create_table, (table_name, schema))
+
+    def set_ttl(self, table_name: str, ttl: int):
+        """Rows older than ttl seconds are no longer served and become eligible for sweeping."""
+        self.ttls[table_name] = ttl
 
     def insert_data(self, table_name: str, data: Union[Dict[str, Any], pd.DataFrame]):
-        def _insert_data(conn, table_name, data):
+        def _insert_data(conn, table_name, data, ingested_at):
             if isinstance(data, dict):
                 df = pd.DataFrame([data])
             elif isinstance(data, pd.DataFrame):
                 df = data
             else:
                 raise ValueError("Data must be either a dictionary or a pandas DataFrame")
-            df.to_sql(table_name, conn, if_exists='append', index=False)
-        self.queue.put((_insert_data, (table_name, data), {}))
+            python_values(df).assign(**{INGESTED_AT: ingested_at}).to_sql(table_name, conn, if_exists='append', index=False)
+        self._enqueue(_insert_data, (table_name, data, time.time()))
+
+    def upsert_data(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        """Replace the rows for every key in data in one transaction (delete + bulk insert)."""
+        def _upsert_data(conn, table_name, data, key_column, ingested_at):
+            data = python_values(data).assign(**{INGESTED_AT: ingested_at})
+            columns = list(data.columns)
+            key_names = key_columns(key_column)
+            keys = list(data[key_names].itertuples(index=False, name=None))
+            rows = list(data.itertuples(index=False, name=None))
+            placeholders = ",".join("?" * len(columns))
+            with conn:
+                conn.executemany(f"DELETE FROM {table_name} WHERE {key_predicate(key_names)}", keys)
+                conn.executemany(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        self._enqueue(_upsert_data, (table_name, data, key_column, time.time()))
 
-    def get_online_features(self, table_name: str, entity_column: str, entity_value: Any) -> Dict[str, Any]:
+    def add_columns(self, table_name: str, columns: Dict[str, str]):
+        """Additive schema change. SQLite only updates the table definition; existing rows read NULL."""
+        def _add_columns(conn, table_name, columns):
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+            for name, dtype in columns.items():
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {name} {dtype}")
+        self._enqueue(_add_columns, (table_name, columns))
+
+    def fill_missing(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        """Backfill: set columns of existing rows where they are still NULL, without touching ingest time."""
+        def _fill_missing(conn, table_name, data, key_column):
+            key_names = key_columns(key_column)
+            columns = [column for column in data.columns if column not in key_names]
+            assignments = ", ".join(f"{column} = COALESCE({column}, ?)" for column in columns)
+            rows = list(python_values(data[columns + key_names]).itertuples(index=False, name=None))
+            with conn:
+                conn.executemany(f"UPDATE {table_name} SET {assignments} WHERE {key_predicate(key_names)}", rows)
+        self._enqueue(_fill_missing, (table_name, data, key_column))
+
+    def flush(self):
+        """Block until every queued write has been applied."""
+        if self.worker is not None:
+            self.queue.join()
+
+    def _ttl_filter(self, table_name: str):
+        ttl = self.ttls.get(table_name)
+        if ttl is None:
+            return "", []
+        return f" AND {INGESTED_AT} >= ?", [time.time() - ttl]
+
+    def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Dict[str, Any]:
         conn = self._get_connection()
-        query = f"SELECT * FROM {table_name} WHERE {entity_column} = ?"
-        cursor = conn.execute(query, (entity_value,))
+        columns = key_columns(entity_column)
+        ttl_clause, ttl_params = self._ttl_filter(table_name)
+        query = f"SELECT * FROM {table_name} WHERE {key_predicate(columns)}{ttl_clause}"
+        cursor = conn.execute(query, key_params([entity_value], columns) + ttl_params)
         result = cursor.fetchone()
         conn.close()
         if result:
-            return dict(zip([column[0] for column in cursor.description], result))
+            row = dict(zip([column[0] for column in cursor.description], result))
+            row.pop(INGESTED_AT, None)
+            return row
         return None
 
+    def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch many entities in one query; results follow the order of entity_values."""
+        if not entity_values:
+            return []
+        conn = self._get_connection()
+        key_names = key_columns(entity_column)
+        keys = [key_value(value, key_names) for value in entity_values]
+        unique_keys = list(dict.fromkeys(keys))
+        ttl_clause, ttl_params = self._ttl_filter(table_name)
+        query = key_lookup_sql(table_name, key_names, len(unique_keys)) + ttl_clause
+        cursor = conn.execute(query, key_params(unique_keys, key_names) + ttl_params)
+        columns = [column[0] for column in cursor.description]
+        rows = {}
+        for result in cursor.fetchall():
+            row = dict(zip(columns, result))
+            row.pop(INGESTED_AT, None)
+            rows.setdefault(row_key(row, key_names), row)
+        conn.close()
+        return [rows.get(key) for key in keys]
+
+    def sweep_expired(self, batch_size: int = 1000):
+        """Queue deletion of expired rows in bounded batches.
+
+        Each batch is its own writer-queue item, so inserts interleave with a large sweep
+        instead of waiting behind one long DELETE.
+        """
+        def _sweep_batch(conn, table_name, cutoff, batch_size):
+            with conn:
+                deleted = conn.execute(
+                    f"DELETE FROM {table_name} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table_name} WHERE {INGESTED_AT} < ? LIMIT ?)",
+                    (cutoff, batch_size)
+                ).rowcount
+            if deleted >= batch_size and not self._stop_sweeper.is_set():
+                self.queue.put((_sweep_batch, (table_name, cutoff, batch_size), {}))
+            else:
+                # Release a bounded number of free pages; the pragma works one page per step
+                conn.execute("PRAGMA incremental_vacuum(1000)").fetchall()
+
+        now = time.time()
+        for table_name, ttl in list(self.ttls.items()):
+            self._enqueue(_sweep_batch, (table_name, now - ttl, batch_size))
+
+    def start_ttl_sweeper(self, interval: float = 60.0, batch_size: int = 1000):
+        """Sweep expired rows every interval seconds from a background thread."""
+        if self.read_only or self.sweeper is not None:
+            return
+
+        def _sweep_loop():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep_expired(batch_size)
+
+        self.sweeper = Thread(target=_sweep_loop, name="online-store-ttl-sweeper")
+        self.sweeper.daemon = True
+        self.sweeper.start()
+
     def close(self):
+        self._stop_sweeper.set()
+        if self.worker is None:
+            return
         self.queue.put(None)
         self.worker.join()
+        self.worker = None
 
     def __del__(self):
         self.close()
\ No newline at end of file
@@ -0,0 +1,289 @@
+import json
+import time
+import struct
+import sqlite3
+import pandas as pd
+from typing import Dict, Any, List, Optional, Union
+from online_store import OnlineStore, INGESTED_AT
+from dtypes import struct_code, coerce, sqlite_column_type, float32_value, python_values
+from serialization import typed_row_format
+from entity_keys import (EntityColumns, key_columns, key_value, key_params, key_predicate, key_lookup_sql,
+                         split_primary_key, columns_ddl)
+
+# Column holding each entity's packed feature vector, and the table recording every layout
+BLOB_COLUMN = "_features"
+LAYOUTS_TABLE = "_packed_layouts"
+
+class PackedLayout:
+    """Fixed binary layout of one entity's feature vector.
+
+    A blob is a layout version byte followed by a typed row as served under
+    application/x-feature-rows (serialization.typed_row_format): a null bitmap, then one cell per
+    feature at its own width. Without the version byte a blob can be sent to clients as is.
+    """
+
+    def __init__(self, version: int, names: List[str], codes: List[str]):
+        if not 0 <= version <= 255:
+            raise ValueError(f"Packed layout version must fit in one byte, got {version}")
+        self.version = version
+        self.names = names
+        self.codes = codes
+        self.bitmap_len = (len(codes) + 7) // 8
+        self.struct = struct.Struct("<B" + typed_row_format(codes)[1:])
+        # Byte offset of every cell, for decoding a single feature without unpacking the rest
+        self.offsets: Dict[str, int] = {}
+        offset = 1 + self.bitmap_len
+        for name, code in zip(names, codes):
+            self.offsets[name] = offset
+            offset += struct.calcsize("<" + code)
+        self.index = {name: i for i, name in enumerate(names)}
+        self.float32 = [i for i, code in enumerate(codes) if code == "f"]
+
+    def pack(self, row: Dict[str, Any]) -> bytes:
+        bitmap = bytearray(self.bitmap_len)
+        values = []
+        for i, (name, code) in enumerate(zip(self.names, self.codes)):
+            value = row.get(name)
+            if value is None or value != value:  # None or NaN
+                bitmap[i // 8] |= 1 << (i % 8)
+                values.append(0)
+            else:
+                values.append(coerce(value, code))
+        return self.struct.pack(self.version, bytes(bitmap), *values)
+
+    def unpack(self, blob: bytes) -> Dict[str, Any]:
+        _, bitmap, *values = self.struct.unpack(blob)
+        for i in self.float32:
+            values[i] = float32_value(values[i])
+        if not any(bitmap):
+            return dict(zip(self.names, values))
+        return {name: (None if bitmap[i // 8] >> (i % 8) & 1 else value)
+                for i, (name, value) in enumerate(zip(self.names, values))}
+
+    def value(self, blob: bytes, name: str) -> Any:
+        i = self.index[name]
+        if blob[1 + i // 8] >> (i % 8) & 1:
+            return None
+        value = struct.unpack_from("<" + self.codes[i], blob, self.offsets[name])[0]
+        return float32_value(value) if self.codes[i] == "f" else value
+
+class PackedOnlineStore(OnlineStore):
+    """OnlineStore variant that keeps each entity's features in one packed blob per row.
+
+    Rows are packed once at ingest, so a lookup reads a single column value and decodes it with
+    one precompiled struct instead of SQLite materializing a wide row that is then zipped with
+    cursor.description. Batch lookups for application/x-feature-rows pass the stored bytes
+    through without decoding at all. Only fixed-width feature dtypes can be packed.
+
+    Schema changes (add_columns) register a new layout; existing blobs keep their version byte
+    and decode with the layout they were written with.
+    """
+
+    def __init__(self, db_path: str, read_only: bool = False):
+        self.layouts: Dict[str, Dict[int, PackedLayout]] = {}
+        self.key_columns: Dict[str, List[str]] = {}
+        super().__init__(db_path, read_only)
+
+    def _load_layouts(self, table_name: str):
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(f"SELECT version, key_column, columns FROM {LAYOUTS_TABLE} WHERE table_name = ?",
+                                (table_name,)).fetchall()
+        except sqlite3.OperationalError:
+            rows = []  # Nothing created yet
+        finally:
+            conn.close()
+        for version, key_column, columns in rows:
+            names, codes = zip(*json.loads(columns)) if columns != "[]" else ((), ())
+            self.layouts.setdefault(table_name, {})[version] = PackedLayout(version, list(names), list(codes))
+            self.key_columns[table_name] = key_column.split(",")
+
+    def layout(self, table_name: str, version: Optional[int] = None) -> PackedLayout:
+        """The given layout version of a table, or its current (newest) one."""
+        layouts = self.layouts.get(table_name)
+        if not layouts or (version is not None and version not in layouts):
+            # Written by another handle (e.g. the writer process, for read-only serving handles)
+            self._load_layouts(table_name)
+            layouts = self.layouts.get(table_name)
+            if not layouts:
+                raise KeyError(f"No packed layout for table {table_name}")
+        return layouts[max(layouts) if version is None else version]
+
+    def _register_layout(self, table_name: str, key_names: List[str], names: List[str], codes: List[str]) -> PackedLayout:
+        layouts = self.layouts.setdefault(table_name, {})
+        current = layouts[max(layouts)] if layouts else None
+        if current is not None and current.names == names and current.codes == codes:
+            return current
+        layout = PackedLayout(current.version + 1 if current else 0, names, codes)
+        layouts[layout.version] = layout
+        self.key_columns[table_name] = key_names
+
+        def _insert_layout(conn, table_name, key_names, layout):
+            with conn:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {LAYOUTS_TABLE} "
+                             "(table_name TEXT, version INTEGER, key_column TEXT, columns TEXT, "
+                             "PRIMARY KEY (table_name, version))")
+                conn.execute(f"INSERT OR REPLACE INTO {LAYOUTS_TABLE} VALUES (?, ?, ?, ?)",
+                             (table_name, layout.version, ",".join(key_names), json.dumps(list(zip(layout.names, layout.codes)))))
+        self._enqueue(_insert_layout, (table_name, key_names, layout))
+        return layout
+
+    @staticmethod
+    def _codes(table_name: str, columns: Dict[str, str]) -> List[str]:
+        codes = [struct_code(dtype) for dtype in columns.values()]
+        variable = [name for name, code in zip(columns, codes) if code is None]
+        if variable:
+            raise ValueError(f"Packed storage only supports fixed-width features; {table_name} has {variable}")
+        return codes
+
+    def create_table(self, table_name: str, schema: Dict[str, str], ttl: Optional[int] = None):
+        if ttl is not None:
+            self.set_ttl(table_name, ttl)
+        # The entity key is the PRIMARY KEY column(s) if declared, otherwise the first column
+        columns, key_names = split_primary_key(schema)
+        features = {name: dtype for name, dtype in columns.items() if name not in key_names}
+        self._load_layouts(table_name)
+        self._register_layout(table_name, key_names, list(features), self._codes(table_name, features))
+
+        def _create_table(conn, table_name, columns):
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table_name}{INGESTED_AT}_idx ON {table_name} ({INGESTED_AT})")
+        key_schema = {name: f"{columns[name]} PRIMARY KEY" for name in key_names}
+        self._enqueue(_create_table, (table_name, columns_ddl(key_schema, sqlite_column_type,
+                                                               {BLOB_COLUMN: "BLOB", INGESTED_AT: "REAL"})))
+
+    def insert_data(self, table_name: str, data: Union[Dict[str, Any], pd.DataFrame]):
+        if isinstance(data, dict):
+            rows = [data]
+        elif isinstance(data, pd.DataFrame):
+            rows = python_values(data).to_dict("records")
+        else:
+            raise ValueError("Data must be either a dictionary or a pandas DataFrame")
+        layout = self.layout(table_name)
+        key_names = self.key_columns[table_name]
+        # Packing happens here, on the caller's thread; the writer only stores bytes
+        packed = [tuple(row[name] for name in key_names) + (layout.pack(row),) for row in rows]
+
+        def _insert_packed(conn, table_name, key_names, packed, ingested_at):
+            placeholders = ",".join("?" * (len(key_names) + 2))
+            with conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {table_name} ({', '.join(key_names)}, {BLOB_COLUMN}, {INGESTED_AT}) "
+                                 f"VALUES ({placeholders})", [values + (ingested_at,) for values in packed])
+        self._enqueue(_insert_packed, (table_name, key_names, packed, time.time()))
+
+    def upsert_data(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        # Rows are keyed by the entity column, so every write is already an upsert
+        self.insert_data(table_name, data)
+
+    def add_columns(self, table_name: str, columns: Dict[str, str]):
+        """Additive schema change: a new layout with the extra features; stored blobs are not rewritten."""
+        current = self.layout(table_name)
+        added = {name: dtype for name, dtype in columns.items() if name not in current.index}
+        if added:
+            self._register_layout(table_name, self.key_columns[table_name], current.names + list(added),
+                                  current.codes + self._codes(table_name, added))
+
+    def fill_missing(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        """Backfill: set features that are still missing, re-packing the touched rows in the current layout."""
+        layout = self.layout(table_name)
+
+        def _fill_missing(conn, table_name, data, key_column):
+            key_names = key_columns(key_column)
+            predicate = key_predicate(key_names)
+            updates = []
+            for row in python_values(data).to_dict("records"):
+                key = [row[name] for name in key_names]
+                stored = conn.execute(f"SELECT {BLOB_COLUMN} FROM {table_name} WHERE {predicate}", key).fetchone()
+                if stored is None:
+                    continue
+                features = self.decode(table_name, stored[0])
+                for name, value in row.items():
+                    if features.get(name) is None:
+                        features[name] = value
+                updates.append([layout.pack(features)] + key)
+            with conn:
+                conn.executemany(f"UPDATE {table_name} SET {BLOB_COLUMN} = ? WHERE {predicate}", updates)
+        self._enqueue(_fill_missing, (table_name, data, key_column))
+
+    def decode(self, table_name: str, blob: bytes) -> Dict[str, Any]:
+        """Unpack a stored blob; features added after it was written come back as None."""
+        layout = self.layout(table_name, blob[0])
+        features = layout.unpack(blob)
+        current = self.layout(table_name)
+        if layout is not current:
+            for name in current.names:
+                features.setdefault(name, None)
+        return features
+
+    def get_feature_value(self, table_name: str, entity_column: EntityColumns, entity_value: Any, feature_name: str) -> Any:
+        """One feature of one entity, decoding only that cell."""
+        key = key_value(entity_value, key_columns(entity_column))
+        blob = self._fetch_blobs(table_name, entity_column, [key]).get(key)
+        if blob is None:
+            return None
+        layout = self.layout(table_name, blob[0])
+        return layout.value(blob, feature_name) if feature_name in layout.index else None
+
+    def _fetch_blobs(self, table_name: str, entity_column: EntityColumns, keys: List[Any]) -> Dict[Any, bytes]:
+        """Stored blob per key (in key_value form) for the keys that exist and have not expired."""
+        key_names = key_columns(entity_column)
+        unique_keys = list(dict.fromkeys(keys))
+        conn = self._get_connection()
+        try:
+            ttl_clause, ttl_params = self._ttl_filter(table_name)
+            query = key_lookup_sql(table_name, key_names, len(unique_keys), key_names + [BLOB_COLUMN]) + ttl_clause
+            results = conn.execute(query, key_params(unique_keys, key_names) + ttl_params).fetchall()
+        finally:
+            conn.close()
+        if len(key_names) == 1:
+            return dict(results)
+        return {tuple(result[:-1]): result[-1] for result in results}
+
+    def _entity_row(self, table_name: str, key_names: List[str], key: Any, blob: bytes) -> Dict[str, Any]:
+        entities = {key_names[0]: key} if len(key_names) == 1 else dict(zip(key_names, key))
+        return {**entities, **self.decode(table_name, blob)}
+
+    def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Dict[str, Any]:
+        key_names = key_columns(entity_column)
+        conn = self._get_connection()
+        ttl_clause, ttl_params = self._ttl_filter(table_name)
+        query = f"SELECT {BLOB_COLUMN} FROM {table_name} WHERE {key_predicate(key_names)}{ttl_clause}"
+        result = conn.execute(query, key_params([entity_value], key_names) + ttl_params).fetchone()
+        conn.close()
+        if result:
+            return self._entity_row(table_name, key_names, key_value(entity_value, key_names), result[0])
+        return None
+
+    def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        if not entity_values:
+            return []
+        key_names = key_columns(entity_column)
+        keys = [key_value(value, key_names) for value in entity_values]
+        blobs = self._fetch_blobs(table_name, key_names, keys)
+        rows = {key: self._entity_row(table_name, key_names, key, blob) for key, blob in blobs.items()}
+        return [rows.get(key) for key in keys]
+
+    def get_packed_rows_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any],
+                              feature_names: List[str]) -> bytes:
+        """Rows for entity_values in the typed row format of feature_names, ready to send.
+
+        Blobs whose layout already matches feature_names are passed through byte for byte; others
+        (written before a schema change, or served for an older view version) are re-packed.
+        Missing entities come back as all-null rows.
+        """
+        current = self.layout(table_name)
+        target = PackedLayout(0, feature_names, [current.codes[current.index[name]] for name in feature_names])
+        key_names = key_columns(entity_column)
+        keys = [key_value(value, key_names) for value in entity_values]
+        blobs = self._fetch_blobs(table_name, key_names, keys) if keys else {}
+        missing = target.pack({})[1:]
+        rows = []
+        for key in keys:
+            blob = blobs.get(key)
+            if blob is None:
+                rows.append(missing)
+            elif self.layout(table_name, blob[0]).names == feature_names:
+                rows.append(blob[1:])
+            else:
+                rows.append(target.pack(self.decode(table_name, blob))[1:])
+        return b"".join(rows)
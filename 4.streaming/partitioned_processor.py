@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+import multiprocessing
+from queue import Empty, Full
+from typing import Dict, Any, List, Callable, Tuple, Optional
+import pandas as pd
+from feature_repository import FeatureRepository
+from streaming_processor import StreamingProcessor
+from hashing import stable_hash
+from entity_keys import EntityColumns, key_columns
+
+# Seconds between liveness checks while waiting on a worker's inbox or the results queue
+SEND_TIMEOUT = 1.0
+
+class _BatchCollector:
+    """Stands in for both stores inside a worker so one inbound batch becomes one write per table."""
+
+    def __init__(self):
+        self.online_rows: Dict[str, List[Dict[str, Any]]] = {}
+        self.offline_rows: List[Tuple[str, Dict[str, Any]]] = []
+
+    def insert_data(self, table_name: str, row: Dict[str, Any]):
+        self.online_rows.setdefault(table_name, []).append(dict(row))
+
+    def append(self, table_name: str, row: Dict[str, Any]):
+        self.offline_rows.append((table_name, dict(row)))
+
+    def drain(self):
+        online_rows, offline_rows = self.online_rows, self.offline_rows
+        self.online_rows, self.offline_rows = {}, []
+        return online_rows, offline_rows
+
+def _worker_main(worker_id: int, store_factory: Callable, inbox, results):
+    feature_repo, online_store = store_factory(worker_id)
+    collector = _BatchCollector()
+    processor = StreamingProcessor(feature_repo, collector, None, offline_buffer=collector)
+    try:
+        while True:
+            batch = inbox.get()
+            if batch is None:
+                break
+            for event in batch:
+                processor.process_event(event)
+            online_rows, offline_rows = collector.drain()
+            for table_name, rows in online_rows.items():
+                key_columns = feature_repo.get_feature_view(table_name).entities
+                # Only the newest row per entity in this batch needs to reach the online store
+                df = pd.DataFrame(rows).drop_duplicates(subset=key_columns, keep="last")
+                online_store.upsert_data(table_name, df, key_columns)
+            if offline_rows:
+                results.put(offline_rows)
+    finally:
+        online_store.close()
+        results.put(None)
+
+class PartitionedStreamingProcessor:
+    """Runs StreamingProcessor in N worker processes, partitioned by a hash of the entity key.
+
+    A single dispatcher routes each event to the worker that owns its entity, so per-entity
+    ordering is preserved. Events travel in batches through per-worker queues; each worker
+    writes its own online rows and sends offline rows back in batches to the parent, which
+    remains the only DuckDB writer through `offline_buffer`.
+
+    store_factory(worker_id) -> (FeatureRepository, online_store) runs inside each worker and
+    must be a module-level function, because workers are started with the spawn method.
+    """
+
+    def __init__(self, feature_repo: FeatureRepository, store_factory: Callable, offline_buffer: Any,
+                 num_workers: int = None, partition_key: Optional[EntityColumns] = None,
+                 batch_size: int = 500, flush_interval: float = 0.05, statistics: Any = None):
+        self.num_workers = num_workers or os.cpu_count()
+        self.store_factory = store_factory
+        self.offline_buffer = offline_buffer
+        self.feature_repo = feature_repo
+        # Sketches are updated in the parent as offline rows come back from the workers
+        self.statistics = statistics
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if partition_key is None:
+            # A leading key column keeps every entity (and every composite key sharing it) on one worker
+            first_view = feature_repo.get_feature_view(feature_repo.list_feature_views()[0])
+            partition_key = first_view.entities[0]
+        self.partition_key = key_columns(partition_key)
+        self.pending: List[List[Dict[str, Any]]] = [[] for _ in range(self.num_workers)]
+        self.lock = threading.Lock()
+        self.workers = []
+        self.inboxes = []
+        self.collector = None
+        self.flusher = None
+        self._stop = threading.Event()
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.results = context.Queue()
+        for worker_id in range(self.num_workers):
+            inbox = context.Queue(maxsize=64)
+            worker = context.Process(target=_worker_main, args=(worker_id, self.store_factory, inbox, self.results),
+                                     name=f"streaming-worker-{worker_id}", daemon=True)
+            worker.start()
+            self.inboxes.append(inbox)
+            self.workers.append(worker)
+        self.collector = threading.Thread(target=self._collect_results, name="streaming-results", daemon=True)
+        self.collector.start()
+        self.flusher = threading.Thread(target=self._flush_periodically, name="streaming-dispatch-flush", daemon=True)
+        self.flusher.start()
+
+    def _collect_results(self):
+        finished = 0
+        while finished < self.num_workers:
+            try:
+                rows = self.results.get(timeout=SEND_TIMEOUT)
+            except Empty:
+                # A worker that was killed never sends its final None
+                if not any(worker.is_alive() for worker in self.workers):
+                    break
+                continue
+            if rows is None:
+                finished += 1
+                continue
+            for table_name, row in rows:
+                self.offline_buffer.append(table_name, row)
+                if self.statistics is not None:
+                    timestamp_field = self.feature_repo.get_feature_view(table_name).timestamp_field
+                    self.statistics.update_row(table_name, row, timestamp_field)
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _put(self, worker_id: int, item: Any):
+        # A dead worker leaves its bounded inbox full; fail instead of blocking forever
+        while True:
+            try:
+                self.inboxes[worker_id].put(item, timeout=SEND_TIMEOUT)
+                return
+            except Full:
+                worker = self.workers[worker_id]
+                if not worker.is_alive():
+                    raise RuntimeError(f"Streaming worker {worker_id} exited with code {worker.exitcode}")
+
+    def _send(self, worker_id: int):
+        batch, self.pending[worker_id] = self.pending[worker_id], []
+        if batch:
+            self._put(worker_id, batch)
+
+    def process_event(self, event: Dict[str, Any]):
+        key = tuple(event.get(column) for column in self.partition_key)
+        if None in key:
+            worker_id = 0
+        else:
+            worker_id = stable_hash(key[0] if len(key) == 1 else key) % self.num_workers
+        with self.lock:
+            self.pending[worker_id].append(event)
+            if len(self.pending[worker_id]) >= self.batch_size:
+                self._send(worker_id)
+
+    def flush(self):
+        with self.lock:
+            for worker_id in range(self.num_workers):
+                self._send(worker_id)
+
+    def run(self, event_stream, delay: float = 0.0) -> int:
+        """Same contract as StreamingProcessor.run; events are dispatched, not processed, in this process."""
+        processed = 0
+        for event in event_stream:
+            self.process_event(event)
+            processed += 1
+            if delay:
+                time.sleep(delay)
+        self.flush()
+        return processed
+
+    def close(self):
+        """Drain every worker, wait for their offline rows to arrive and stop the processes."""
+        if self.flusher is None:
+            return  # Never started
+        self._stop.set()
+        self.flusher.join()
+        try:
+            self.flush()
+        finally:
+            for worker_id in range(self.num_workers):
+                if self.workers[worker_id].is_alive():
+                    self._put(worker_id, None)
+            self.collector.join()
+            for worker in self.workers:
+                worker.join()
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import signal
+import threading
+import traceback
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+class ProfilerBusyError(Exception):
+    """Raised when a sampling profile is requested while another one is running."""
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for every thread in the process.
+
+    A background thread reads sys._current_frames() every `interval` seconds and counts each
+    stack in collapsed form ("thread;outer;...;inner"), the input format of flamegraph.pl and
+    speedscope. Overhead is one stack walk per thread per sample, independent of the workload.
+    """
+
+    _active_lock = threading.Lock()
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self.worker = None
+
+    def start(self):
+        if not SamplingProfiler._active_lock.acquire(blocking=False):
+            raise ProfilerBusyError("A sampling profile is already running")
+        self._stop.clear()
+        self.worker = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.worker.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+            SamplingProfiler._active_lock.release()
+        return self.counts
+
+    def collapsed(self) -> str:
+        """One "stack count" line per distinct stack, most frequent first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common())
+
+def dump_thread_stacks() -> Dict[str, List[str]]:
+    """Current stack of every live thread, keyed by "name (ident)", innermost frame last."""
+    frames = sys._current_frames()
+    stacks = {}
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        if frame is None:
+            continue
+        stacks[f"{thread.name} ({thread.ident})"] = [line.rstrip() for line in traceback.format_stack(frame)]
+    return stacks
+
+def start_tracemalloc(frames: int = 10) -> bool:
+    """Start tracing allocations; returns False if tracing was already on."""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+def stop_tracemalloc():
+    tracemalloc.stop()
+
+def top_allocations(limit: int = 25, key_type: str = "lineno") -> Dict[str, Any]:
+    """Top allocation sites by live size since tracing started (tracemalloc must be running)."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "top": [
+            {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics(key_type)[:limit]
+        ],
+    }
+
+def install_signal_handlers(output_dir: str = ".", interval: float = 0.005):
+    """CLI hooks for processes without an admin endpoint (e.g. the streaming processor).
+
+    SIGUSR1 writes thread stacks, plus top allocations when tracemalloc is on, to
+    <output_dir>/threads-<pid>-<ts>.txt. SIGUSR2 starts a sampling profile; the next SIGUSR2
+    stops it and writes <output_dir>/profile-<pid>-<ts>.collapsed.
+    """
+    if threading.current_thread() is not threading.main_thread() or not hasattr(signal, "SIGUSR1"):
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    state: Dict[str, Optional[SamplingProfiler]] = {"profiler": None}
+
+    def _path(prefix: str, suffix: str) -> str:
+        return os.path.join(output_dir, f"{prefix}-{os.getpid()}-{int(time.time())}.{suffix}")
+
+    def _dump(signum, frame):
+        path = _path("threads", "txt")
+        with open(path, "w") as f:
+            for name, stack in dump_thread_stacks().items():
+                f.write(f"--- {name}\n" + "\n".join(stack) + "\n\n")
+            if tracemalloc.is_tracing():
+                f.write("--- top allocations\n")
+                for stat in top_allocations()["top"]:
+                    f.write(f"{stat['size_bytes']:>12} B {stat['count']:>8} blocks  {stat['location']}\n")
+        print(f"Wrote thread dump to {path}", file=sys.stderr)
+
+    def _toggle_profile(signum, frame):
+        profiler = state["profiler"]
+        if profiler is None:
+            profiler = SamplingProfiler(interval)
+            try:
+                profiler.start()
+            except ProfilerBusyError as e:
+                print(f"Cannot start profiler: {e}", file=sys.stderr)
+                return
+            state["profiler"] = profiler
+            print("Sampling profiler started; send SIGUSR2 again to stop", file=sys.stderr)
+            return
+        profiler.stop()
+        state["profiler"] = None
+        path = _path("profile", "collapsed")
+        with open(path, "w") as f:
+            f.write(profiler.collapsed() + "\n")
+        print(f"Wrote {profiler.samples} samples to {path}", file=sys.stderr)
+
+    signal.signal(signal.SIGUSR1, _dump)
+    signal.signal(signal.SIGUSR2, _toggle_profile)
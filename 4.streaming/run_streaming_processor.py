@@ -1,41 +1,70 @@
+import os
 import time
+import argparse
 import random
 import threading
 from queue import Queue
 from streaming_processor import StreamingProcessor
+from partitioned_processor import PartitionedStreamingProcessor
 from feature_repository import FeatureRepository, FeatureView, Feature
 from online_store import OnlineStore
+from memory_store import ShardedMemoryStore
+from sharded_online_store import ShardedOnlineStore
+from packed_store import PackedOnlineStore
 from offline_store import OfflineStore
+from offline_writer import OfflineWriteBuffer
+from write_ahead_log import WriteAheadLog
+from feature_statistics import FeatureStatistics, StatisticsStore
+from event_sources import JsonlFileSource, CsvFileSource, ParquetEventSource, SocketEventSource, paced
+from profiling import install_signal_handlers, start_tracemalloc
 import pandas as pd
 
-def setup_feature_store():
+def create_online_store():
+    # FEATURE_STORE_ONLINE_BACKEND=memory keeps streaming features in sharded in-process memory
+    if os.environ.get("FEATURE_STORE_ONLINE_BACKEND") == "memory":
+        return ShardedMemoryStore(num_shards=int(os.environ.get("FEATURE_STORE_SHARDS", "16")),
+                                  snapshot_path="online_store.snapshot")
+    if os.environ.get("FEATURE_STORE_ONLINE_BACKEND") == "sharded_sqlite":
+        return ShardedOnlineStore("online_store.db", num_shards=int(os.environ.get("FEATURE_STORE_SHARDS", "4")))
+    if os.environ.get("FEATURE_STORE_ONLINE_BACKEND") == "packed":
+        return PackedOnlineStore("online_store.packed.db")
+    return OnlineStore("online_store.db")
+
+def create_feature_repository():
     feature_repo = FeatureRepository()
-    online_store = OnlineStore("online_store.db")
-    offline_store = OfflineStore("offline_store.db")
 
     # Create a sample feature view
     customer_features = FeatureView(
         name="customer_features",
         features=[
-            Feature(name="total_purchases", dtype="FLOAT"),
-            Feature(name="last_purchase_amount", dtype="FLOAT"),
-            Feature(name="last_purchase_time", dtype="FLOAT")
+            Feature(name="total_purchases", dtype="float32"),
+            Feature(name="last_purchase_amount", dtype="float32"),
+            # Epoch seconds need double precision
+            Feature(name="last_purchase_time", dtype="float64")
         ],
         entities=["customer_id"],
         ttl=86400,  # 1 day
-        version=1
+        version=1,
+        timestamp_field="last_purchase_time"
     )
     feature_repo.create_feature_view(customer_features)
+    return feature_repo
+
+def create_worker_stores(worker_id):
+    """Store factory for PartitionedStreamingProcessor; runs inside each worker process."""
+    return create_feature_repository(), create_online_store()
+
+def setup_feature_store():
+    feature_repo = create_feature_repository()
+    customer_features = feature_repo.get_feature_view("customer_features")
+    online_store = create_online_store()
+    offline_store = OfflineStore("offline_store.db")
 
-    # Create tables in offline and online stores
-    schema = {
-        "customer_id": "INTEGER",
-        "total_purchases": "FLOAT",
-        "last_purchase_amount": "FLOAT",
-        "last_purchase_time": "FLOAT"
-    }
-    offline_store.create_table("customer_features", schema)
-    online_store.create_table("customer_features", schema)
+    # Create tables in offline and online stores; the schema comes from the feature view's dtypes
+    schema = customer_features.table_schema()
+    offline_store.create_table("customer_features", schema, customer_features.column_dtypes())
+    online_store.create_table("customer_features", schema, ttl=customer_features.ttl)
+    online_store.start_ttl_sweeper()
 
     return feature_repo, online_store, offline_store
 
@@ -56,7 +85,8 @@ def monitor_features(online_store, offline_store):
     while True:
         customer_id = random.randint(1, 10)
         online_features = online_store.get_online_features("customer_features", "customer_id", customer_id)
-        offline_features = offline_store.get_batch_features("customer_features", "customer_id", [customer_id])
+        with offline_store.workload("monitoring"):
+            offline_features = offline_store.get_batch_features("customer_features", "customer_id", [customer_id])
         
         print(f"\nFeatures for customer {customer_id}:")
         print(f"Online store: {online_features}")
@@ -71,22 +101,97 @@ def process_events(processor, event_generator):
         processor.process_event(event)
         time.sleep(0.1)  # Small delay to avoid overwhelming the system
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the streaming feature processor")
+    parser.add_argument("--source", choices=["random", "jsonl", "csv", "parquet", "socket"], default="random")
+    parser.add_argument("--path", help="Event file (jsonl/csv) or Parquet path/glob")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing a jsonl/csv file after reaching its end")
+    parser.add_argument("--port", type=int, default=9099, help="Port for --source socket")
+    parser.add_argument("--offset", type=int, default=0, help="Resume from this source offset")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--speed", type=float, default=None,
+                        help="Replay at this multiple of event-time spacing; omit to replay as fast as possible")
+    parser.add_argument("--time-field", default="last_purchase_time")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Partition events by customer_id across this many worker processes")
+    parser.add_argument("--wal-dir", default=None,
+                        help="Log store writes here (one fsync per batch) and replay unapplied ones on startup; "
+                             "single-worker mode only")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="Where SIGUSR1 thread dumps and SIGUSR2 sampling profiles are written")
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="Trace allocations so SIGUSR1 dumps include the top allocators")
+    return parser.parse_args()
+
+def create_event_source(args):
+    options = {"batch_size": args.batch_size, "start_offset": args.offset}
+    if args.source == "jsonl":
+        return JsonlFileSource(args.path, follow=args.follow, **options)
+    if args.source == "csv":
+        return CsvFileSource(args.path, follow=args.follow, **options)
+    if args.source == "parquet":
+        return ParquetEventSource(args.path, **options)
+    if args.source == "socket":
+        return SocketEventSource(port=args.port, **options)
+    return None
+
+def replay_events(processor, source, speed=None, time_field="last_purchase_time"):
+    """Push a file/socket source through the processor with no artificial delay and report throughput."""
+    events = paced(iter(source), time_field, speed) if speed else iter(source)
+    started = time.perf_counter()
+    try:
+        processed = processor.run(events, delay=0)
+    finally:
+        source.close()
+    elapsed = time.perf_counter() - started
+    print(f"Processed {processed} events in {elapsed:.2f}s ({processed / elapsed if elapsed else 0:.0f} events/s); "
+          f"source offset {source.offset}")
+
 def main():
+    args = parse_args()
+    if args.workers > 1 and os.environ.get("FEATURE_STORE_ONLINE_BACKEND") == "memory":
+        raise ValueError("The in-memory online store cannot be shared across worker processes")
+    if args.trace_malloc:
+        start_tracemalloc()
+    install_signal_handlers(args.profile_dir)
     feature_repo, online_store, offline_store = setup_feature_store()
-    processor = StreamingProcessor(feature_repo, online_store, offline_store)
+    offline_buffer = OfflineWriteBuffer(offline_store)
+    offline_buffer.enable_compaction("customer_features", "customer_id", "last_purchase_time")
+    statistics = FeatureStatistics(StatisticsStore(offline_store))
+    statistics.start()
+    if args.workers > 1:
+        # Workers open their own online store handles, so the tables must exist first
+        online_store.flush()
+        processor = PartitionedStreamingProcessor(feature_repo, create_worker_stores, offline_buffer,
+                                                  num_workers=args.workers, partition_key="customer_id",
+                                                  statistics=statistics)
+        processor.start()
+    else:
+        wal = WriteAheadLog(args.wal_dir, feature_repo, online_store, offline_store) if args.wal_dir else None
+        processor = StreamingProcessor(feature_repo, online_store, offline_store, offline_buffer, statistics, wal)
 
     # Start the monitoring in a separate thread
-    monitor_thread = threading.Thread(target=monitor_features, args=(online_store, offline_store))
+    monitor_thread = threading.Thread(target=monitor_features, args=(online_store, offline_store), name="feature-monitor")
     monitor_thread.daemon = True
     monitor_thread.start()
 
     print("Starting streaming processor...")
     try:
-        process_events(processor, generate_random_events())
+        source = create_event_source(args)
+        if source is None:
+            process_events(processor, generate_random_events())
+        else:
+            replay_events(processor, source, args.speed, args.time_field)
     except KeyboardInterrupt:
         print("Stopping streaming processor...")
     finally:
         print("Cleaning up resources...")
+        if args.workers > 1:
+            processor.close()
+        elif processor.wal is not None:
+            processor.wal.close()
+        statistics.close()
+        offline_buffer.close()
         online_store.close()
         offline_store.close()
         print("Cleanup complete. Exiting.")
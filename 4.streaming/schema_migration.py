@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from feature_repository import FeatureRepository, FeatureView
+from offline_store import OfflineStore
+from entity_keys import key_value
+
+class SchemaMigrator:
+    """Registers a new FeatureView version and migrates its tables in place.
+
+    Only additive changes are supported: new columns are added with ALTER TABLE, which in both
+    SQLite and DuckDB changes the table definition without rewriting existing rows. A background
+    backfill then reads the new columns from a source table in the offline store in chunks and fills them in the
+    online store at no more than rows_per_second. Until the backfill completes, unversioned
+    lookups keep being served from the previous version.
+    """
+
+    def __init__(self, feature_repo: FeatureRepository, offline_store: OfflineStore, online_store: Any,
+                 chunk_size: int = 1000, rows_per_second: float = 5000.0,
+                 state_path: str = "schema_migrations.json",
+                 progress_callback: Optional[Callable[[str, int], None]] = None):
+        self.feature_repo = feature_repo
+        self.offline_store = offline_store
+        self.online_store = online_store
+        self.chunk_size = chunk_size
+        self.rows_per_second = rows_per_second
+        self.state_path = state_path
+        self.progress_callback = progress_callback or self._print_progress
+        self.state_lock = threading.Lock()
+
+    @staticmethod
+    def _print_progress(feature_view_name: str, filled: int):
+        print(f"Backfilling {feature_view_name}: {filled} rows")
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, feature_view_name: str, entry: Dict[str, Any]):
+        with self.state_lock:
+            state = self._load_state()
+            state[feature_view_name] = entry
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def added_columns(current: FeatureView, new: FeatureView) -> Dict[str, str]:
+        """DDL of the columns new adds to current; raises ValueError on any non-additive change."""
+        old_schema, new_schema = current.table_schema(), new.table_schema()
+        changed = [name for name in old_schema if name in new_schema and new_schema[name] != old_schema[name]]
+        if changed:
+            raise ValueError(f"Only additive schema changes can be applied online; changed columns: {changed}")
+        return {name: dtype for name, dtype in new_schema.items() if name not in old_schema}
+
+    @staticmethod
+    def _after_key(entity_columns: List[str], last_key: Any) -> Tuple[str, List[Any]]:
+        """WHERE clause selecting keys ordered after last_key: a > ? OR (a = ? AND b > ?) ..."""
+        last_key = key_value(last_key, entity_columns)
+        if len(entity_columns) == 1:
+            return f"WHERE {entity_columns[0]} > ?", [last_key]
+        terms, params = [], []
+        for i, column in enumerate(entity_columns):
+            terms.append(" AND ".join([f"{prefix} = ?" for prefix in entity_columns[:i]] + [f"{column} > ?"]))
+            params.extend(list(last_key[:i]) + [last_key[i]])
+        return "WHERE " + " OR ".join(f"({term})" for term in terms), params
+
+    @staticmethod
+    def _check_source(name: str, source: str):
+        if not source or source == name:
+            raise ValueError(f"Backfilling {name} needs a source other than its own table, whose new columns are NULL")
+
+    def evolve(self, feature_view: FeatureView, source: str,
+               background: bool = True) -> Optional[threading.Thread]:
+        """Register feature_view as the next version of its view and migrate the tables.
+
+        source names the offline table or view holding the new columns, one row per entity keyed
+        like the feature view. The view's own offline table cannot serve: its new columns start
+        out NULL.
+        """
+        self._check_source(feature_view.name, source)
+        name = feature_view.name
+        current = self.feature_repo.get_feature_view(name)
+        if current is None:
+            raise ValueError(f"Feature view {name} does not exist yet; create its tables instead")
+        added = self.added_columns(current, feature_view)
+        if added:
+            # Pin before registering, so no unversioned lookup ever resolves to the unfilled version
+            self.feature_repo.pin_serving_version(name, self.feature_repo.get_serving_feature_view(name).version)
+        self.feature_repo.create_feature_view(feature_view)
+        if not added:
+            return None
+
+        dtypes = feature_view.column_dtypes()
+        self.offline_store.add_columns(name, added, {column: dtypes[column] for column in added})
+        self.online_store.add_columns(name, added)
+        if not background:
+            self.backfill(feature_view, list(added), source)
+            return None
+        worker = threading.Thread(target=self.backfill, args=(feature_view, list(added), source),
+                                  name=f"schema-backfill-{name}", daemon=True)
+        worker.start()
+        return worker
+
+    def backfill(self, feature_view: FeatureView, columns: list, source: str) -> int:
+        """Fill columns in the online store from source, resuming after the last finished chunk.
+
+        Raises if the source query or any online write fails; the previous version then stays
+        pinned for serving and the migration stays unfinished, to resume on the next call.
+        """
+        name = feature_view.name
+        self._check_source(name, source)
+        entity_columns = feature_view.entities
+        keys = ", ".join(entity_columns)
+        entry = self._load_state().get(name)
+        if entry and entry["version"] == feature_view.version and entry["done"]:
+            self.feature_repo.unpin_serving_version(name)
+            return 0
+        last_key = entry["last_key"] if entry and entry["version"] == feature_view.version else None
+
+        # Rows come in key order, so progress is a single key (a list for a composite key)
+        where, params = self._after_key(entity_columns, last_key) if last_key is not None else ("", [])
+        query = f"""
+            SELECT {keys}, {', '.join(columns)} FROM {source}
+            {where} ORDER BY {keys}
+        """
+
+        filled = 0
+        with self.offline_store.workload("backfill"):
+            for frame in self.offline_store.iter_query(query, params, chunk_size=self.chunk_size, raise_errors=True):
+                # DuckDB hands out whole vectors; split them so each online write stays small
+                for start in range(0, len(frame), self.chunk_size):
+                    started = time.perf_counter()
+                    chunk = frame.iloc[start:start + self.chunk_size]
+                    failures = getattr(self.online_store, "failed_writes", 0)
+                    self.online_store.fill_missing(name, chunk, entity_columns)
+                    # Record progress only once the chunk is applied; refilling a chunk is harmless
+                    self.online_store.flush()
+                    if getattr(self.online_store, "failed_writes", 0) != failures:
+                        raise RuntimeError(f"Online store rejected a backfill chunk for {name}")
+                    filled += len(chunk)
+                    last_key = [chunk[column].tolist()[-1] for column in entity_columns]
+                    last_key = last_key if len(last_key) > 1 else last_key[0]
+                    self._save_state(name, {"version": feature_view.version, "last_key": last_key, "done": False})
+                    self.progress_callback(name, filled)
+                    # Rate limit: each chunk takes at least len(chunk) / rows_per_second seconds
+                    time.sleep(max(0.0, len(chunk) / self.rows_per_second - (time.perf_counter() - started)))
+
+        self._save_state(name, {"version": feature_view.version, "last_key": last_key, "done": True})
+        self.feature_repo.unpin_serving_version(name)
+        return filled
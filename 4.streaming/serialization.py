@@ -0,0 +1,145 @@
+import json
+import math
+import struct
+from typing import Dict, Any, List, Optional
+from fastapi import Response
+from dtypes import struct_code, coerce
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+PACKED_FLOAT32_MEDIA_TYPE = "application/x-float32-matrix"
+PACKED_ROWS_MEDIA_TYPE = "application/x-feature-rows"
+
+def encode_json(payload: Any) -> bytes:
+    """Encode a payload to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+def encode_msgpack(payload: Any) -> bytes:
+    """Encode a payload to MessagePack bytes."""
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(payload, use_bin_type=True, default=str)
+
+def pack_float32_rows(feature_names: List[str], rows: List[Optional[Dict[str, Any]]]) -> bytes:
+    """Pack rows into a little-endian float32 matrix (row-major, NaN for missing values)."""
+    row_format = "<" + "f" * len(feature_names)
+    nan = float("nan")
+    buffer = bytearray(struct.calcsize(row_format) * len(rows))
+    offset = 0
+    for row in rows:
+        values = []
+        for name in feature_names:
+            value = row.get(name) if row else None
+            try:
+                values.append(nan if value is None else float(value))
+            except (TypeError, ValueError):
+                values.append(nan)
+        struct.pack_into(row_format, buffer, offset, *values)
+        offset += struct.calcsize(row_format)
+    return bytes(buffer)
+
+def unpack_float32_rows(data: bytes, feature_names: List[str]) -> List[Dict[str, Optional[float]]]:
+    """Inverse of pack_float32_rows, mapping NaN back to None."""
+    rows = []
+    for values in struct.iter_unpack("<" + "f" * len(feature_names), data):
+        rows.append({name: (None if math.isnan(v) else v) for name, v in zip(feature_names, values)})
+    return rows
+
+def typed_row_format(codes: List[str]) -> str:
+    """struct format of one packed row: a null bitmap (bit i set = feature i missing) then one cell per feature."""
+    return f"<{(len(codes) + 7) // 8}s" + "".join(codes)
+
+def pack_typed_rows(feature_names: List[str], codes: List[str], rows: List[Optional[Dict[str, Any]]]) -> bytes:
+    """Pack rows using each feature's own width (int8 -> 1 byte, float32 -> 4, ...) instead of float32 for all."""
+    row_struct = struct.Struct(typed_row_format(codes))
+    bitmap_len = (len(codes) + 7) // 8
+    buffer = bytearray(row_struct.size * len(rows))
+    for r, row in enumerate(rows):
+        bitmap = bytearray(bitmap_len)
+        values = []
+        for i, (name, code) in enumerate(zip(feature_names, codes)):
+            value = row.get(name) if row else None
+            try:
+                if value is None or value != value:  # None or NaN
+                    raise ValueError
+                values.append(coerce(value, code))
+            except (TypeError, ValueError):
+                bitmap[i // 8] |= 1 << (i % 8)
+                values.append(0)
+        row_struct.pack_into(buffer, r * row_struct.size, bytes(bitmap), *values)
+    return bytes(buffer)
+
+def unpack_typed_rows(data: bytes, feature_names: List[str], codes: List[str]) -> List[Dict[str, Any]]:
+    """Inverse of pack_typed_rows, mapping null bits back to None."""
+    rows = []
+    for bitmap, *values in struct.iter_unpack(typed_row_format(codes), data):
+        rows.append({name: (None if bitmap[i // 8] >> (i % 8) & 1 else v)
+                     for i, (name, v) in enumerate(zip(feature_names, values))})
+    return rows
+
+def negotiate_media_type(accept: Optional[str], packable: bool = False, typed_packable: bool = False) -> str:
+    """Pick the response media type from an Accept header, defaulting to JSON."""
+    if not accept:
+        return JSON_MEDIA_TYPE
+    for candidate in (part.split(";")[0].strip() for part in accept.split(",")):
+        if candidate in (MSGPACK_MEDIA_TYPE, "application/x-msgpack") and msgpack is not None:
+            return MSGPACK_MEDIA_TYPE
+        if candidate == PACKED_FLOAT32_MEDIA_TYPE and packable:
+            return PACKED_FLOAT32_MEDIA_TYPE
+        if candidate == PACKED_ROWS_MEDIA_TYPE and typed_packable:
+            return PACKED_ROWS_MEDIA_TYPE
+        if candidate in (JSON_MEDIA_TYPE, "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+def render_response(payload: Dict[str, Any], accept: Optional[str] = None) -> Response:
+    """Serialize a single-entity payload without going through response_model validation."""
+    if negotiate_media_type(accept) == MSGPACK_MEDIA_TYPE:
+        return Response(content=encode_msgpack(payload), media_type=MSGPACK_MEDIA_TYPE)
+    return Response(content=encode_json(payload), media_type=JSON_MEDIA_TYPE)
+
+def render_batch_response(payload: Dict[str, Any], feature_names: List[str], accept: Optional[str] = None,
+                          feature_dtypes: Optional[List[str]] = None) -> Response:
+    """Serialize a batch payload; packed responses carry the column order (and row format) in headers.
+
+    The typed row format is offered when feature_dtypes are given and all of them are fixed-width.
+    """
+    try:
+        codes = [struct_code(dtype) for dtype in feature_dtypes] if feature_dtypes else None
+    except ValueError:
+        codes = None
+    typed_packable = codes is not None and None not in codes
+    media_type = negotiate_media_type(accept, packable=True, typed_packable=typed_packable)
+    if media_type in (PACKED_FLOAT32_MEDIA_TYPE, PACKED_ROWS_MEDIA_TYPE):
+        # Rows read pre-packed from storage (PackedOnlineStore) are sent as they are
+        prepacked = payload.get("packed_rows") is not None
+        if prepacked and media_type != PACKED_ROWS_MEDIA_TYPE:
+            raise ValueError("Pre-packed rows can only be sent as " + PACKED_ROWS_MEDIA_TYPE)
+        headers = {
+            "X-Feature-Names": ",".join(feature_names),
+            "X-Feature-Version": str(payload["version"]),
+            "X-Row-Count": str(payload["row_count"] if prepacked else len(payload["features"])),
+        }
+        if payload.get("fallback"):
+            headers["X-Feature-Fallback"] = "1"
+        if media_type == PACKED_ROWS_MEDIA_TYPE:
+            headers["X-Feature-Format"] = typed_row_format(codes)
+            content = payload["packed_rows"] if prepacked else pack_typed_rows(feature_names, codes, payload["features"])
+        else:
+            content = pack_float32_rows(feature_names, payload["features"])
+        return Response(content=content, media_type=media_type, headers=headers)
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return Response(content=encode_msgpack(payload), media_type=media_type)
+    return Response(content=encode_json(payload), media_type=JSON_MEDIA_TYPE)
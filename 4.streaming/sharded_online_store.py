@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Union
+import pandas as pd
+from online_store import OnlineStore
+from hashing import stable_hash
+from entity_keys import EntityColumns, key_columns, row_key, split_primary_key
+
+class ShardedOnlineStore:
+    """Splits every table across N SQLite files by entity-key hash, each with its own writer thread.
+
+    Same API as OnlineStore. Batch reads are split per shard, run in parallel and merged
+    back into request order.
+    """
+
+    def __init__(self, db_path: str, num_shards: int = 4, read_only: bool = False):
+        self.db_path = db_path
+        self.num_shards = num_shards
+        root, ext = os.path.splitext(db_path)
+        self.shards = [OnlineStore(f"{root}.shard{i}{ext or '.db'}", read_only=read_only) for i in range(num_shards)]
+        self.key_columns: Dict[str, List[str]] = {}
+        self.executor = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="online-shard-read")
+
+    def shard_index(self, entity_value: Any) -> int:
+        # Composite keys (tuples, or lists from JSON) hash over all their components
+        return stable_hash(entity_value) % self.num_shards
+
+    def _shard_ids(self, data: pd.DataFrame, key_names: List[str]) -> pd.Series:
+        """Shard of every row, indexed like data so groupby yields plain int group keys."""
+        if len(key_names) == 1:
+            return data[key_names[0]].map(self.shard_index)
+        return pd.Series([self.shard_index(key) for key in data[key_names].itertuples(index=False, name=None)],
+                         index=data.index, dtype="int64")
+
+    def create_table(self, table_name: str, schema: Dict[str, str], ttl: Optional[int] = None):
+        # The entity key is the PRIMARY KEY column(s) if declared, otherwise the first column
+        self.key_columns[table_name] = split_primary_key(schema)[1]
+        for shard in self.shards:
+            shard.create_table(table_name, schema, ttl)
+
+    def set_ttl(self, table_name: str, ttl: int):
+        for shard in self.shards:
+            shard.set_ttl(table_name, ttl)
+
+    def sweep_expired(self, batch_size: int = 1000):
+        for shard in self.shards:
+            shard.sweep_expired(batch_size)
+
+    def start_ttl_sweeper(self, interval: float = 60.0, batch_size: int = 1000):
+        for shard in self.shards:
+            shard.start_ttl_sweeper(interval, batch_size)
+
+    def insert_data(self, table_name: str, data: Union[Dict[str, Any], pd.DataFrame]):
+        key_names = self.key_columns[table_name]
+        if isinstance(data, dict):
+            self.shards[self.shard_index(row_key(data, key_names))].insert_data(table_name, data)
+        elif isinstance(data, pd.DataFrame):
+            for shard_id, part in data.groupby(self._shard_ids(data, key_names)):
+                self.shards[shard_id].insert_data(table_name, part)
+        else:
+            raise ValueError("Data must be either a dictionary or a pandas DataFrame")
+
+    def upsert_data(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        for shard_id, part in data.groupby(self._shard_ids(data, key_columns(key_column))):
+            self.shards[shard_id].upsert_data(table_name, part, key_column)
+
+    def add_columns(self, table_name: str, columns: Dict[str, str]):
+        for shard in self.shards:
+            shard.add_columns(table_name, columns)
+
+    def fill_missing(self, table_name: str, data: pd.DataFrame, key_column: EntityColumns):
+        for shard_id, part in data.groupby(self._shard_ids(data, key_columns(key_column))):
+            self.shards[shard_id].fill_missing(table_name, part, key_column)
+
+    def flush(self):
+        for shard in self.shards:
+            shard.flush()
+
+    @property
+    def failed_writes(self) -> int:
+        return sum(shard.failed_writes for shard in self.shards)
+
+    def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Dict[str, Any]:
+        return self.shards[self.shard_index(entity_value)].get_online_features(table_name, entity_column, entity_value)
+
+    def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        positions: Dict[int, List[int]] = {}
+        for position, value in enumerate(entity_values):
+            positions.setdefault(self.shard_index(value), []).append(position)
+
+        futures = {
+            shard_id: self.executor.submit(self.shards[shard_id].get_online_features_batch, table_name, entity_column,
+                                           [entity_values[p] for p in shard_positions])
+            for shard_id, shard_positions in positions.items()
+        }
+        results: List[Optional[Dict[str, Any]]] = [None] * len(entity_values)
+        for shard_id, future in futures.items():
+            for position, row in zip(positions[shard_id], future.result()):
+                results[position] = row
+        return results
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.executor.shutdown(wait=True)
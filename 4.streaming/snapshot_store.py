@@ -0,0 +1,323 @@
+import os
+import mmap
+import json
+import time
+import struct
+import sqlite3
+import hashlib
+import threading
+from numbers import Real
+from threading import Lock
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from feature_repository import FeatureView
+from online_store import INGESTED_AT
+from dtypes import struct_code, coerce, float32_value
+from entity_keys import EntityColumns, row_key
+
+# File layout (little endian, all sections 8-byte aligned):
+#   header | metadata JSON | hash index (n_slots x [key int64, row int64]) | rows (n_rows x row_size)
+#   | key offsets ((n_rows + 1) x uint64) | key bytes
+# Each row is a null bitmap followed by one fixed-width cell per feature, sized by the feature's dtype
+# (e.g. int8 -> 1 byte, float32 -> 4 bytes). The struct codes are recorded in the metadata.
+# Integer keys are their own index key. String and composite keys are indexed by a 64-bit hash,
+# so their encoded form is kept in the key section and compared on every probe hit.
+MAGIC = b"FSSNAP02"
+HEADER = struct.Struct("<8sQQQQ")  # magic, n_rows, n_slots, row_size, metadata length
+SLOT = struct.Struct("<qq")
+KEY_RANGE = struct.Struct("<QQ")  # start and end of one row's key bytes
+EMPTY_SLOT = -1
+MASK64 = (1 << 64) - 1
+KEY_KIND_INT = "int"
+KEY_KIND_STR = "str"
+KEY_KIND_TUPLE = "tuple"  # Composite entity keys
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+def _mix64(x: int) -> int:
+    """splitmix64 finalizer; spreads sequential ids across the index."""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def _to_int64(x: int) -> int:
+    x &= MASK64
+    return x - (1 << 64) if x >= (1 << 63) else x
+
+def _hash64(encoded: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little", signed=True)
+
+def _encode_key(key: Any, key_kind: str) -> Optional[bytes]:
+    """Exact byte form of a string or composite key; None for integer keys, which need none."""
+    if key_kind == KEY_KIND_STR:
+        return str(key).encode("utf-8")
+    if key_kind == KEY_KIND_TUPLE:
+        # Integral components (3 and 3.0 alike) are written as ints so writers and readers agree
+        return json.dumps([int(c) if isinstance(c, Real) and float(c).is_integer() else str(c)
+                           for c in key]).encode("utf-8")
+    return None
+
+def _normalize_key(key: Any, key_kind: str) -> Tuple[int, Optional[bytes]]:
+    """Index key and exact key bytes (None for integer keys) of an entity value."""
+    encoded = _encode_key(key, key_kind)
+    if encoded is not None:
+        return _hash64(encoded), encoded
+    if isinstance(key, Real) and not float(key).is_integer():
+        # int() would truncate, serving entity 1 for 1.5
+        raise ValueError(f"{key!r} is not an integer entity key")
+    return _to_int64(int(key)), None
+
+def _cell_code(dtype: str) -> str:
+    code = struct_code(dtype)
+    if code is None:
+        raise ValueError(f"Snapshot backend only supports fixed-width features, got {dtype}")
+    return code
+
+def write_snapshot(path: str, feature_view: FeatureView, rows: Iterable[Dict[str, Any]]) -> int:
+    """Compile rows for a feature view into an immutable snapshot file and atomically swap it into place.
+
+    Later rows for the same entity win. Returns the number of entities written.
+    """
+    entity_columns = feature_view.entities
+    names = [feature.name for feature in feature_view.features]
+    codes = [_cell_code(feature.dtype) for feature in feature_view.features]
+    bitmap_len = _align8((len(names) + 7) // 8)
+    row_struct = struct.Struct("<" + f"{bitmap_len}s" + "".join(codes))
+
+    # Deduplicated by exact key, so two entities whose hashes collide keep separate rows
+    keys: Dict[Any, int] = {}
+    index_keys: List[int] = []
+    key_bytes: List[bytes] = []
+    cells: List[bytes] = []
+    key_kind = None
+    for row in rows:
+        entity = row_key(row, entity_columns)
+        if key_kind is None:
+            key_kind = KEY_KIND_TUPLE if len(entity_columns) > 1 else KEY_KIND_STR if isinstance(entity, str) else KEY_KIND_INT
+        bitmap = bytearray(bitmap_len)
+        values = []
+        for i, (name, code) in enumerate(zip(names, codes)):
+            value = row.get(name)
+            if value is None or value != value:  # None or NaN
+                bitmap[i // 8] |= 1 << (i % 8)
+                value = 0
+            values.append(coerce(value, code))
+        packed = row_struct.pack(bytes(bitmap), *values)
+        key, encoded = _normalize_key(entity, key_kind)
+        exact = key if encoded is None else encoded
+        if exact in keys:
+            cells[keys[exact]] = packed
+        else:
+            keys[exact] = len(cells)
+            cells.append(packed)
+            index_keys.append(key)
+            key_bytes.append(encoded or b"")
+
+    n_slots = 8
+    while n_slots < 2 * len(keys):
+        n_slots *= 2
+    index = bytearray(SLOT.pack(0, EMPTY_SLOT) * n_slots)
+    for row_id, key in enumerate(index_keys):
+        slot = _mix64(key) & (n_slots - 1)
+        while SLOT.unpack_from(index, slot * SLOT.size)[1] != EMPTY_SLOT:
+            slot = (slot + 1) & (n_slots - 1)
+        SLOT.pack_into(index, slot * SLOT.size, key, row_id)
+
+    metadata = json.dumps({
+        "feature_view": feature_view.name,
+        "version": feature_view.version,
+        "entity_column": entity_columns[0],
+        "entity_columns": entity_columns,
+        "key_kind": key_kind or KEY_KIND_INT,
+        "features": names,
+        "codes": codes,
+        "bitmap_len": bitmap_len,
+    }).encode("utf-8")
+    metadata += b" " * (_align8(len(metadata)) - len(metadata))
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(cells), n_slots, row_struct.size, len(metadata)))
+        f.write(metadata)
+        f.write(index)
+        for packed in cells:
+            f.write(packed)
+        rows_len = len(cells) * row_struct.size
+        f.write(b"\0" * (_align8(rows_len) - rows_len))
+        offset = 0
+        for encoded in key_bytes:
+            f.write(struct.pack("<Q", offset))
+            offset += len(encoded)
+        f.write(struct.pack("<Q", offset))
+        for encoded in key_bytes:
+            f.write(encoded)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers holding the old mapping keep a valid view of the old inode until they reopen
+    os.replace(tmp_path, path)
+    return len(cells)
+
+def build_snapshot_from_online_store(online_store: Any, feature_view: FeatureView, snapshot_dir: str) -> str:
+    """Compile the current SQLite contents of a feature view into <snapshot_dir>/<view>.snap."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f"{feature_view.name}.snap")
+    conn = sqlite3.connect(online_store.db_path)
+    try:
+        cursor = conn.execute(f"SELECT * FROM {feature_view.name} WHERE {INGESTED_AT} >= ?",
+                              (time.time() - feature_view.ttl,))
+        columns = [column[0] for column in cursor.description]
+        write_snapshot(path, feature_view, (dict(zip(columns, result)) for result in cursor))
+    finally:
+        conn.close()
+    return path
+
+class SnapshotRefresher:
+    """Recompiles the snapshots of every feature view from the writer's SQLite online store every
+    interval seconds. Readers pick up each new file on their next inode check; rows past their
+    TTL are dropped by each rebuild.
+    """
+
+    def __init__(self, online_store: Any, feature_repo: Any, snapshot_dir: str, interval: float = 60.0):
+        self.online_store = online_store
+        self.feature_repo = feature_repo
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self._stop = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        for name in self.feature_repo.list_feature_views():
+            try:
+                build_snapshot_from_online_store(self.online_store, self.feature_repo.get_feature_view(name), self.snapshot_dir)
+            except Exception as e:
+                # The previous snapshot keeps serving until a rebuild succeeds
+                print(f"Error refreshing snapshot for {name}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="snapshot-refresh", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+
+class Snapshot:
+    """A read-only memory mapping of one snapshot file; pages are shared through the OS page cache."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_rows, self.n_slots, row_size, metadata_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a feature snapshot")
+        self.metadata = json.loads(self._mmap[HEADER.size:HEADER.size + metadata_len])
+        self.entity_column = self.metadata["entity_column"]
+        self.entity_columns = self.metadata.get("entity_columns", [self.entity_column])
+        self.key_kind = self.metadata["key_kind"]
+        self.features = self.metadata["features"]
+        self._bitmap_len = self.metadata["bitmap_len"]
+        self._row_struct = struct.Struct("<" + f"{self._bitmap_len}s" + "".join(self.metadata["codes"]))
+        self._float32 = [code == "f" for code in self.metadata["codes"]]
+        assert self._row_struct.size == row_size
+        self._index_offset = HEADER.size + metadata_len
+        self._rows_offset = self._index_offset + self.n_slots * SLOT.size
+        self._key_offsets = self._rows_offset + _align8(self.n_rows * row_size)
+        self._key_bytes = self._key_offsets + (self.n_rows + 1) * 8
+
+    def _stored_key(self, row_id: int) -> bytes:
+        start, end = KEY_RANGE.unpack_from(self._mmap, self._key_offsets + row_id * 8)
+        return self._mmap[self._key_bytes + start:self._key_bytes + end]
+
+    def lookup(self, entity_value: Any) -> Optional[Dict[str, Any]]:
+        try:
+            key, encoded = _normalize_key(entity_value, self.key_kind)
+        except (TypeError, ValueError):
+            return None
+        mask = self.n_slots - 1
+        slot = _mix64(key) & mask
+        while True:
+            slot_key, row_id = SLOT.unpack_from(self._mmap, self._index_offset + slot * SLOT.size)
+            if row_id == EMPTY_SLOT:
+                return None
+            # A hash match is only a candidate until the stored key bytes agree
+            if slot_key == key and (encoded is None or self._stored_key(row_id) == encoded):
+                break
+            slot = (slot + 1) & mask
+        bitmap, *values = self._row_struct.unpack_from(self._mmap, self._rows_offset + row_id * self._row_struct.size)
+        if len(self.entity_columns) == 1:
+            result = {self.entity_column: entity_value}
+        else:
+            result = dict(zip(self.entity_columns, entity_value))
+        for i, (name, value) in enumerate(zip(self.features, values)):
+            if bitmap[i // 8] & (1 << (i % 8)):
+                value = None
+            elif self._float32[i]:
+                value = float32_value(value)
+            result[name] = value
+        return result
+
+    def close(self):
+        self._mmap.close()
+
+class SnapshotOnlineStore:
+    """Online store backed by immutable memory-mapped snapshots, one file per feature view.
+
+    Exposes the same read API as OnlineStore. A refreshed snapshot is picked up when its
+    inode changes, checked at most once per check_interval seconds.
+    """
+
+    def __init__(self, snapshot_dir: str, check_interval: float = 1.0):
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def set_ttl(self, table_name: str, ttl: int):
+        # Snapshots are immutable; expired rows are dropped when the snapshot is built
+        pass
+
+    def _path(self, table_name: str) -> str:
+        return os.path.join(self.snapshot_dir, f"{table_name}.snap")
+
+    def _get_snapshot(self, table_name: str) -> Optional[Snapshot]:
+        snapshot = self._snapshots.get(table_name)
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at.get(table_name, 0) < self.check_interval:
+            return snapshot
+        with self._lock:
+            self._checked_at[table_name] = now
+            try:
+                inode = os.stat(self._path(table_name)).st_ino
+            except FileNotFoundError:
+                return snapshot
+            if snapshot is None or snapshot.inode != inode:
+                # The previous mapping is released once in-flight lookups drop their reference
+                snapshot = Snapshot(self._path(table_name))
+                self._snapshots[table_name] = snapshot
+        return snapshot
+
+    def get_online_features(self, table_name: str, entity_column: EntityColumns, entity_value: Any) -> Optional[Dict[str, Any]]:
+        snapshot = self._get_snapshot(table_name)
+        if snapshot is None:
+            return None
+        return snapshot.lookup(entity_value)
+
+    def get_online_features_batch(self, table_name: str, entity_column: EntityColumns, entity_values: List[Any]) -> List[Optional[Dict[str, Any]]]:
+        snapshot = self._get_snapshot(table_name)
+        if snapshot is None:
+            return [None] * len(entity_values)
+        return [snapshot.lookup(value) for value in entity_values]
+
+    def close(self):
+        with self._lock:
+            snapshots, self._snapshots = list(self._snapshots.values()), {}
+        for snapshot in snapshots:
+            snapshot.close()
@@ -3,12 +3,23 @@ from typing import Dict, Any, List
 from feature_repository import FeatureRepository, FeatureView
 from online_store import OnlineStore
 from offline_store import OfflineStore
+from offline_writer import OfflineWriteBuffer
+from feature_statistics import FeatureStatistics
+from write_ahead_log import WriteAheadLog
 
 class StreamingProcessor:
-    def __init__(self, feature_repo: FeatureRepository, online_store: OnlineStore, offline_store: OfflineStore):
+    def __init__(self, feature_repo: FeatureRepository, online_store: OnlineStore, offline_store: OfflineStore,
+                 offline_buffer: OfflineWriteBuffer = None, statistics: FeatureStatistics = None,
+                 wal: WriteAheadLog = None):
         self.feature_repo = feature_repo
         self.online_store = online_store
         self.offline_store = offline_store
+        # When set, offline writes are batched and bulk-appended instead of one INSERT per event
+        self.offline_buffer = offline_buffer
+        # Optional incremental sketches for drift monitoring
+        self.statistics = statistics
+        # When set, both store writes go through the log, which applies them together after fsync
+        self.wal = wal
 
     def process_event(self, event: Dict[str, Any]):
         """Process a single event and update features."""
@@ -30,11 +41,21 @@ class StreamingProcessor:
         for entity in feature_view.entities:
             new_features[entity] = event[entity]
         
-        # Update online store
-        self.online_store.insert_data(feature_view.name, new_features)
-        
-        # Update offline store
-        self.offline_store.insert_data(feature_view.name, new_features)
+        if self.wal is not None:
+            # Logged once; the log applies it to both stores
+            self.wal.append(feature_view.name, new_features)
+        else:
+            # Update online store
+            self.online_store.insert_data(feature_view.name, new_features)
+
+            # Update offline store
+            if self.offline_buffer is not None:
+                self.offline_buffer.append(feature_view.name, new_features)
+            else:
+                self.offline_store.insert_data(feature_view.name, new_features)
+
+        if self.statistics is not None:
+            self.statistics.update_row(feature_view.name, new_features, feature_view.timestamp_field)
 
     def _compute_features(self, event: Dict[str, Any], feature_view: FeatureView) -> Dict[str, Any]:
         """Compute feature values based on the event and feature view definition."""
@@ -48,9 +69,12 @@ class StreamingProcessor:
                 computed_features[feature.name] = 0
         return computed_features
 
-    def run(self, event_stream):
-        """Run the streaming processor on an event stream."""
+    def run(self, event_stream, delay: float = 0.1) -> int:
+        """Run the streaming processor on an event stream; delay=0 processes events as fast as they arrive."""
+        processed = 0
         for event in event_stream:
             self.process_event(event)
-            # In a real system, you might want to add some rate limiting or batching here
-            time.sleep(0.1)  # Simulate some processing time
\ No newline at end of file
+            processed += 1
+            if delay:
+                time.sleep(delay)  # Simulate some processing time
+        return processed
\ No newline at end of file
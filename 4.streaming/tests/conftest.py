@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+# The modules in 4.streaming import each other by plain name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Stores create their files relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
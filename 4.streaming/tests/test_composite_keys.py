@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+from feature_repository import FeatureView, Feature
+from online_store import OnlineStore
+from sharded_online_store import ShardedOnlineStore
+from memory_store import ShardedMemoryStore
+from packed_store import PackedOnlineStore
+from offline_store import OfflineStore
+from snapshot_store import write_snapshot, Snapshot
+
+KEYS = ["customer_id", "merchant_id"]
+VIEW = FeatureView(name="pairs", features=[Feature(name="amount", dtype="float64"), Feature(name="cnt", dtype="int32")],
+                   entities=KEYS, ttl=3600, version=1)
+
+def make_rows():
+    return pd.DataFrame([{"customer_id": c, "merchant_id": m, "amount": c * 10.0 + m, "cnt": c + m}
+                         for c in range(10) for m in range(4)])
+
+@pytest.fixture(params=["sqlite", "sharded", "memory", "packed"])
+def store(request):
+    store = {
+        "sqlite": lambda: OnlineStore("online.db"),
+        "sharded": lambda: ShardedOnlineStore("online.db", num_shards=3),
+        "memory": lambda: ShardedMemoryStore(num_shards=4),
+        "packed": lambda: PackedOnlineStore("online.packed.db"),
+    }[request.param]()
+    store.create_table("pairs", VIEW.table_schema(primary_key=True), ttl=VIEW.ttl)
+    store.flush()
+    yield store
+    store.close()
+
+def test_multi_row_upsert_and_batch_read(store):
+    store.upsert_data("pairs", make_rows(), KEYS)
+    store.flush()
+    rows = store.get_online_features_batch("pairs", KEYS, [(3, 2), [9, 0], (3, 7)])
+    assert rows[0] == {"customer_id": 3, "merchant_id": 2, "amount": 32.0, "cnt": 5}
+    assert rows[1]["amount"] == 90.0
+    assert rows[2] is None
+    assert store.get_online_features("pairs", KEYS, [2, 3])["cnt"] == 5
+
+def test_single_row_writes(store):
+    store.upsert_data("pairs", make_rows(), KEYS)
+    # One entity per frame, as the write-ahead log and partitioned workers send after drop_duplicates
+    store.upsert_data("pairs", pd.DataFrame([{"customer_id": 1, "merchant_id": 1, "amount": -1.0, "cnt": None}]), KEYS)
+    store.insert_data("pairs", pd.DataFrame([{"customer_id": 50, "merchant_id": 5, "amount": 5.0, "cnt": 55}]))
+    store.flush()
+    store.fill_missing("pairs", pd.DataFrame([{"customer_id": 1, "merchant_id": 1, "cnt": 7}]), KEYS)
+    store.flush()
+    assert getattr(store, "failed_writes", 0) == 0
+    rows = store.get_online_features_batch("pairs", KEYS, [(1, 1), (50, 5), (1, 2)])
+    assert rows[0] == {"customer_id": 1, "merchant_id": 1, "amount": -1.0, "cnt": 7}
+    assert rows[1]["cnt"] == 55
+    assert rows[2]["amount"] == 12.0
+
+def test_keys_are_ordered():
+    store = OnlineStore("online.db")
+    store.create_table("pairs", VIEW.table_schema(primary_key=True))
+    store.upsert_data("pairs", pd.DataFrame([{"customer_id": 1, "merchant_id": 2, "amount": 1.0, "cnt": 1}]), KEYS)
+    store.flush()
+    assert store.get_online_features("pairs", KEYS, (2, 1)) is None
+    store.close()
+
+def test_offline_store_composite_reads():
+    offline = OfflineStore("offline.duckdb")
+    offline.create_table("pairs", VIEW.table_schema(primary_key=True), VIEW.column_dtypes())
+    offline.append_data("pairs", make_rows())
+    result = offline.get_batch_features("pairs", KEYS, [(3, 2), [9, 0], (3, 7)])
+    assert sorted(zip(result["customer_id"], result["merchant_id"])) == [(3, 2), (9, 0)]
+    assert len(offline.get_all_entity_ids("pairs", KEYS)) == 40
+    assert sum(len(chunk) for chunk in offline.iter_batch_features("pairs", KEYS, [(0, 0), (0, 1)])) == 2
+    offline.close()
+
+def test_snapshot_composite_lookup():
+    write_snapshot("pairs.snap", VIEW, make_rows().to_dict("records"))
+    snapshot = Snapshot("pairs.snap")
+    assert snapshot.lookup([3, 2])["amount"] == 32.0
+    assert snapshot.lookup((2, 3))["amount"] == 23.0
+    assert snapshot.lookup((3, 9)) is None
+    snapshot.close()
@@ -0,0 +1,65 @@
+import itertools
+import json
+import duckdb
+import pytest
+from event_sources import CsvFileSource, JsonlFileSource, ParquetEventSource
+
+EVENTS = [{"customer_id": i, "amount": i * 1.5} for i in range(10)]
+
+def write_jsonl(path):
+    with open(path, "w") as f:
+        for event in EVENTS:
+            f.write(json.dumps(event) + "\n")
+        f.write("\n")
+
+def write_csv(path):
+    with open(path, "w") as f:
+        f.write("customer_id,amount\n")
+        for event in EVENTS:
+            f.write(f"{event['customer_id']},{event['amount']}\n")
+
+def write_parquet(path):
+    conn = duckdb.connect()
+    conn.execute(f"COPY (SELECT range AS customer_id, range * 1.5 AS amount FROM range(10)) TO '{path}' (FORMAT PARQUET)")
+    conn.close()
+
+SOURCES = {
+    "jsonl": (JsonlFileSource, "events.jsonl", write_jsonl),
+    "csv": (CsvFileSource, "events.csv", write_csv),
+    "parquet": (ParquetEventSource, "events.parquet", write_parquet),
+}
+
+@pytest.fixture(params=sorted(SOURCES))
+def source_factory(request):
+    source_class, path, write = SOURCES[request.param]
+    write(path)
+    return lambda **kwargs: source_class(path, **kwargs)
+
+def ids(events):
+    return [event["customer_id"] for event in events]
+
+def test_reads_everything(source_factory):
+    assert ids(source_factory(batch_size=4)) == list(range(10))
+
+def test_resume_mid_batch(source_factory):
+    source = source_factory(batch_size=4)
+    # Stop after the second event of the second batch
+    first = list(itertools.islice(iter(source), 6))
+    assert ids(first) == list(range(6))
+
+    resumed = source_factory(batch_size=4, start_offset=source.offset)
+    assert ids(resumed) == list(range(6, 10))
+
+def test_resume_after_batches(source_factory):
+    source = source_factory(batch_size=4)
+    # Parquet batches are whole DuckDB vectors, so the first batch may hold every row
+    first = ids(next(source.iter_batches()))
+    assert first == list(range(len(first)))
+
+    resumed = source_factory(batch_size=4, start_offset=source.offset)
+    assert ids(resumed) == list(range(len(first), 10))
+
+def test_offset_at_end_resumes_nothing(source_factory):
+    source = source_factory(batch_size=3)
+    assert len(list(source)) == 10
+    assert list(source_factory(start_offset=source.offset)) == []
@@ -0,0 +1,79 @@
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from feature_repository import FeatureRepository
+from online_store import OnlineStore
+from offline_store import OfflineStore
+from feature_statistics import FeatureSketch, FeatureStatistics, StatisticsStore
+from feature_serving import app, FeatureStoreService
+
+@pytest.fixture
+def values():
+    rng = random.Random(7)
+    return [rng.lognormvariate(3, 1) for _ in range(40000)]
+
+def sketch_of(values):
+    sketch = FeatureSketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+def test_merged_sketches_match_the_whole(values):
+    # Four partitions sketched separately, as separate workers or time buckets would
+    merged = FeatureSketch()
+    for part in np.array_split(np.array(values), 4):
+        merged.merge(FeatureSketch.from_bytes(sketch_of(part.tolist()).to_bytes()))
+    summary = merged.summary()
+
+    assert summary["count"] == len(values)
+    assert summary["mean"] == pytest.approx(np.mean(values), rel=1e-9)
+    assert summary["variance"] == pytest.approx(np.var(values, ddof=1), rel=1e-9)
+    assert (summary["min"], summary["max"]) == (min(values), max(values))
+    ordered = sorted(values)
+    for q, estimate in ((0.5, summary["p50"]), (0.9, summary["p90"]), (0.99, summary["p99"])):
+        # KLL bounds the rank error rather than the value error
+        rank = np.searchsorted(ordered, estimate) / len(values)
+        assert abs(rank - q) < 0.02
+    assert summary["distinct_count"] == pytest.approx(len(set(values)), rel=0.05)
+
+def test_distinct_count_merges_overlapping_parts():
+    left, right = sketch_of(range(0, 6000)), sketch_of(range(3000, 9000))
+    left.merge(right)
+    assert left.summary()["distinct_count"] == pytest.approx(9000, rel=0.05)
+
+def test_missing_values_count_as_nulls():
+    sketch = sketch_of([1, None, float("nan"), pd.NA, pd.NaT, 3])
+    summary = sketch.summary()
+    assert summary["null_rate"] == pytest.approx(4 / 6)
+    assert summary["mean"] == 2.0
+    assert summary["distinct_count"] == 2
+
+def test_buckets_are_queried_from_a_read_only_handle():
+    offline_store = OfflineStore("offline.db")
+    statistics = FeatureStatistics(StatisticsStore(offline_store), bucket_seconds=60)
+    statistics.update_frame("customers", pd.DataFrame({"amount": [1.0, 2.0, 3.0], "ts": [0.0, 30.0, 90.0]}), "ts")
+    statistics.flush()
+    statistics.update_row("customers", {"amount": 4.0, "ts": 100.0}, "ts")
+    statistics.flush()
+    offline_store.close()
+
+    # Serving workers open the file read-only once the writer is gone
+    reader = StatisticsStore(OfflineStore("offline.db", read_only=True))
+    assert reader.query("customers")["amount"]["count"] == 4
+    assert reader.query("customers", start=60)["amount"]["mean"] == 3.5
+    assert reader.query("customers", end=60)["amount"]["max"] == 2.0
+
+    online_store = OnlineStore("online.db")
+    service = FeatureStoreService(FeatureRepository(), online_store, statistics_store=reader)
+    app.state.feature_store_service = service
+    try:
+        with TestClient(app) as client:
+            assert client.get("/feature_statistics/customers").json()["features"]["amount"]["count"] == 4
+            assert client.get("/feature_statistics/unknown").status_code == 404
+    finally:
+        app.state.feature_store_service = None
+        service.close()
+        online_store.close()
+        reader.offline_store.close()
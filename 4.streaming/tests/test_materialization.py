@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from feature_repository import FeatureView, Feature
+from online_store import OnlineStore
+from offline_store import OfflineStore
+from materialization import Materializer
+
+VIEW = FeatureView(name="customers", features=[Feature(name="amount", dtype="float64"), Feature(name="ts", dtype="float64")],
+                   entities=["customer_id"], ttl=3600, version=1, timestamp_field="ts")
+
+@pytest.fixture
+def stores():
+    online_store = OnlineStore("online.db")
+    offline_store = OfflineStore("offline.db")
+    online_store.create_table("customers", VIEW.table_schema(primary_key=True))
+    offline_store.create_table("customers", VIEW.table_schema(), VIEW.column_dtypes())
+    online_store.flush()
+    yield online_store, offline_store
+    online_store.close()
+    offline_store.close()
+
+def append(offline_store, rows):
+    offline_store.append_data("customers", pd.DataFrame(rows, columns=["customer_id", "amount", "ts"]))
+
+def materializer(online_store, offline_store):
+    return Materializer(offline_store, online_store, watermark_path="watermarks.json", chunk_size=2,
+                        progress_callback=lambda name, written, total: None)
+
+def test_incremental_runs_advance_the_watermark(stores):
+    online_store, offline_store = stores
+    runner = materializer(online_store, offline_store)
+    append(offline_store, [(1, 1.0, 10.0), (1, 2.0, 20.0), (2, 5.0, 15.0)])
+    assert runner.materialize_incremental(VIEW) == 2
+    assert runner.get_watermark("customers") == 20.0
+    assert online_store.get_online_features("customers", "customer_id", 1)["amount"] == 2.0
+
+    # Nothing new: no rows are rewritten and the watermark stays put
+    assert runner.materialize_incremental(VIEW) == 0
+
+    append(offline_store, [(2, 6.0, 30.0), (3, 7.0, 25.0), (1, 0.5, 5.0)])
+    # Only rows after the watermark are read; the late row for customer 1 is not replayed over newer data
+    assert runner.materialize_incremental(VIEW) == 2
+    assert runner.get_watermark("customers") == 30.0
+    assert online_store.get_online_features("customers", "customer_id", 1)["amount"] == 2.0
+    assert online_store.get_online_features("customers", "customer_id", 2)["amount"] == 6.0
+
+def test_watermark_survives_a_restart(stores):
+    online_store, offline_store = stores
+    append(offline_store, [(1, 1.0, 10.0)])
+    materializer(online_store, offline_store).materialize_incremental(VIEW)
+    assert materializer(online_store, offline_store).get_watermark("customers") == 10.0
+
+def test_failed_writes_keep_the_watermark(stores):
+    online_store, offline_store = stores
+    runner = materializer(online_store, offline_store)
+    append(offline_store, [(1, 1.0, 10.0)])
+    runner.materialize_incremental(VIEW)
+    append(offline_store, [(2, 2.0, 20.0)])
+    # A store without the table rejects every write
+    broken = OnlineStore("other.db")
+    runner.online_store = broken
+    try:
+        with pytest.raises(RuntimeError):
+            runner.materialize_incremental(VIEW)
+    finally:
+        broken.close()
+    assert runner.get_watermark("customers") == 10.0
+
+def test_datetime_watermarks_round_trip():
+    runner = Materializer(None, None, watermark_path="watermarks.json")
+    moment = datetime(2024, 5, 1, 12, 30) + timedelta(microseconds=5)
+    runner.set_watermark("customers", moment)
+    assert runner.get_watermark("customers") == moment
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import pandas as pd
+from memory_store import ShardedMemoryStore
+
+PLACEMENT = """
+import sys
+import pandas as pd
+sys.path.insert(0, {path!r})
+from memory_store import ShardedMemoryStore
+store = ShardedMemoryStore(num_shards=8)
+store.create_table("users", {{"user_id": "TEXT PRIMARY KEY", "score": "DOUBLE"}})
+table = store.tables["users"]
+print([table.shards.index(table.shard_for(key)) for key in ["alice", "bob", ("carol", 3), b"dave"]])
+"""
+
+def shard_indexes(hash_seed):
+    code = PLACEMENT.format(path=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, "PYTHONHASHSEED": str(hash_seed)}
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+
+def test_placement_does_not_depend_on_hash_seed():
+    assert shard_indexes(1) == shard_indexes(2)
+
+def test_snapshot_reload_finds_string_keys(tmp_path):
+    store = ShardedMemoryStore(num_shards=8)
+    store.create_table("users", {"user_id": "TEXT PRIMARY KEY", "score": "DOUBLE"})
+    store.upsert_data("users", pd.DataFrame({"user_id": ["alice", "bob"], "score": [1.0, 2.0]}), "user_id")
+    store.save_snapshot(str(tmp_path / "users.snapshot"))
+    reloaded = ShardedMemoryStore(num_shards=8)
+    reloaded.load_snapshot(str(tmp_path / "users.snapshot"))
+    assert reloaded.get_online_features("users", "user_id", "bob")["score"] == 2.0
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from feature_repository import FeatureRepository, FeatureView, Feature, OnDemandFeature
+from memory_store import ShardedMemoryStore
+from on_demand import apply_on_demand, RequestContextError
+from feature_serving import app, FeatureStoreService
+
+VIEW = FeatureView(
+    name="customers",
+    features=[Feature(name="amount", dtype="float64")],
+    on_demand_features=[
+        OnDemandFeature(name="root", dtype="float64", expression="np.sqrt(amount) * scale"),
+        OnDemandFeature(name="doubled", dtype="float64", expression="root * 2"),
+    ],
+    entities=["customer_id"], ttl=3600, version=1)
+
+def rows():
+    return [{"customer_id": 1, "amount": 4.0}, None, {"customer_id": 3, "amount": 9.0}]
+
+def test_scalar_and_aligned_context():
+    assert [row and row["doubled"] for row in apply_on_demand(VIEW, rows(), {"scale": 1})] == [4.0, None, 6.0]
+    assert [row and row["root"] for row in apply_on_demand(VIEW, rows(), {"scale": [1, 5, 10]})] == [2.0, None, 30.0]
+
+def test_attribute_names_are_not_columns():
+    # "sqrt" only appears as np.sqrt, so a context field of that name is never read
+    result = apply_on_demand(VIEW, rows(), {"scale": 1, "sqrt": [1]})
+    assert result[0]["root"] == 2.0
+
+def test_misaligned_context_is_rejected():
+    with pytest.raises(RequestContextError):
+        apply_on_demand(VIEW, rows(), {"scale": [1, 2]})
+
+def test_misaligned_context_is_a_client_error():
+    feature_repo = FeatureRepository()
+    feature_repo.create_feature_view(VIEW)
+    online_store = ShardedMemoryStore(num_shards=2)
+    online_store.create_table("customers", VIEW.table_schema(primary_key=True))
+    online_store.upsert_data("customers", pd.DataFrame({"customer_id": [1, 3], "amount": [4.0, 9.0]}), "customer_id")
+    service = FeatureStoreService(feature_repo, online_store)
+    app.state.feature_store_service = service
+    try:
+        with TestClient(app) as client:
+            request = {"feature_view": "customers", "entity_column": "customer_id", "entity_values": [1, 2, 3]}
+            response = client.post("/get_online_features_batch", json={**request, "request_context": {"scale": [1, 2]}})
+            assert response.status_code == 422
+            response = client.post("/get_online_features_batch", json={**request, "request_context": {"scale": [1, 2, 3]}})
+            assert [row and row["root"] for row in response.json()["features"]] == [2.0, None, 9.0]
+    finally:
+        app.state.feature_store_service = None
+        service.close()
+        online_store.close()
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from feature_repository import FeatureRepository, FeatureView, Feature
+from online_store import OnlineStore
+from offline_store import OfflineStore
+from schema_migration import SchemaMigrator
+
+V1 = FeatureView(name="customers", features=[Feature(name="age", dtype="int32")],
+                 entities=["customer_id"], ttl=3600, version=1)
+
+def v2():
+    return V1.model_copy(update={"features": V1.features + [Feature(name="score", dtype="float64")]})
+
+class RecordingRepository(FeatureRepository):
+    """Remembers which version unversioned lookups resolve to the moment a version is registered."""
+
+    def __init__(self):
+        super().__init__()
+        self.serving_at_register = []
+
+    def create_feature_view(self, feature_view):
+        super().create_feature_view(feature_view)
+        self.serving_at_register.append(self.get_serving_feature_view(feature_view.name).version)
+
+@pytest.fixture
+def migrator():
+    feature_repo = RecordingRepository()
+    feature_repo.create_feature_view(V1.model_copy())
+    online_store = OnlineStore("online.db")
+    offline_store = OfflineStore("offline.db")
+    online_store.create_table("customers", V1.table_schema(primary_key=True))
+    offline_store.create_table("customers", V1.table_schema(), V1.column_dtypes())
+    online_store.upsert_data("customers", pd.DataFrame({"customer_id": [1, 2, 3], "age": [20, 30, 40]}), "customer_id")
+    online_store.flush()
+    offline_store.cursor().execute("CREATE TABLE scores AS SELECT range AS customer_id, range / 10 AS score FROM range(1, 4)")
+    yield SchemaMigrator(feature_repo, offline_store, online_store, chunk_size=2, rows_per_second=1e9,
+                         progress_callback=lambda name, filled: None)
+    online_store.close()
+    offline_store.close()
+
+def test_backfill_then_serve_new_version(migrator):
+    migrator.evolve(v2(), "scores", background=False)
+    assert migrator.feature_repo.serving_at_register == [1, 1]
+    assert migrator.feature_repo.get_serving_feature_view("customers").version == 2
+    assert migrator.online_store.get_online_features("customers", "customer_id", 3) == {
+        "customer_id": 3, "age": 40, "score": 0.3}
+
+def test_failed_backfill_keeps_previous_version(migrator):
+    with pytest.raises(Exception):
+        migrator.evolve(v2(), "missing_source", background=False)
+    assert migrator.feature_repo.serving_at_register == [1, 1]
+    assert migrator.feature_repo.get_serving_feature_view("customers").version == 1
+    # The next attempt resumes and finishes the migration
+    assert migrator.backfill(migrator.feature_repo.get_feature_view("customers"), ["score"], "scores") == 3
+    assert migrator.feature_repo.get_serving_feature_view("customers").version == 2
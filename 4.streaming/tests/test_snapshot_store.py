@@ -0,0 +1,29 @@
+import os
+import pytest
+from feature_repository import FeatureView, Feature
+from snapshot_store import write_snapshot, SnapshotOnlineStore
+
+VIEW = FeatureView(name="customers", features=[Feature(name="score", dtype="float64")],
+                   entities=["customer_id"], ttl=3600, version=1)
+
+@pytest.fixture
+def store():
+    os.makedirs("snapshots")
+    write_snapshot(os.path.join("snapshots", "customers.snap"), VIEW,
+                   [{"customer_id": i, "score": i / 2} for i in range(10)])
+    store = SnapshotOnlineStore("snapshots")
+    yield store
+    store.close()
+
+def test_integer_keys_are_not_truncated(store):
+    assert store.get_online_features("customers", "customer_id", 1)["score"] == 0.5
+    assert store.get_online_features("customers", "customer_id", 1.0)["score"] == 0.5
+    assert store.get_online_features("customers", "customer_id", 1.5) is None
+    assert store.get_online_features_batch("customers", "customer_id", [2, 2.5, "3"]) == [
+        {"customer_id": 2, "score": 1.0}, None, {"customer_id": "3", "score": 1.5}]
+
+def test_close_releases_mappings(store):
+    snapshot = store._get_snapshot("customers")
+    store.close()
+    assert snapshot._mmap.closed
+    assert store._snapshots == {}
@@ -0,0 +1,270 @@
+import os
+import time
+import zlib
+import pickle
+import struct
+import threading
+from queue import Queue
+from typing import Dict, Any, List, Optional, Tuple
+import pandas as pd
+from feature_repository import FeatureRepository
+
+# Every record is framed as (payload length, CRC32 of payload); the payload is a pickled (lsn, table, row)
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".wal"
+CHECKPOINT_FILE = "checkpoint"
+
+class WriteAheadLog:
+    """Durable, group-committed log in front of the online and offline stores.
+
+    append() only queues a row. A committer thread writes everything queued so far as one
+    batch and fsyncs it once, so durability costs one fsync per batch rather than per event.
+    Durable batches are then applied to both stores by a second thread, and the checkpoint
+    (the last fully applied log sequence number, LSN) only moves once both stores have
+    acknowledged the batch. On startup every record after the checkpoint is replayed
+    idempotently: online writes are keyed upserts and offline rows already present (same
+    entities and timestamp) are skipped. A crash between the two stores, or a write that fails
+    inside a store, therefore delays the stores converging instead of silently diverging them.
+    Replay needs that timestamp to tell history rows apart, so only feature views with a
+    timestamp_field can be written through the log.
+
+    The log is split into segments named after their first LSN; segments whose records are
+    all applied are deleted.
+    """
+
+    def __init__(self, directory: str, feature_repo: FeatureRepository, online_store: Any, offline_store: Any,
+                 max_batch_rows: int = 5000, max_latency: float = 0.01, max_pending_rows: int = 100000,
+                 segment_bytes: int = 64 * 1024 * 1024, retry_interval: float = 1.0):
+        self.directory = directory
+        self.feature_repo = feature_repo
+        self.online_store = online_store
+        self.offline_store = offline_store
+        self.max_batch_rows = max_batch_rows
+        self.max_latency = max_latency
+        self.max_pending_rows = max_pending_rows
+        self.segment_bytes = segment_bytes
+        self.retry_interval = retry_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self.applied_lsn = self._read_checkpoint()
+        self.lsn = self.applied_lsn
+        self.durable_lsn = self.applied_lsn
+        self.replayed = self.replay()
+
+        self.pending: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.cond = threading.Condition()
+        self.applied = threading.Condition()
+        self.apply_queue = Queue(maxsize=4)
+        self._closing = False
+        self.segment = None
+        self._open_segment(self.lsn + 1)
+        self._remove_applied_segments()
+        self.committer = threading.Thread(target=self._commit_loop, name="wal-committer", daemon=True)
+        self.applier = threading.Thread(target=self._apply_loop, name="wal-applier", daemon=True)
+        self.committer.start()
+        self.applier.start()
+
+    # Log files
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        names = [name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)]
+        return sorted((int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(self.directory, name)) for name in names)
+
+    def _open_segment(self, first_lsn: int):
+        if self.segment is not None:
+            self.segment.close()
+        self.segment = open(os.path.join(self.directory, f"{first_lsn:020d}{SEGMENT_SUFFIX}"), "ab")
+
+    def _read_checkpoint(self) -> int:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+
+    def _write_checkpoint(self, lsn: int):
+        # A stale checkpoint only means more (idempotent) replay, so no fsync here
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(str(lsn))
+        os.replace(f"{path}.tmp", path)
+
+    def _read_segment(self, path: str):
+        """Yield the records of one segment, truncating a torn record left by a crash mid-write."""
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, checksum = RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            yield pickle.loads(payload)
+            offset += RECORD_HEADER.size + length
+        if offset < len(data):
+            print(f"Truncating {len(data) - offset} bytes of incomplete log records in {path}")
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+
+    def _remove_applied_segments(self):
+        segments = self._segments()
+        # A segment is fully applied once the next one starts at or before applied_lsn + 1
+        for (first_lsn, path), (next_lsn, _) in zip(segments, segments[1:]):
+            if next_lsn - 1 <= self.applied_lsn:
+                os.remove(path)
+
+    @staticmethod
+    def _encode(record: Tuple[int, str, Dict[str, Any]]) -> bytes:
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    # Recovery
+
+    def replay(self, batch_rows: int = 50000) -> int:
+        """Apply every logged record after the checkpoint; safe to repeat. Returns the number replayed."""
+        replayed = 0
+        batch = []
+        for _, path in self._segments():
+            for record in self._read_segment(path):
+                self.lsn = max(self.lsn, record[0])
+                if record[0] <= self.applied_lsn:
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_rows:
+                    replayed += self._replay_batch(batch)
+                    batch = []
+        if batch:
+            replayed += self._replay_batch(batch)
+        self.durable_lsn = self.lsn
+        if replayed:
+            print(f"Replayed {replayed} write-ahead log records up to LSN {self.applied_lsn}")
+        return replayed
+
+    def _replay_batch(self, batch) -> int:
+        self._apply(batch, idempotent=True)
+        self.applied_lsn = batch[-1][0]
+        self._write_checkpoint(self.applied_lsn)
+        return len(batch)
+
+    # Write path
+
+    def append(self, table_name: str, row: Dict[str, Any]) -> int:
+        """Queue one row for both stores and return its LSN; see sync() to wait for durability."""
+        feature_view = self.feature_repo.get_feature_view(table_name)
+        if feature_view is None or not feature_view.timestamp_field:
+            # Without a timestamp, replay would match history rows on entities alone and drop real ones
+            raise ValueError(f"{table_name} needs a feature view with a timestamp_field to be written through the log")
+        with self.cond:
+            # Backpressure: don't let the log fall arbitrarily far behind the producer
+            while len(self.pending) >= self.max_pending_rows:
+                self.cond.wait()
+            if self._closing:
+                raise RuntimeError("WriteAheadLog is closed")
+            self.lsn += 1
+            self.pending.append((self.lsn, table_name, dict(row)))
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch_rows:
+                self.cond.notify_all()
+            return self.lsn
+
+    def sync(self, lsn: Optional[int] = None):
+        """Block until lsn (default: everything appended so far) is on disk."""
+        with self.cond:
+            lsn = self.lsn if lsn is None else lsn
+            while self.durable_lsn < lsn:
+                self.cond.wait()
+
+    def wait_applied(self, lsn: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """Block until lsn (default: everything appended so far) has reached both stores."""
+        with self.cond:
+            lsn = self.lsn if lsn is None else lsn
+        with self.applied:
+            return self.applied.wait_for(lambda: self.applied_lsn >= lsn, timeout)
+
+    def _commit_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self._closing:
+                    self.cond.wait()
+                # Group commit: give other appends up to max_latency to join this batch
+                deadline = time.monotonic() + self.max_latency
+                while len(self.pending) < self.max_batch_rows and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch, self.pending = self.pending, []
+                self.cond.notify_all()
+            if not batch:
+                break
+            self.segment.write(b"".join(self._encode(record) for record in batch))
+            self.segment.flush()
+            os.fsync(self.segment.fileno())
+            with self.cond:
+                self.durable_lsn = batch[-1][0]
+                self.cond.notify_all()
+            self.apply_queue.put(batch)
+            if self.segment.tell() >= self.segment_bytes:
+                self._open_segment(batch[-1][0] + 1)
+        self.apply_queue.put(None)
+
+    # Apply path
+
+    def _apply(self, batch, idempotent: bool = False):
+        """Write one batch to both stores; raises if either store reports a failed write."""
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        for _, table_name, row in batch:
+            tables.setdefault(table_name, []).append(row)
+        online_failures = getattr(self.online_store, "failed_writes", 0)
+        offline_failures = getattr(self.offline_store, "failed_writes", 0)
+        for table_name, rows in tables.items():
+            feature_view = self.feature_repo.get_feature_view(table_name)
+            df = pd.DataFrame(rows)
+            # Only the newest row per entity in this batch needs to reach the online store
+            self.online_store.upsert_data(table_name, df.drop_duplicates(subset=feature_view.entities, keep="last"),
+                                          feature_view.entities)
+            if idempotent:
+                self.offline_store.append_missing(table_name, df, feature_view.entities + [feature_view.timestamp_field])
+            else:
+                self.offline_store.append_data(table_name, df)
+        self.online_store.flush()
+        if (getattr(self.online_store, "failed_writes", 0) != online_failures
+                or getattr(self.offline_store, "failed_writes", 0) != offline_failures):
+            raise RuntimeError("a store rejected part of the batch")
+
+    def _apply_loop(self):
+        while True:
+            batch = self.apply_queue.get()
+            if batch is None:
+                break
+            idempotent = False
+            while True:
+                try:
+                    self._apply(batch, idempotent)
+                    break
+                except Exception as e:
+                    print(f"Error applying write-ahead log batch ending at LSN {batch[-1][0]}: {e}")
+                    if self._closing:
+                        # Leave the checkpoint behind this batch; it is replayed on the next start
+                        print("Giving up until restart; the batch stays in the log")
+                        while self.apply_queue.get() is not None:
+                            pass
+                        return
+                    # Retry as a replay: part of the batch may already be in one of the stores
+                    idempotent = True
+                    time.sleep(self.retry_interval)
+            with self.applied:
+                self.applied_lsn = batch[-1][0]
+                self.applied.notify_all()
+            self._write_checkpoint(self.applied_lsn)
+            self._remove_applied_segments()
+
+    def close(self):
+        """Commit and apply everything appended so far, then stop both threads."""
+        with self.cond:
+            if self._closing:
+                return
+            self._closing = True
+            self.cond.notify_all()
+        self.committer.join()
+        self.applier.join()
+        self.segment.close()